@@ -11,7 +11,6 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
-import rollbar
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -50,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "registry.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     'whitenoise.middleware.WhiteNoiseMiddleware',
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -66,13 +66,14 @@ ROLLBAR = {
     'environment': 'development' if DEBUG else 'production',
     'root': BASE_DIR,
 }
-rollbar.init(**ROLLBAR)
+# rollbar is initialized from ROLLBAR by its middleware, not when settings load.
 
 ROOT_URLCONF = "ethpm_explorer.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates, reporting render times to registry.metrics
+        "BACKEND": "registry.metrics.TimedDjangoTemplates",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -99,6 +100,139 @@ DATABASES = {
     }
 }
 
+# Chain reads, ENS resolutions, manifests and rendered fragments are shared by all
+# worker processes through this cache: the Redis server at REDIS_URL if it's set,
+# which shares them between machines too, or else a SQLite database shared by the
+# workers of one machine. A worker computing a missing value holds a lock for at
+# most SHARED_CACHE_LOCK_TIMEOUT seconds, while others wait for it.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "registry.cache_backends.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+            "TIMEOUT": None,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "registry.cache_backends.SQLiteCache",
+            "LOCATION": os.environ.get(
+                "SHARED_CACHE_PATH", os.path.join(BASE_DIR, "shared_cache.sqlite3")
+            ),
+            "TIMEOUT": None,
+            "OPTIONS": {
+                "MAX_ENTRIES": int(os.environ.get("SHARED_CACHE_MAX_ENTRIES", 100_000))
+            },
+        }
+    }
+SHARED_CACHE_LOCK_TIMEOUT = float(os.environ.get("SHARED_CACHE_LOCK_TIMEOUT", 30))
+# Seconds registry snapshots and release lists read from the chain are shared for,
+# long enough for concurrent requests of the same registry to share one read.
+SHARED_CACHE_CHAIN_TTL = int(os.environ.get("SHARED_CACHE_CHAIN_TTL", 30))
+
+# Chains are read through Infura with the WEB3_INFURA_PROJECT_ID project, or the
+# node at a chain's entry in WEB3_PROVIDER_URIS, "<chain_id>=<url>" pairs separated
+# by commas. A chain's client is only built on its first request.
+WEB3_INFURA_PROJECT_ID = os.environ.get(
+    "WEB3_INFURA_PROJECT_ID", os.environ.get("WEB3_INFURA_API_KEY", "")
+)
+WEB3_PROVIDER_URIS = dict(
+    entry.split("=", 1)
+    for entry in os.environ.get("WEB3_PROVIDER_URIS", "").split(",")
+    if entry
+)
+# Each worker keeps one Web3 client per chain, backed by a pool of up to
+# WEB3_POOL_SIZE keep-alive connections. Failed requests are retried
+# WEB3_RETRIES times with exponential backoff starting at WEB3_RETRY_BACKOFF.
+WEB3_POOL_SIZE = int(os.environ.get("WEB3_POOL_SIZE", 10))
+WEB3_TIMEOUT = float(os.environ.get("WEB3_TIMEOUT", 10))
+WEB3_RETRIES = int(os.environ.get("WEB3_RETRIES", 3))
+WEB3_RETRY_BACKOFF = float(os.environ.get("WEB3_RETRY_BACKOFF", 0.3))
+# JSON-RPC batches are split into requests of at most WEB3_BATCH_SIZE calls, and
+# up to WEB3_CONCURRENCY independent reads run at once per worker process.
+WEB3_BATCH_SIZE = int(os.environ.get("WEB3_BATCH_SIZE", 500))
+WEB3_CONCURRENCY = int(os.environ.get("WEB3_CONCURRENCY", 8))
+
+# Seconds before registry data indexed in the database is re-read from the chain.
+REGISTRY_INDEX_TTL = int(os.environ.get("REGISTRY_INDEX_TTL", 300))
+# A registry address or ENS name is looked up on every chain at once by up to
+# REGISTRY_PROBE_WORKERS threads, waiting at most REGISTRY_PROBE_TIMEOUT seconds
+# for each chain.
+REGISTRY_PROBE_WORKERS = int(os.environ.get("REGISTRY_PROBE_WORKERS", 16))
+REGISTRY_PROBE_TIMEOUT = float(os.environ.get("REGISTRY_PROBE_TIMEOUT", 5))
+# Number of packages per page of a registry's package list.
+PACKAGE_PAGE_SIZE = int(os.environ.get("PACKAGE_PAGE_SIZE", 50))
+
+# ENS resolutions are cached in memory for ENS_CACHE_TTL seconds, names that
+# don't resolve for ENS_NEGATIVE_CACHE_TTL seconds.
+ENS_CACHE_TTL = int(os.environ.get("ENS_CACHE_TTL", 900))
+ENS_NEGATIVE_CACHE_TTL = int(os.environ.get("ENS_NEGATIVE_CACHE_TTL", 60))
+ENS_CACHE_MAX_ENTRIES = int(os.environ.get("ENS_CACHE_MAX_ENTRIES", 10_000))
+
+# Snapshot of the directory registries, written by `manage.py refresh_directory`.
+DIRECTORY_SNAPSHOT_PATH = os.environ.get(
+    "DIRECTORY_SNAPSHOT_PATH", os.path.join(BASE_DIR, "directory_snapshot.json")
+)
+
+# IPFS content is fetched from comma separated IPFS_GATEWAYS and, if set, the HTTP
+# API of the IPFS node at IPFS_NODE_URL. A request not answered within
+# IPFS_HEDGE_DELAY seconds is also sent to the next fastest gateway, with at most
+# IPFS_GATEWAY_CONCURRENCY requests in flight per gateway.
+IPFS_GATEWAYS = [
+    url
+    for url in os.environ.get(
+        "IPFS_GATEWAYS", "https://ipfs.io/ipfs,https://cloudflare-ipfs.com/ipfs"
+    ).split(",")
+    if url
+]
+IPFS_NODE_URL = os.environ.get("IPFS_NODE_URL", "")
+IPFS_HEDGE_DELAY = float(os.environ.get("IPFS_HEDGE_DELAY", 0.5))
+IPFS_TIMEOUT = float(os.environ.get("IPFS_TIMEOUT", 20))
+IPFS_GATEWAY_CONCURRENCY = int(os.environ.get("IPFS_GATEWAY_CONCURRENCY", 4))
+
+# Validated manifests are cached by IPFS hash, in memory up to
+# MANIFEST_CACHE_MAX_BYTES of raw manifest data and on disk without limit.
+MANIFEST_CACHE_DIR = os.environ.get(
+    "MANIFEST_CACHE_DIR", os.path.join(BASE_DIR, "manifest_cache")
+)
+MANIFEST_CACHE_MAX_BYTES = int(os.environ.get("MANIFEST_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Manifests of newly indexed releases are fetched in the background by
+# MANIFEST_PREFETCH_WORKERS threads. Up to MANIFEST_PREFETCH_QUEUE_SIZE manifests
+# wait for a worker, and failed fetches are retried MANIFEST_PREFETCH_RETRIES times
+# with exponential backoff starting at MANIFEST_PREFETCH_RETRY_BACKOFF seconds.
+MANIFEST_PREFETCH_WORKERS = int(os.environ.get("MANIFEST_PREFETCH_WORKERS", 4))
+MANIFEST_PREFETCH_QUEUE_SIZE = int(os.environ.get("MANIFEST_PREFETCH_QUEUE_SIZE", 1000))
+MANIFEST_PREFETCH_RETRIES = int(os.environ.get("MANIFEST_PREFETCH_RETRIES", 3))
+MANIFEST_PREFETCH_RETRY_BACKOFF = float(os.environ.get("MANIFEST_PREFETCH_RETRY_BACKOFF", 1.0))
+
+# Transitive build dependencies of a manifest are fetched by up to
+# DEPENDENCY_RESOLVER_WORKERS threads per worker process, and dependency graphs are
+# cut off after DEPENDENCY_GRAPH_MAX_NODES manifests.
+DEPENDENCY_RESOLVER_WORKERS = int(os.environ.get("DEPENDENCY_RESOLVER_WORKERS", 8))
+DEPENDENCY_GRAPH_MAX_NODES = int(os.environ.get("DEPENDENCY_GRAPH_MAX_NODES", 500))
+
+# Verdicts of checking a manifest's deployments against the chain are shared for
+# DEPLOYMENT_VERIFICATION_TTL seconds, contracts may self destruct after that.
+DEPLOYMENT_VERIFICATION_TTL = int(os.environ.get("DEPLOYMENT_VERIFICATION_TTL", 3600))
+
+# SQLite FTS5 index of manifest metadata, see `manage.py rebuild_search_index`.
+SEARCH_INDEX_PATH = os.environ.get(
+    "SEARCH_INDEX_PATH", os.path.join(BASE_DIR, "search.sqlite3")
+)
+
+# Previews of manifests larger than this many bytes are streamed instead of
+# being rendered in one piece and stored.
+MANIFEST_STREAMING_THRESHOLD = int(
+    os.environ.get("MANIFEST_STREAMING_THRESHOLD", 1024 * 1024)
+)
+
+# Import the views, web3 and the chain clients, and compile the main templates
+# when the WSGI application loads, instead of on each worker's first request. With
+# `gunicorn --preload` this is done once, before workers are forked.
+PRELOAD = bool(os.environ.get("PRELOAD"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/2.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ethpm_explorer.settings")
 
 application = get_wsgi_application()
+
+if settings.PRELOAD:
+    from registry.preload import preload
+
+    preload()
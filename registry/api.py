@@ -0,0 +1,214 @@
+"""
+Version 1 of the JSON API. Responses are serialized compactly and carry an ETag,
+so clients polling with If-None-Match get a 304 when nothing changed. Manifests are
+content addressed and cached as immutable.
+"""
+from functools import wraps
+import json
+
+from django.conf import settings
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import conditional_page, require_GET
+
+from .constants import CHAIN_DATA
+from .models import Package, get_package_page, get_package_versions, get_registry
+from .search import FACETS, search_index
+from .utils import lazy_import
+
+# web3 and ethpm are imported by the first request using them, see registry.views
+clients = lazy_import("registry.clients")
+dependencies = lazy_import("registry.dependencies")
+ethpm_exceptions = lazy_import("ethpm.exceptions")
+manifest_cache = lazy_import("registry.manifest_cache", "manifest_cache")
+previews = lazy_import("registry.previews")
+probe = lazy_import("registry.probe")
+verification = lazy_import("registry.verification")
+
+API_VERSION = "1"
+COMPACT_JSON = {"separators": (",", ":")}
+
+
+def api_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=COMPACT_JSON)
+
+
+def api_error(message, status):
+    return api_response({"error": message}, status=status)
+
+
+def api_view(view):
+    """
+    Serve a read only API view: GET only, with an ETag computed from the response,
+    and caches told to revalidate before reusing a response.
+    """
+    @require_GET
+    @conditional_page
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if not response.has_header("Cache-Control"):
+            patch_cache_control(response, no_cache=True)
+        return response
+    return wrapper
+
+
+def load_registry(chain_id, registry_address):
+    if chain_id not in CHAIN_DATA:
+        raise ValueError(f"Unknown chain id: {chain_id}")
+    w3 = clients.get_w3(chain_id)
+    return w3, get_registry(registry_address, w3, chain_id)
+
+
+def serialize_registry(registry):
+    return {
+        "chain_id": registry.chain_id,
+        "address": registry.address,
+        "ens_domain": registry.ens_domain,
+        "owner": registry.owner_address,
+        "is_valid": registry.is_valid,
+        "package_count": registry.package_count,
+        "updated_at": registry.updated_at.isoformat(),
+    }
+
+
+@api_view
+def registry_detail(request, chain_id, registry_address):
+    try:
+        _, registry = load_registry(chain_id, registry_address)
+    except ValueError as exc:
+        return api_error(str(exc), 404)
+    return api_response(serialize_registry(registry))
+
+
+@require_GET
+def registry_probe(request, registry_address):
+    """
+    Stream where ``registry_address`` (an address or ENS name) hosts a registry as
+    newline delimited JSON, one line per chain in the order the chains answer.
+    """
+    response = StreamingHttpResponse(
+        (
+            json.dumps(serialize_probe(result), **COMPACT_JSON) + "\n"
+            for result in probe.iter_registry_probes(registry_address)
+        ),
+        content_type="application/x-ndjson",
+    )
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def serialize_probe(result):
+    return {
+        "chain_id": result.chain_id,
+        "chain_name": CHAIN_DATA[result.chain_id][0],
+        "status": result.status,
+        "address": result.address,
+        "owner": result.owner,
+        "package_count": result.package_count,
+        "error": result.error,
+    }
+
+
+@api_view
+def package_list(request, chain_id, registry_address):
+    try:
+        cursor = int(request.GET.get("cursor", 0))
+        limit = int(request.GET.get("limit", settings.PACKAGE_PAGE_SIZE))
+    except ValueError:
+        return api_error("cursor and limit must be integers", 400)
+    if cursor < 0 or limit < 1:
+        return api_error("cursor and limit must be positive", 400)
+    try:
+        w3, registry = load_registry(chain_id, registry_address)
+    except ValueError as exc:
+        return api_error(str(exc), 404)
+
+    page = get_package_page(registry, w3, cursor, min(limit, settings.PACKAGE_PAGE_SIZE))
+    return api_response({
+        "registry": serialize_registry(registry),
+        "packages": [
+            {"name": package.name, "release_count": package.release_count}
+            for package in page.packages
+        ],
+        "next_cursor": page.next_cursor,
+    })
+
+
+@api_view
+def release_list(request, chain_id, registry_address, package_name):
+    if chain_id not in CHAIN_DATA:
+        return api_error(f"Unknown chain id: {chain_id}", 404)
+    try:
+        releases = get_package_versions(
+            registry_address, clients.get_w3(chain_id), chain_id, package_name
+        )
+    except (ValueError, Package.DoesNotExist) as exc:
+        return api_error(str(exc), 404)
+    return api_response({
+        "package_name": package_name,
+        "releases": [
+            {
+                "version": release.version,
+                "manifest_uri": release.manifest_uri,
+                "ethpm_uri": release.ethpm_uri,
+            }
+            for release in releases
+        ],
+    })
+
+
+@api_view
+def search(request):
+    filters = {facet: request.GET[facet] for facet in FACETS if request.GET.get(facet)}
+    try:
+        limit = int(request.GET.get("limit", 20))
+        offset = int(request.GET.get("offset", 0))
+    except ValueError:
+        return api_error("limit and offset must be integers", 400)
+    if offset < 0 or not 1 <= limit <= 100:
+        return api_error("limit must be between 1 and 100, offset positive", 400)
+    return api_response(
+        search_index.search(request.GET.get("q", ""), filters, limit, offset)
+    )
+
+
+@api_view
+def manifest_dependencies(request, ipfs_hash):
+    graph = dependencies.resolve_dependency_graph(ipfs_hash)
+    error = graph.nodes[ipfs_hash].error
+    if error:
+        return api_error(error, 404)
+    return api_response(dependencies.serialize_graph(graph))
+
+
+@api_view
+def manifest_deployments(request, ipfs_hash):
+    try:
+        manifest = manifest_cache.get(ipfs_hash).manifest
+    except (ethpm_exceptions.EthPMValidationError, json.JSONDecodeError, ValueError) as exc:
+        return api_error(str(exc), 404)
+    verifications = verification.verify_deployments(ipfs_hash, manifest)
+    return api_response(verification.serialize_verifications(verifications))
+
+
+@require_GET
+def manifest_detail(request, ipfs_hash):
+    # IPFS content never changes, so the hash is a strong validator by itself.
+    etag = f'"{ipfs_hash}"'
+    if previews.etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            cached = manifest_cache.get(ipfs_hash)
+        except (ethpm_exceptions.EthPMValidationError, json.JSONDecodeError, ValueError) as exc:
+            return api_error(str(exc), 404)
+        # manifests are served as published, ethPM requires them tightly packed
+        response = HttpResponse(cached.raw, content_type="application/json")
+    previews.patch_immutable_response(response, etag)
+    return response
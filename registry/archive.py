@@ -0,0 +1,277 @@
+"""
+Offline archives of the registry index, used to seed new instances without crawling
+every registry again. An archive is a directory holding:
+
+- ``index.ndjson.gz``: one JSON record per line, every registry first, then every
+  package, then every release, each referring to its parent by natural key.
+- ``manifests.blobs.gz``: the raw bytes of the cached manifests of the exported
+  releases, stored CAR-like as a sequence of ``varint(len(cid)) cid varint(len(data))
+  data`` sections. On import, every manifest whose CID can be computed is checked
+  against its content, so an archive can't put forged manifests in the cache, and
+  manifests failing validation are skipped.
+
+Both files are written and read as streams, so archives of any size can be moved
+through a constant amount of memory.
+"""
+from collections import Counter
+import gzip
+import itertools
+import json
+import logging
+from pathlib import Path
+
+from django.db import transaction
+from ethpm.exceptions import EthPMValidationError
+
+from .dependencies import dependency_cid
+from .ipfs import compute_cid, is_verifiable
+from .manifest_cache import manifest_cache
+from .models import Package, Registry, Release
+from .search import index_manifests
+from .utils import encode_varint
+
+INDEX_FILE = "index.ndjson.gz"
+BLOBS_FILE = "manifests.blobs.gz"
+
+REGISTRY_FIELDS = (
+    "chain_id",
+    "address",
+    "ens_domain",
+    "owner_address",
+    "is_valid",
+    "package_count",
+    "last_synced_block",
+)
+PACKAGE_FIELDS = ("name", "release_count", "position")
+RELEASE_FIELDS = ("version", "manifest_uri")
+
+logger = logging.getLogger(__name__)
+
+
+def read_varint(stream):
+    """
+    Return the next unsigned varint in ``stream``, or None at the end of the stream.
+    """
+    value = shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            if shift:
+                raise ValueError("Truncated varint in blob file")
+            return None
+        value |= (byte[0] & 0x7F) << shift
+        if not byte[0] & 0x80:
+            return value
+        shift += 7
+
+
+def write_blob(stream, cid, data):
+    cid_bytes = cid.encode("ascii")
+    stream.write(encode_varint(len(cid_bytes)) + cid_bytes)
+    stream.write(encode_varint(len(data)))
+    stream.write(data)
+
+
+def iter_blobs(stream):
+    """
+    Yield every ``(cid, data)`` pair written to ``stream`` with ``write_blob``.
+    """
+    while True:
+        cid_length = read_varint(stream)
+        if cid_length is None:
+            return
+        cid = stream.read(cid_length).decode("ascii")
+        data_length = read_varint(stream)
+        data = stream.read(data_length)
+        if data_length is None or len(data) != data_length:
+            raise ValueError(f"Truncated blob for {cid}")
+        yield cid, data
+
+
+def iter_index_records(chain_ids=None):
+    registries = Registry.objects.order_by("chain_id", "address")
+    packages = Package.objects.order_by("registry_id", "id")
+    releases = Release.objects.order_by("package_id", "id")
+    if chain_ids:
+        registries = registries.filter(chain_id__in=chain_ids)
+        packages = packages.filter(registry__chain_id__in=chain_ids)
+        releases = releases.filter(package__registry__chain_id__in=chain_ids)
+
+    for registry in registries.values(*REGISTRY_FIELDS).iterator():
+        yield {"type": "registry", **registry}
+    for package in packages.values(
+        "registry__chain_id", "registry__address", *PACKAGE_FIELDS
+    ).iterator():
+        yield {
+            "type": "package",
+            "chain_id": package.pop("registry__chain_id"),
+            "registry": package.pop("registry__address"),
+            **package,
+        }
+    for release in releases.values(
+        "package__registry__chain_id",
+        "package__registry__address",
+        "package__name",
+        *RELEASE_FIELDS,
+    ).iterator():
+        yield {
+            "type": "release",
+            "chain_id": release.pop("package__registry__chain_id"),
+            "registry": release.pop("package__registry__address"),
+            "package": release.pop("package__name"),
+            **release,
+        }
+
+
+def get_released_manifests(chain_ids):
+    # CIDs of the manifests released in the registries of ``chain_ids``
+    manifest_uris = Release.objects.filter(
+        package__registry__chain_id__in=chain_ids
+    ).values_list("manifest_uri", flat=True)
+    return {dependency_cid(uri) for uri in manifest_uris.iterator()} - {None}
+
+
+def export_index(directory, chain_ids=None):
+    """
+    Write the indexed registries, packages, releases and their cached manifests
+    (every cached manifest if ``chain_ids`` isn't given) to an archive in
+    ``directory``. Returns the number of records of each type.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    counts = Counter()
+    with gzip.open(directory / INDEX_FILE, "wt", encoding="utf-8") as index_file:
+        for record in iter_index_records(chain_ids):
+            index_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            counts[record["type"]] += 1
+    ipfs_hashes = get_released_manifests(chain_ids) if chain_ids else None
+    with gzip.open(directory / BLOBS_FILE, "wb") as blobs_file:
+        for cid, data in manifest_cache.iter_stored_raw(ipfs_hashes):
+            write_blob(blobs_file, cid, data)
+            counts["manifest"] += 1
+    return counts
+
+
+def import_index(directory, batch_size=1000):
+    """
+    Load an archive written by ``export_index`` with batched inserts. Rows already
+    in the index are left untouched. Returns the number of records of each type read,
+    manifests that don't match their CID or fail validation are counted as "rejected".
+    """
+    directory = Path(directory)
+    counts = Counter()
+    with gzip.open(directory / INDEX_FILE, "rt", encoding="utf-8") as index_file:
+        records = (json.loads(line) for line in index_file)
+        for record_type, group in itertools.groupby(records, key=lambda record: record["type"]):
+            importer = IMPORTERS[record_type]
+            for batch in iter_batches(group, batch_size):
+                with transaction.atomic():
+                    importer(batch)
+                counts[record_type] += len(batch)
+    with gzip.open(directory / BLOBS_FILE, "rb") as blobs_file:
+        for batch in iter_batches(iter_blobs(blobs_file), batch_size):
+            stored = []
+            for cid, data in batch:
+                manifest = store_manifest(cid, data)
+                if manifest is not None:
+                    stored.append((cid, manifest))
+            index_manifests(stored)
+            counts["manifest"] += len(stored)
+            counts["rejected"] += len(batch) - len(stored)
+    return counts
+
+
+def store_manifest(cid, data):
+    """
+    Validate and cache an archived manifest, returning it, or None if it's rejected.
+    """
+    if not content_matches(cid, data):
+        return None
+    try:
+        return manifest_cache.put(cid, data, index=False).manifest
+    except (EthPMValidationError, json.JSONDecodeError, ValueError) as exc:
+        logger.warning("Rejected archived manifest %s: %s", cid, exc)
+        return None
+
+
+def content_matches(cid, data):
+    # CIDs that can't be computed here are trusted, like those fetched from a node
+    if is_verifiable(cid) and compute_cid(data) != cid:
+        logger.warning("Rejected archived manifest %s, its content doesn't match", cid)
+        return False
+    return True
+
+
+def iter_batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_registries(records):
+    Registry.objects.bulk_create(
+        (Registry(**{field: record[field] for field in REGISTRY_FIELDS}) for record in records),
+        ignore_conflicts=True,
+    )
+
+
+def import_packages(records):
+    registry_ids = get_registry_ids(records)
+    Package.objects.bulk_create(
+        (
+            Package(
+                registry_id=registry_ids[(record["chain_id"], record["registry"])],
+                **{field: record[field] for field in PACKAGE_FIELDS},
+            )
+            for record in records
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def import_releases(records):
+    registry_ids = get_registry_ids(records)
+    package_ids = {
+        (registry_id, name): package_id
+        for package_id, registry_id, name in Package.objects.filter(
+            registry_id__in=set(registry_ids.values()),
+            name__in={record["package"] for record in records},
+        ).values_list("id", "registry_id", "name")
+    }
+    Release.objects.bulk_create(
+        (
+            Release(
+                package_id=package_ids[
+                    (registry_ids[(record["chain_id"], record["registry"])], record["package"])
+                ],
+                **{field: record[field] for field in RELEASE_FIELDS},
+            )
+            for record in records
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def get_registry_ids(records):
+    # (chain_id, address) -> id of the registries the records belong to
+    keys = {(record["chain_id"], record["registry"]) for record in records}
+    registries = Registry.objects.filter(
+        chain_id__in={chain_id for chain_id, _ in keys},
+        address__in={address for _, address in keys},
+    )
+    return {
+        (chain_id, address): registry_id
+        for registry_id, chain_id, address in registries.values_list(
+            "id", "chain_id", "address"
+        )
+    }
+
+
+IMPORTERS = {
+    "registry": import_registries,
+    "package": import_packages,
+    "release": import_releases,
+}
@@ -0,0 +1,127 @@
+"""
+Content addressed storage of manifest parts. Manifests of the same contracts, like
+the releases of a package or the many ERC20 and ERC721 packages, embed the same
+ABIs, bytecode and sources, so a manifest is split into a small skeleton and a blob
+for each of these values, and every distinct blob is stored once, compressed.
+"""
+import hashlib
+import json
+from pathlib import Path
+import zlib
+
+from .utils import write_file_atomically
+
+# (section, field) of the manifest values stored as blobs, None matching every key
+# of the section.
+BLOB_PATHS = (
+    ("contract_types", "abi"),
+    ("contract_types", "deployment_bytecode"),
+    ("contract_types", "runtime_bytecode"),
+    ("contract_types", "natspec"),
+    ("sources", None),
+)
+# Values serialized to fewer bytes than this stay in the skeleton, like the IPFS
+# URIs of sources that aren't inlined.
+MIN_BLOB_SIZE = 128
+
+# json.dumps options manifests are serialized with: ethPM's canonical form first,
+# then those of common tools. A manifest is stored as a skeleton if one of them
+# reproduces its raw bytes exactly, so it can be serialized again on demand.
+JSON_FORMATS = (
+    {"sort_keys": True, "separators": (",", ":"), "ensure_ascii": False},
+    {"sort_keys": True, "separators": (",", ":")},
+    {"sort_keys": True},
+)
+
+
+class BlobStore:
+    """
+    Blobs in a directory, each in a zlib compressed file named after the SHA-256 of
+    its content. Blobs are immutable, so writes of a blob that's already stored
+    are skipped, and concurrent writers of the same blob write the same bytes.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def put(self, data) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not path.is_file():
+            write_file_atomically(path, zlib.compress(data))
+        return digest
+
+    def get(self, digest) -> bytes:
+        data = zlib.decompress(self._path(digest).read_bytes())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Blob {digest} is corrupted")
+        return data
+
+    def contains(self, digest):
+        return self._path(digest).is_file()
+
+    def get_stats(self):
+        paths = [path for path in self.directory.glob("*/*") if path.is_file()]
+        return {"blobs": len(paths), "bytes": sum(path.stat().st_size for path in paths)}
+
+    def _path(self, digest):
+        return self.directory / digest[:2] / digest
+
+
+def serialize(value, json_format=0):
+    return json.dumps(value, **JSON_FORMATS[json_format]).encode("utf-8")
+
+
+def find_json_format(manifest, raw):
+    """
+    Return the index of the ``JSON_FORMATS`` entry ``raw`` is serialized with, or
+    None if it's serialized some other way.
+    """
+    for json_format in range(len(JSON_FORMATS)):
+        if serialize(manifest, json_format) == raw:
+            return json_format
+    return None
+
+
+def split_manifest(manifest):
+    """
+    Return a copy of ``manifest`` without the values stored as blobs, and the
+    ``(path, value)`` of each of them.
+    """
+    skeleton = dict(manifest)
+    parts = []
+    for section, field in BLOB_PATHS:
+        if not isinstance(skeleton.get(section), dict):
+            continue
+        entries = skeleton[section] = dict(skeleton[section])
+        for name, entry in entries.items():
+            if field is None:
+                path, value = (section, name), entry
+            elif isinstance(entry, dict) and field in entry:
+                path, value = (section, name, field), entry[field]
+            else:
+                continue
+            if len(serialize(value)) < MIN_BLOB_SIZE:
+                continue
+            parts.append((path, value))
+            # keep the key, so assembled manifests keep the order of the original
+            if field is None:
+                entries[name] = None
+            else:
+                entries[name] = {**entry, field: None}
+    return skeleton, parts
+
+
+def get_value(manifest, path):
+    for key in path:
+        manifest = manifest[key]
+    return manifest
+
+
+def assemble_manifest(skeleton, parts):
+    """
+    Put the ``(path, value)`` parts of a manifest back into its skeleton, in place.
+    """
+    for path, value in parts:
+        get_value(skeleton, path[:-1])[path[-1]] = value
+    return skeleton
@@ -0,0 +1,324 @@
+"""
+Django cache backends shared by worker processes: ``SQLiteCache`` for the workers of
+one machine and ``RedisCache`` for every worker of every machine. Values are pickled,
+like Django's own backends do, and keys aren't validated, as neither backend has
+memcached's restrictions on them.
+"""
+import itertools
+import pickle
+import selectors
+import socket
+import sqlite3
+import ssl
+import threading
+import time
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Rows written by a process between two checks of the entry count against
+# MAX_ENTRIES, counting the rows of the table is a full scan.
+CULL_CHECK_INTERVAL = 64
+
+
+class SQLiteCache(BaseCache):
+    """
+    A cache in a SQLite database file, ``LOCATION``. Every thread has its own
+    connection and the database is in WAL mode, so readers don't block each other
+    or the writer.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = Path(location)
+        self._local = threading.local()
+        # next() of a count is atomic, so writes of concurrent threads are all counted
+        self._writes = itertools.count(1)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, self._pickle(value), self.get_backend_timeout(timeout)),
+        )
+        self._maybe_cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "DELETE FROM cache WHERE key = ? AND expires <= ?", (key, time.time())
+            )
+            added = connection.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, self._pickle(value), self.get_backend_timeout(timeout)),
+            ).rowcount
+        if added:
+            self._maybe_cull()
+        return bool(added)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        return bool(self._connection().execute(
+            "UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self.get_backend_timeout(timeout), key, time.time()),
+        ).rowcount)
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        return bool(
+            self._connection().execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount
+        )
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # autocommit, transactions are started explicitly
+            connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def _pickle(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _maybe_cull(self):
+        if next(self._writes) % CULL_CHECK_INTERVAL:
+            return
+        connection = self._connection()
+        connection.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        (entries,) = connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if entries > self._max_entries:
+            # rows are replaced on every write, so the lowest rowids are the oldest
+            connection.execute(
+                "DELETE FROM cache WHERE rowid IN "
+                "(SELECT rowid FROM cache ORDER BY rowid LIMIT ?)",
+                (entries - self._max_entries + self._max_entries // self._cull_frequency,),
+            )
+
+
+class RedisError(Exception):
+    pass
+
+
+class RESPConnection:
+    """
+    A connection speaking the Redis serialization protocol (RESP2).
+    """
+
+    def __init__(self, host, port, timeout, use_ssl=False):
+        sock = socket.create_connection((host, port), timeout=timeout)
+        if use_ssl:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        self.sock = sock
+        self.file = sock.makefile("rb")
+        # select.select can't watch descriptors above FD_SETSIZE (1024), which a busy
+        # worker process easily has
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(sock, selectors.EVENT_READ)
+
+    def execute(self, *args):
+        self.send(args)
+        return self.read_reply()
+
+    def send(self, args):
+        # sendall only raises if part of the command wasn't sent, which the server
+        # never executes
+        self.sock.sendall(encode_command(args))
+
+    def is_closed_by_server(self):
+        # An idle connection has nothing to read, unless the server closed it.
+        return bool(self.selector.select(0))
+
+    def read_reply(self):
+        line = self.file.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis closed the connection")
+        kind, value = line[:1], line[1:-2]
+        if kind == b"+":
+            return value.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(value.decode("utf-8"))
+        if kind == b":":
+            return int(value)
+        if kind == b"$":
+            length = int(value)
+            if length < 0:
+                return None
+            data = self.file.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Redis closed the connection")
+            return data[:-2]
+        if kind == b"*":
+            length = int(value)
+            return None if length < 0 else [self.read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply from Redis: {line!r}")
+
+    def close(self):
+        self.selector.close()
+        self.file.close()
+        self.sock.close()
+
+
+def encode_command(args):
+    encoded = [f"*{len(args)}\r\n".encode("ascii")]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode("utf-8")
+        encoded += (f"${len(arg)}\r\n".encode("ascii"), arg, b"\r\n")
+    return b"".join(encoded)
+
+
+class RedisCache(BaseCache):
+    """
+    A cache in the Redis server at ``LOCATION``, a ``redis://[:password@]host:port/db``
+    (or ``rediss://`` for TLS) URL. Connections are kept in a pool shared by the
+    threads of the process.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        url = urlparse(server)
+        self.host = url.hostname or "localhost"
+        self.port = url.port or 6379
+        self.password = unquote(url.password) if url.password else None
+        self.db = int(url.path.lstrip("/") or 0)
+        self.use_ssl = url.scheme == "rediss"
+        self.socket_timeout = params.get("OPTIONS", {}).get("SOCKET_TIMEOUT", 5)
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, version=None):
+        value = self._execute("GET", self._key(key, version))
+        return default if value is None else pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._execute("MGET", *(self._key(key, version) for key in keys))
+        return {
+            key: pickle.loads(value) for key, value in zip(keys, values) if value is not None
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        milliseconds = self._expiry(timeout)
+        if milliseconds is not None and milliseconds <= 0:
+            self._execute("DEL", key)
+            return
+        self._execute("SET", key, self._pickle(value), *self._px(milliseconds))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        milliseconds = self._expiry(timeout)
+        if milliseconds is not None and milliseconds <= 0:
+            return False
+        reply = self._execute(
+            "SET", self._key(key, version), self._pickle(value), "NX", *self._px(milliseconds)
+        )
+        return reply == "OK"
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        milliseconds = self._expiry(timeout)
+        if milliseconds is None:
+            self._execute("PERSIST", key)
+            return bool(self._execute("EXISTS", key))
+        if milliseconds <= 0:
+            return bool(self._execute("DEL", key))
+        return bool(self._execute("PEXPIRE", key, milliseconds))
+
+    def delete(self, key, version=None):
+        return bool(self._execute("DEL", self._key(key, version)))
+
+    def has_key(self, key, version=None):
+        return bool(self._execute("EXISTS", self._key(key, version)))
+
+    def clear(self):
+        self._execute("FLUSHDB")
+
+    def _key(self, key, version):
+        return self.make_key(key, version=version)
+
+    def _expiry(self, timeout):
+        # milliseconds until the entry expires, None if it never does
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else int(timeout * 1000)
+
+    def _px(self, milliseconds):
+        return () if milliseconds is None else ("PX", milliseconds)
+
+    def _pickle(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _execute(self, *args):
+        with self._lock:
+            connection = self._connections.pop() if self._connections else None
+        if connection is not None and connection.is_closed_by_server():
+            connection.close()
+            connection = None
+        if connection is not None:
+            try:
+                connection.send(args)
+            except OSError:
+                # The command didn't reach the server, so it's safe to send it again.
+                # Once it's sent it's never retried: SET NX and DEL aren't idempotent.
+                connection.close()
+                connection = None
+        if connection is None:
+            connection = self._connect()
+            try:
+                connection.send(args)
+            except OSError:
+                connection.close()
+                raise
+        try:
+            reply = connection.read_reply()
+        except RedisError:
+            self._release(connection)
+            raise
+        except OSError:
+            connection.close()
+            raise
+        self._release(connection)
+        return reply
+
+    def _connect(self):
+        connection = RESPConnection(self.host, self.port, self.socket_timeout, self.use_ssl)
+        try:
+            if self.password:
+                connection.execute("AUTH", self.password)
+            if self.db:
+                connection.execute("SELECT", self.db)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def _release(self, connection):
+        with self._lock:
+            self._connections.append(connection)
@@ -0,0 +1,143 @@
+"""
+One long-lived Web3 client per chain in ``CHAIN_DATA``, shared by every request a
+worker process serves, so requests reuse pooled keep-alive connections to the
+node instead of paying for a new HTTP session and TLS handshake each time.
+"""
+from collections import defaultdict
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from web3 import Web3
+from web3.providers.rpc import HTTPProvider
+
+from .constants import CHAIN_DATA
+from .metrics import rpc_metrics_middleware
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class ChainMetrics:
+    """
+    Thread-safe latency counters of the JSON-RPC requests sent to one chain.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.methods = defaultdict(int)
+
+    def record(self, method, seconds, failed=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(failed)
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.methods[method] += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "mean_seconds": self.total_seconds / self.requests if self.requests else 0,
+                "max_seconds": self.max_seconds,
+                "methods": dict(self.methods),
+            }
+
+
+chain_metrics = defaultdict(ChainMetrics)
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """
+    An ``HTTPProvider`` sending every request through ``session``, recording the
+    latency of each request in ``metrics``. Retries are left to the session's
+    connection adapter.
+    """
+    _middlewares = ()
+
+    def __init__(self, endpoint_uri, session, metrics, request_kwargs=None):
+        super().__init__(endpoint_uri, request_kwargs)
+        self.session = session
+        self.metrics = metrics
+
+    def make_request(self, method, params):
+        raw_response = self.post(self.encode_rpc_request(method, params), method)
+        return self.decode_rpc_response(raw_response)
+
+    def post(self, data, method="batch"):
+        start = time.perf_counter()
+        try:
+            response = self.session.post(
+                self.endpoint_uri, data=data, **self.get_request_kwargs()
+            )
+            response.raise_for_status()
+        except requests.RequestException:
+            self.metrics.record(method, time.perf_counter() - start, failed=True)
+            raise
+        self.metrics.record(method, time.perf_counter() - start)
+        return response.content
+
+
+def build_session():
+    retries = Retry(
+        total=settings.WEB3_RETRIES,
+        backoff_factor=settings.WEB3_RETRY_BACKOFF,
+        status_forcelist=(429, 502, 503, 504),
+        # JSON-RPC reads are sent as POST, which urllib3 doesn't retry by default
+        allowed_methods=None,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=settings.WEB3_POOL_SIZE, max_retries=retries
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def build_w3(url, metrics):
+    provider = PooledHTTPProvider(
+        url,
+        build_session(),
+        metrics,
+        request_kwargs={"timeout": settings.WEB3_TIMEOUT},
+    )
+    w3 = Web3(provider)
+    w3.middleware_onion.add(rpc_metrics_middleware, "metrics")
+    return w3
+
+
+def provider_uri(chain_id):
+    if chain_id in settings.WEB3_PROVIDER_URIS:
+        return settings.WEB3_PROVIDER_URIS[chain_id]
+    if not settings.WEB3_INFURA_PROJECT_ID:
+        raise ImproperlyConfigured(
+            f"Set WEB3_INFURA_PROJECT_ID, or a node for chain {chain_id} in WEB3_PROVIDER_URIS"
+        )
+    return f"https://{CHAIN_DATA[chain_id][1]}/v3/{settings.WEB3_INFURA_PROJECT_ID}"
+
+
+def get_w3(chain_id: str):
+    if chain_id not in CHAIN_DATA:
+        raise Exception("invalid chain_id")
+    with _clients_lock:
+        if chain_id not in _clients:
+            _clients[chain_id] = build_w3(provider_uri(chain_id), chain_metrics[chain_id])
+        return _clients[chain_id]
+
+
+def get_chain_stats():
+    return {
+        CHAIN_DATA[chain_id][0]: metrics.as_dict()
+        for chain_id, metrics in chain_metrics.items()
+    }
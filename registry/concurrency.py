@@ -0,0 +1,46 @@
+"""
+A process-wide thread pool for running independent network reads (JSON-RPC batches,
+connection checks, IPFS fetches) side by side. The pool is bounded by
+``WEB3_CONCURRENCY``, so no matter how many request threads submit work, a worker
+process never has more than that many outgoing reads in flight.
+
+Tasks run in a copy of the submitting thread's context, so per-request state kept in
+context variables (see ``registry.metrics``) follows the work onto the pool.
+
+Only submit leaf tasks: a task that waits on another task of the same pool can
+deadlock once the pool is saturated. Tasks also shouldn't touch the database, since
+pool threads don't take part in Django's per-request connection handling.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import threading
+
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.WEB3_CONCURRENCY, thread_name_prefix="explorer-io"
+            )
+        return _executor
+
+
+def submit(fn, *args, **kwargs):
+    return get_executor().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def map_concurrently(fn, items):
+    """
+    Return ``[fn(item) for item in items]``, running the calls on the shared pool.
+    A single item is run inline.
+    """
+    items = list(items)
+    if len(items) < 2:
+        return [fn(item) for item in items]
+    return [future.result() for future in [submit(fn, item) for item in items]]
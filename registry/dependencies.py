@@ -0,0 +1,210 @@
+"""
+Resolving the transitive ``build_dependencies`` of a manifest. The manifests of a
+level of the dependency graph are fetched concurrently, each CID only once, and
+every resolved node and complete graph is kept in the shared cache, so subtrees
+shared by several packages are only resolved once.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from functools import partial
+import json
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from ethpm._utils.ipfs import extract_ipfs_path_from_uri, is_ipfs_uri
+from ethpm.exceptions import EthPMValidationError
+
+from .manifest_cache import manifest_cache
+from .shared_cache import shared_cache
+
+# Seconds a graph missing some manifests is cached for, before fetching them again.
+INCOMPLETE_GRAPH_TTL = 60
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class DependencyNode(NamedTuple):
+    ipfs_hash: str
+    package_name: Optional[str]
+    version: Optional[str]
+    # (name, uri) of every build dependency
+    dependencies: Tuple[Tuple[str, str], ...]
+    # why the manifest couldn't be read, None if it was
+    error: Optional[str] = None
+
+
+class DependencyGraph(NamedTuple):
+    root: str
+    nodes: Dict[str, DependencyNode]
+    # (CID, dependency name) of the dependencies closing a cycle
+    cycles: Tuple[Tuple[str, str], ...]
+    # True if the graph has more than DEPENDENCY_GRAPH_MAX_NODES manifests
+    truncated: bool
+
+    @property
+    def complete(self):
+        return not self.truncated and not any(node.error for node in self.nodes.values())
+
+
+class TreeRow(NamedTuple):
+    depth: int
+    name: str
+    uri: str
+    node: Optional[DependencyNode]
+    # "", "deduped" (subtree shown further up), "cycle", "unresolved" or "truncated"
+    status: str
+
+
+def get_executor():
+    # Manifest fetches wait on IPFS requests running on the shared pool of
+    # registry.concurrency, so they need a pool of their own.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.DEPENDENCY_RESOLVER_WORKERS,
+                thread_name_prefix="explorer-dependencies",
+            )
+        return _executor
+
+
+def dependency_cid(uri):
+    if isinstance(uri, str) and is_ipfs_uri(uri):
+        return extract_ipfs_path_from_uri(uri)
+    return None
+
+
+def resolve_dependency_graph(ipfs_hash):
+    """
+    Return the ``DependencyGraph`` of the manifest at ``ipfs_hash``.
+    """
+    return shared_cache.get_or_set(
+        "dependency_graph",
+        ipfs_hash,
+        partial(build_dependency_graph, ipfs_hash, settings.DEPENDENCY_GRAPH_MAX_NODES),
+        timeout=lambda graph: None if graph.complete else INCOMPLETE_GRAPH_TTL,
+    )
+
+
+def build_dependency_graph(root, max_nodes):
+    nodes = {}
+    level = [root]
+    truncated = False
+    while level:
+        if len(nodes) + len(level) > max_nodes:
+            level = level[:max_nodes - len(nodes)]
+            truncated = True
+        executor = get_executor()
+        futures = [
+            executor.submit(contextvars.copy_context().run, get_dependency_node, ipfs_hash)
+            for ipfs_hash in level
+        ]
+        for future in futures:
+            node = future.result()
+            nodes[node.ipfs_hash] = node
+        level = list(dict.fromkeys(
+            cid
+            for node in (nodes[ipfs_hash] for ipfs_hash in level)
+            for cid in (dependency_cid(uri) for _, uri in node.dependencies)
+            if cid is not None and cid not in nodes
+        ))
+        if truncated:
+            break
+    return DependencyGraph(root, nodes, find_cycles(root, nodes), truncated)
+
+
+def get_dependency_node(ipfs_hash):
+    try:
+        return shared_cache.get_or_set(
+            "dependency_node", ipfs_hash, partial(read_dependency_node, ipfs_hash)
+        )
+    except (EthPMValidationError, json.JSONDecodeError, ValueError) as exc:
+        # not cached, the manifest may be reachable next time
+        return DependencyNode(ipfs_hash, None, None, (), str(exc))
+
+
+def read_dependency_node(ipfs_hash):
+    manifest = manifest_cache.get(ipfs_hash).manifest
+    return DependencyNode(
+        ipfs_hash,
+        manifest["package_name"],
+        manifest["version"],
+        tuple(sorted(manifest.get("build_dependencies", {}).items())),
+    )
+
+
+def find_cycles(root, nodes):
+    # Depth first search, a dependency on a manifest that is on the current path
+    # closes a cycle. Only manifests whose CID can't be verified could form one.
+    cycles = []
+    finished = set()
+    path = {root}
+    stack = [(root, iter(nodes[root].dependencies))]
+    while stack:
+        ipfs_hash, dependencies = stack[-1]
+        for name, uri in dependencies:
+            cid = dependency_cid(uri)
+            if cid in path:
+                cycles.append((ipfs_hash, name))
+            elif cid in nodes and cid not in finished:
+                path.add(cid)
+                stack.append((cid, iter(nodes[cid].dependencies)))
+                break
+        else:
+            stack.pop()
+            path.discard(ipfs_hash)
+            finished.add(ipfs_hash)
+    return tuple(cycles)
+
+
+def iter_tree_rows(graph):
+    """
+    Yield the dependency tree of ``graph`` as ``TreeRow``s, depth first. Subtrees
+    shared by several dependencies are only expanded the first time they appear.
+    """
+    cycles = set(graph.cycles)
+    expanded = {graph.root}
+    root = graph.nodes[graph.root]
+    stack = [(root, iter(root.dependencies))]
+    while stack:
+        node, dependencies = stack[-1]
+        dependency = next(dependencies, None)
+        if dependency is None:
+            stack.pop()
+            continue
+        name, uri = dependency
+        cid = dependency_cid(uri)
+        child = graph.nodes.get(cid)
+        if (node.ipfs_hash, name) in cycles:
+            status = "cycle"
+        elif cid is None:
+            status = "unresolved"
+        elif child is None:
+            status = "truncated"
+        elif cid in expanded:
+            status = "deduped"
+        else:
+            status = ""
+            expanded.add(cid)
+        yield TreeRow(len(stack), name, uri, child, status)
+        if not status:
+            stack.append((child, iter(child.dependencies)))
+
+
+def serialize_graph(graph):
+    return {
+        "root": graph.root,
+        "nodes": {
+            ipfs_hash: {
+                "package_name": node.package_name,
+                "version": node.version,
+                "build_dependencies": dict(node.dependencies),
+                "error": node.error,
+            }
+            for ipfs_hash, node in graph.nodes.items()
+        },
+        "cycles": [list(cycle) for cycle in graph.cycles],
+        "truncated": graph.truncated,
+    }
@@ -0,0 +1,149 @@
+"""
+The directory of well known mainnet registries shown on the index and directory
+pages. ``refresh_directory`` reads every registry from the chain and atomically
+replaces the snapshot at ``DIRECTORY_SNAPSHOT_PATH``, so pages only ever read a
+complete snapshot, re-parsed only when the file changes.
+"""
+import json
+import logging
+from pathlib import Path
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+import requests
+from web3.exceptions import BadFunctionCallOutput, NameNotFound
+
+from .ens_cache import ens_cache
+from .models import get_indexed_package_page, refresh_registry
+from .utils import write_file_atomically
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY_CHAIN_ID = "1"
+# Number of package names shown per registry, next to its package count.
+DIRECTORY_PREVIEW_SIZE = 3
+
+# package data hardcoded here, served until refresh_directory writes a snapshot
+default_registries = {
+    "defi.snakecharmers.eth": {
+        "package_count": 3,
+        "packages": [
+            "compound",
+            "dydx",
+            "moloch-dao",
+        ]
+    },
+    "erc20.snakecharmers.eth": {
+        "package_count": 20,
+        "packages": [
+            "dai-dai",
+            "brave-bat",
+            "usdcoin-usdc-dai",
+        ]
+    },
+    "dappsys.snakecharmers.eth":{
+        "package_count": 15,
+        "packages": [
+            "ds-math",
+            "ds-token",
+            "ds-vault",
+        ]
+    },
+    "erc721.snakecharmers.eth": {
+        "package_count": 20,
+        "packages": [
+            "cryptokitties-ck",
+            "decentraland-land",
+            "godsunchained-gods",
+        ]
+    },
+    "zeppelin.snakecharmers.eth":{
+        "package_count": 15,
+        "packages": [
+            "cryptography",
+            "ownership",
+            "payment",
+        ]
+    },
+    "maker.snakecharmers.eth":{
+        "package_count": 12,
+        "packages": [
+            "flopper",
+            "maker-otc",
+            "sai",
+        ]
+    },
+    "ens.snakecharmers.eth": {
+        "package_count": 3,
+        "packages": [
+            "ens",
+            "ethregistrar",
+            "resolvers",
+        ]
+    },
+    "multisig.snakecharmers.eth": {
+        "package_count": 1,
+        "packages": [
+            "gnosis",
+        ]
+    },
+}
+
+_snapshot = (None, default_registries)
+_snapshot_lock = threading.Lock()
+
+
+def load_directory():
+    """
+    Return the latest directory snapshot, ``{ens_name: {"package_count", "packages"}}``.
+    """
+    global _snapshot
+    path = Path(settings.DIRECTORY_SNAPSHOT_PATH)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return default_registries
+    with _snapshot_lock:
+        if _snapshot[0] != mtime:
+            _snapshot = (mtime, json.loads(path.read_bytes())["registries"])
+        return _snapshot[1]
+
+
+def refresh_directory(w3):
+    """
+    Re-read every directory registry and replace the snapshot. Registries that
+    can't be read keep their previous entry. Returns the new registries.
+    """
+    previous = load_directory()
+    registries = {}
+    for ens_name in previous:
+        try:
+            registries[ens_name] = read_directory_entry(w3, ens_name)
+        except (
+            BadFunctionCallOutput, NameNotFound, requests.RequestException, ValueError
+        ) as exc:
+            logger.warning("Could not refresh directory registry %s: %s", ens_name, exc)
+            registries[ens_name] = previous[ens_name]
+    snapshot = {"updated_at": timezone.now().isoformat(), "registries": registries}
+    write_file_atomically(
+        Path(settings.DIRECTORY_SNAPSHOT_PATH), json.dumps(snapshot).encode("utf-8")
+    )
+    return registries
+
+
+def read_directory_entry(w3, ens_name):
+    address = ens_cache.address(w3, DIRECTORY_CHAIN_ID, ens_name)
+    if not address:
+        raise NameNotFound(f"No address found after ENS lookup for name: {ens_name}.")
+    registry = refresh_registry(
+        w3, DIRECTORY_CHAIN_ID, address, ens_name, limit=DIRECTORY_PREVIEW_SIZE
+    )
+    if not registry.is_valid:
+        raise BadFunctionCallOutput(f"{address} does not look like an ERC1319 registry")
+    preview = get_indexed_package_page(registry, 0, DIRECTORY_PREVIEW_SIZE)
+    return {
+        "address": registry.address,
+        "package_count": registry.package_count,
+        "packages": [package.name for package in preview],
+    }
@@ -0,0 +1,121 @@
+from collections import Counter
+from functools import partial
+import threading
+import time
+
+from django.conf import settings
+from ens import ENS
+from ens.exceptions import InvalidName
+from eth_utils import is_address, to_checksum_address
+
+from .metrics import count, timed
+from .shared_cache import shared_cache
+
+
+class ENSCache:
+    """
+    Forward and reverse ENS resolutions shared by every request of a worker
+    process, and through the shared cache by every worker. Resolved entries expire
+    after ``ttl`` seconds, failed lookups after ``negative_ttl`` seconds, and no more
+    than ``max_entries`` are kept in memory. Hex addresses are never looked up.
+    """
+
+    def __init__(self, ttl, negative_ttl, max_entries):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.stats = Counter()
+        # (chain_id, kind, key) -> (value, expires_at)
+        self._entries = {}
+        # chain_id -> ENS
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def address(self, w3, chain_id, name):
+        """
+        Return the checksummed address ``name`` resolves to, or ``None``.
+        """
+        if is_address(name):
+            return to_checksum_address(name)
+        return self._resolve(w3, chain_id, "addr", name.lower(), self._lookup_address)
+
+    def name(self, w3, chain_id, address):
+        """
+        Return the verified reverse record of ``address``, or ``None``.
+        """
+        address = to_checksum_address(address)
+        return self._resolve(w3, chain_id, "name", address, self._lookup_name)
+
+    def get_ens(self, w3, chain_id):
+        with self._lock:
+            if chain_id not in self._clients:
+                self._clients[chain_id] = ENS(w3.provider)
+            return self._clients[chain_id]
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "hits": self.stats["hits"],
+                "misses": self.stats["misses"],
+                "entries": len(self._entries),
+            }
+
+    def _resolve(self, w3, chain_id, kind, key, lookup):
+        cache_key = (chain_id, kind, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[1] > now:
+                self.stats["hits"] += 1
+                count("ens_cache", "hits")
+                return entry[0]
+            self.stats["misses"] += 1
+        count("ens_cache", "misses")
+
+        # other workers may have resolved it already, the shared entry keeps the
+        # expiry time of the original lookup
+        value, expires_at = shared_cache.get_or_set(
+            "ens",
+            f"{chain_id}:{kind}:{key}",
+            partial(self._lookup, w3, chain_id, kind, key, lookup),
+            timeout=lambda entry: entry[1] - time.time(),
+        )
+        with self._lock:
+            self._entries.pop(cache_key, None)
+            if len(self._entries) >= self.max_entries:
+                self._evict(now)
+            self._entries[cache_key] = (value, now + expires_at - time.time())
+        return value
+
+    def _lookup(self, w3, chain_id, kind, key, lookup):
+        with timed("ens", kind):
+            value = lookup(self.get_ens(w3, chain_id), key)
+        ttl = self.ttl if value else self.negative_ttl
+        return value, time.time() + ttl
+
+    def _evict(self, now):
+        expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        # drop the oldest entries if everything is still fresh
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def _lookup_address(self, ens, name):
+        try:
+            return ens.address(name)
+        except InvalidName:
+            return None
+
+    def _lookup_name(self, ens, address):
+        name = ens.name(address)
+        # Anyone can claim any name in their reverse record, only trust names that
+        # resolve back to the address.
+        if name and self._lookup_address(ens, name) == address:
+            return name
+        return None
+
+
+ens_cache = ENSCache(
+    settings.ENS_CACHE_TTL, settings.ENS_NEGATIVE_CACHE_TTL, settings.ENS_CACHE_MAX_ENTRIES
+)
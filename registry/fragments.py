@@ -0,0 +1,18 @@
+"""
+Rendered html fragments, kept in the shared cache. A fragment is keyed on everything
+its content depends on, like the release count of a package or the CID of a
+manifest, so cached fragments never need invalidating and are stored without a
+timeout.
+"""
+from django.core.cache.utils import make_template_fragment_key
+
+from .shared_cache import shared_cache
+
+
+def get_fragment(fragment_name, vary_on, render):
+    """
+    Return the cached fragment ``fragment_name`` for ``vary_on``, calling ``render``
+    to render and cache it if it isn't cached yet.
+    """
+    key = make_template_fragment_key(fragment_name, vary_on)
+    return shared_cache.get_or_set("fragment", key, render)
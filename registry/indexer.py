@@ -0,0 +1,108 @@
+from django.db import transaction
+from eth_utils import encode_hex, event_abi_to_log_topic
+
+from .models import Package, Release
+from .prefetch import manifest_prefetcher
+from .snapshot import batch_call, ContractCall, get_registry_contract
+
+# Default number of blocks requested per eth_getLogs call.
+DEFAULT_WINDOW = 2000
+
+
+def sync_registry_releases(w3, registry, window=DEFAULT_WINDOW, from_block=0, to_block=None):
+    """
+    Index the registry's ``VersionRelease`` logs from its stored checkpoint (or
+    ``from_block`` for a registry that was never synced) up to ``to_block``, at most
+    ``window`` blocks per ``eth_getLogs`` call. Each window is committed together with
+    the checkpoint, so an interrupted sync resumes where it stopped. Returns the
+    number of new releases indexed.
+
+    Only releases are read from the logs: the package count of the registry and the
+    release counts of the packages released are re-read from the chain at
+    ``to_block``, and owner and validity are left to ``refresh_registry``.
+    """
+    contract = get_registry_contract(w3, registry.address)
+    event = contract.events.VersionRelease()
+    if to_block is None:
+        to_block = w3.eth.blockNumber
+    if registry.last_synced_block is not None:
+        from_block = registry.last_synced_block + 1
+    if from_block <= to_block:
+        # packages created by releases in the windows below count at to_block
+        registry.package_count = contract.functions.numPackageIds().call(
+            block_identifier=to_block
+        )
+
+    new_release_count = 0
+    while from_block <= to_block:
+        window_end = min(from_block + window - 1, to_block)
+        logs = w3.eth.getLogs({
+            "address": registry.address,
+            "fromBlock": from_block,
+            "toBlock": window_end,
+            "topics": [encode_hex(event_abi_to_log_topic(event.abi))],
+        })
+        releases = [event.processLog(log)["args"] for log in logs]
+        release_counts = read_release_counts(w3, contract, releases, to_block)
+        with transaction.atomic():
+            new_release_count += upsert_releases(registry, releases, release_counts)
+            registry.last_synced_block = window_end
+            registry.save(update_fields=["last_synced_block", "package_count"])
+        from_block = window_end + 1
+    return new_release_count
+
+
+def read_release_counts(w3, contract, releases, block_number):
+    """
+    Return the release count of every package released in ``releases`` at
+    ``block_number``, in one batch. A sync that didn't start at the registry's
+    deployment misses older releases, the counts tell the packages missing some.
+    """
+    package_names = list(dict.fromkeys(release["packageName"] for release in releases))
+    release_counts = batch_call(
+        w3,
+        contract,
+        [ContractCall("numReleaseIds", (name,)) for name in package_names],
+        block_id=hex(block_number),
+    )
+    return dict(zip(package_names, release_counts))
+
+
+def upsert_releases(registry, releases, release_counts):
+    if not releases:
+        return 0
+    package_names = list(release_counts)
+    indexed = {
+        package.name: package
+        for package in registry.packages.filter(name__in=package_names)
+    }
+    # Logs don't tell a package's position in getAllPackageIds, so packages created
+    # here stay out of the paged listing until a page holding them is read.
+    Package.objects.bulk_create(
+        Package(registry=registry, name=name)
+        for name in package_names
+        if name not in indexed
+    )
+    packages = {
+        package.name: package
+        for package in registry.packages.filter(name__in=package_names)
+    }
+    indexed_releases = Release.objects.filter(package__in=packages.values())
+    release_count_before = indexed_releases.count()
+    Release.objects.bulk_create(
+        (
+            Release(
+                package=packages[release["packageName"]],
+                version=release["version"],
+                manifest_uri=release["manifestURI"],
+            )
+            for release in releases
+        ),
+        ignore_conflicts=True,
+    )
+    for name, package in packages.items():
+        if package.release_count != release_counts[name]:
+            package.release_count = release_counts[name]
+            package.save(update_fields=["release_count"])
+    manifest_prefetcher.prefetch(release["manifestURI"] for release in releases)
+    return indexed_releases.count() - release_count_before
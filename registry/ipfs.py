@@ -0,0 +1,277 @@
+"""
+Fetching IPFS content from several gateways. A fetch starts on the gateway with the
+lowest latency (an EWMA of its recent requests) and, if it hasn't answered after
+``IPFS_HEDGE_DELAY`` seconds or fails, the same content is requested from the next
+one. The first answer that hashes to the requested CID wins, so fast but untrusted
+public gateways can't serve tampered content.
+"""
+from collections import Counter
+import hashlib
+import logging
+import queue
+import threading
+import time
+from urllib.parse import urlparse
+
+from base58 import b58encode
+from django.conf import settings
+import requests
+from requests.adapters import HTTPAdapter
+
+from .concurrency import submit
+from .metrics import count, record
+from .utils import encode_varint
+
+logger = logging.getLogger(__name__)
+
+# `ipfs add` defaults: 256 KiB chunks, at most 174 links per node of the file DAG.
+CHUNK_SIZE = 256 * 1024
+LINKS_PER_NODE = 174
+
+UNIXFS_FILE = 2
+SHA2_256 = b"\x12\x20"
+
+
+class ContentUnavailable(ValueError):
+    pass
+
+
+class ContentMismatch(Exception):
+    pass
+
+
+def protobuf_field(number, value):
+    if isinstance(value, int):
+        return encode_varint(number << 3) + encode_varint(value)
+    return encode_varint(number << 3 | 2) + encode_varint(len(value)) + value
+
+
+def unixfs_file(data, filesize, blocksizes=()):
+    return b"".join((
+        protobuf_field(1, UNIXFS_FILE),
+        protobuf_field(2, data) if data is not None else b"",
+        protobuf_field(3, filesize),
+        *(protobuf_field(4, size) for size in blocksizes),
+    ))
+
+
+def dag_node(data, links=()):
+    # go-ipfs writes the links ahead of the data, which changes the node's hash
+    encoded_links = (
+        protobuf_field(1, link_hash) + protobuf_field(2, b"") + protobuf_field(3, size)
+        for link_hash, size in links
+    )
+    return b"".join((
+        *(protobuf_field(2, link) for link in encoded_links),
+        protobuf_field(1, data),
+    ))
+
+
+def compute_cid(content):
+    """
+    Return the CIDv0 ``ipfs add`` assigns to ``content`` with its default chunking
+    and balanced DAG layout.
+    """
+    # (multihash, cumulative DAG size, file size) of every node of the current level
+    nodes = []
+    for offset in range(0, max(len(content), 1), CHUNK_SIZE):
+        chunk = content[offset:offset + CHUNK_SIZE]
+        # go-ipfs leaves the data field out of the node of an empty file
+        node = dag_node(unixfs_file(chunk or None, len(chunk)))
+        nodes.append((SHA2_256 + hashlib.sha256(node).digest(), len(node), len(chunk)))
+    while len(nodes) > 1:
+        parents = []
+        for offset in range(0, len(nodes), LINKS_PER_NODE):
+            children = nodes[offset:offset + LINKS_PER_NODE]
+            filesize = sum(child[2] for child in children)
+            node = dag_node(
+                unixfs_file(None, filesize, [child[2] for child in children]),
+                [(child[0], child[1]) for child in children],
+            )
+            parents.append((
+                SHA2_256 + hashlib.sha256(node).digest(),
+                len(node) + sum(child[1] for child in children),
+                filesize,
+            ))
+        nodes = parents
+    return b58encode(nodes[0][0]).decode("ascii")
+
+
+def is_verifiable(cid):
+    return len(cid) == 46 and cid.startswith("Qm")
+
+
+class Gateway:
+    """
+    An IPFS HTTP gateway, or with ``node`` set, the HTTP API of an IPFS node. A node
+    checks the blocks it serves itself, so content it returns is trusted even when
+    its CID can't be verified here.
+    """
+
+    def __init__(self, url, concurrency, node=False):
+        self.url = url.rstrip("/")
+        self.node = node
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.latency = None
+        self.stats = Counter()
+
+    def request(self, session, cid, timeout):
+        if self.node:
+            return session.post(
+                f"{self.url}/api/v0/cat", params={"arg": cid}, timeout=timeout
+            )
+        return session.get(f"{self.url}/{cid}", timeout=timeout)
+
+    def record(self, seconds, outcome, alpha):
+        self.stats[outcome] += 1
+        self.latency = seconds if self.latency is None else (
+            alpha * seconds + (1 - alpha) * self.latency
+        )
+
+
+class IPFSFetcher:
+    def __init__(self, gateways, hedge_delay, timeout, pool_size, latency_alpha=0.3):
+        self.gateways = gateways
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.latency_alpha = latency_alpha
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(len(gateways), 1), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+
+    def fetch(self, cid):
+        """
+        Return the content of ``cid``, raising ``ContentUnavailable`` if no gateway
+        returned it within ``timeout`` seconds.
+        """
+        candidates = self.rank(cid)
+        if not candidates:
+            raise ContentUnavailable(f"No configured IPFS gateway can serve {cid}")
+        deadline = time.monotonic() + self.timeout
+        responses = queue.Queue()
+        errors = []
+        in_flight = 0
+        while True:
+            if candidates:
+                gateway = self._claim(candidates, errors, block=not in_flight)
+                if gateway is not None:
+                    submit(self._request, gateway, cid, responses)
+                    in_flight += 1
+            if not in_flight:
+                if candidates:
+                    continue
+                raise ContentUnavailable(f"Could not fetch {cid}: {'; '.join(errors)}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ContentUnavailable(f"Timed out fetching {cid}")
+            try:
+                gateway, content, error = responses.get(
+                    timeout=min(self.hedge_delay, remaining) if candidates else remaining
+                )
+            except queue.Empty:
+                # hedge with the next gateway
+                continue
+            in_flight -= 1
+            if error is None:
+                return content
+            errors.append(f"{gateway.url}: {error}")
+
+    def rank(self, cid):
+        """
+        Return the gateways able to serve ``cid``, fastest first. Gateways without
+        any recorded latency are tried first, so they get measured.
+        """
+        verifiable = is_verifiable(cid)
+        if not verifiable and not any(gateway.node for gateway in self.gateways):
+            # Content of other CID versions can't be checked here. Without a node,
+            # it is fetched from the gateways unverified, as before checks existed.
+            logger.warning("Fetching %s unverified, set IPFS_NODE_URL to verify it", cid)
+            verifiable = True
+        with self._lock:
+            return sorted(
+                (gateway for gateway in self.gateways if verifiable or gateway.node),
+                key=lambda gateway: gateway.latency or 0,
+            )
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                gateway.url: {
+                    "latency_seconds": gateway.latency,
+                    "ok": gateway.stats["ok"],
+                    "errors": gateway.stats["errors"],
+                    "mismatches": gateway.stats["mismatches"],
+                }
+                for gateway in self.gateways
+            }
+
+    def _claim(self, candidates, errors, block):
+        # Take the first candidate with a free slot. Busy gateways are skipped,
+        # unless nothing is in flight, then wait for the fastest one.
+        for gateway in candidates:
+            if gateway.slots.acquire(blocking=False):
+                candidates.remove(gateway)
+                return gateway
+        if not block:
+            return None
+        gateway = candidates.pop(0)
+        if gateway.slots.acquire(timeout=self.timeout):
+            return gateway
+        errors.append(f"{gateway.url}: too many requests in flight")
+        return None
+
+    def _request(self, gateway, cid, responses):
+        start = time.perf_counter()
+        try:
+            response = gateway.request(self.session, cid, self.timeout)
+            response.raise_for_status()
+            content = response.content
+            if is_verifiable(cid) and compute_cid(content) != cid:
+                raise ContentMismatch(f"content doesn't match {cid}")
+        except requests.RequestException as exc:
+            self._record(gateway, time.perf_counter() - start, "errors")
+            responses.put((gateway, None, str(exc)))
+        except ContentMismatch as exc:
+            self._record(gateway, time.perf_counter() - start, "mismatches")
+            responses.put((gateway, None, str(exc)))
+        except Exception as exc:
+            # fetch() waits for every request it started, so whatever went wrong
+            # must be reported as a failed attempt
+            logger.exception("Could not fetch %s from %s", cid, gateway.url)
+            self._record(gateway, time.perf_counter() - start, "errors")
+            responses.put((gateway, None, f"{type(exc).__name__}: {exc}"))
+        else:
+            self._record(gateway, time.perf_counter() - start, "ok")
+            responses.put((gateway, content, None))
+        finally:
+            gateway.slots.release()
+
+    def _record(self, gateway, seconds, outcome):
+        record("ipfs", urlparse(gateway.url).netloc, seconds)
+        if outcome != "ok":
+            count("ipfs_failed", outcome)
+            # failing gateways are ranked as if they took the whole timeout
+            seconds = max(seconds, self.timeout)
+        with self._lock:
+            gateway.record(seconds, outcome, self.latency_alpha)
+
+
+def build_gateways():
+    gateways = [
+        Gateway(url, settings.IPFS_GATEWAY_CONCURRENCY) for url in settings.IPFS_GATEWAYS
+    ]
+    if settings.IPFS_NODE_URL:
+        gateways.append(
+            Gateway(settings.IPFS_NODE_URL, settings.IPFS_GATEWAY_CONCURRENCY, node=True)
+        )
+    return gateways
+
+
+ipfs_fetcher = IPFSFetcher(
+    build_gateways(),
+    settings.IPFS_HEDGE_DELAY,
+    settings.IPFS_TIMEOUT,
+    settings.IPFS_GATEWAY_CONCURRENCY,
+)
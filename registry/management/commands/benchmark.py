@@ -0,0 +1,696 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import itertools
+import json
+import os
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings, RequestFactory
+from django.utils.html import escape
+from web3 import EthereumTesterProvider, Web3
+from web3.providers.auto import load_provider_from_uri
+
+from registry import clients, search, views
+from registry.clients import build_w3, ChainMetrics
+from registry.concurrency import submit
+from registry.constants import CHAIN_DATA
+from registry.ipfs import compute_cid, Gateway, ipfs_fetcher
+from registry.manifest_cache import manifest_cache
+from registry.metrics import collect, rpc_metrics_middleware
+from registry.models import Manifest
+from registry.prefetch import manifest_prefetcher
+from registry.previews import iter_manifest_preview
+from registry.shared_cache import SharedCache
+from registry.snapshot import load_registry_snapshot
+from registry.stubs import (
+    StubIPFSGateway,
+    StubRedisServer,
+    StubRegistryRPC,
+    synthetic_manifest,
+)
+
+STUB_REGISTRY_ADDRESS = "0x" + "12" * 20
+# Views are benchmarked against an eth-tester chain standing in for this chain.
+VIEWS_CHAIN_ID = "3"
+
+# Run in a fresh interpreter by the boot benchmark: load the WSGI application like
+# a worker does, then serve the index and time its first body byte.
+BOOT_SCRIPT = """
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+start = time.perf_counter()
+from ethpm_explorer.wsgi import application
+boot_seconds = time.perf_counter() - start
+heavy_modules = sorted(name for name in ("ens", "ethpm", "web3") if name in sys.modules)
+
+def first_byte():
+    environ = {"HTTP_HOST": "localhost"}
+    setup_testing_defaults(environ)
+    start = time.perf_counter()
+    body = iter(application(environ, lambda status, headers: None))
+    next(body)
+    return time.perf_counter() - start
+
+print(json.dumps({
+    "boot_seconds": boot_seconds,
+    "heavy_modules": heavy_modules,
+    "first_byte_seconds": first_byte(),
+    "warm_first_byte_seconds": first_byte(),
+}))
+"""
+
+
+def legacy_registry_reads(w3, address):
+    # The per-package read pattern Registry.__init__ used before registry snapshots.
+    w3.pm.set_registry(address)
+    w3.pm.registry.registry.functions.owner().call()
+    w3.pm.get_package_count()
+    return [
+        (name, w3.pm.get_release_count(name))
+        for name in w3.pm.get_all_package_names()
+    ]
+
+
+def snapshot_registry_reads(w3, address):
+    return load_registry_snapshot(w3, address).packages
+
+
+def bench_registry_snapshot(options):
+    for package_count in options["packages"]:
+        with StubRegistryRPC(package_count) as stub:
+            w3 = Web3(load_provider_from_uri(stub.url))
+            w3.enable_unstable_package_management_api()
+            result = {"scenario": "registry_snapshot", "packages": package_count}
+            for name, reads in (
+                ("legacy", legacy_registry_reads),
+                ("snapshot", snapshot_registry_reads),
+            ):
+                stub.reset()
+                start = time.perf_counter()
+                packages = reads(w3, STUB_REGISTRY_ADDRESS)
+                result[name] = {
+                    "seconds": round(time.perf_counter() - start, 4),
+                    "round_trips": stub.round_trips,
+                    "rpc_calls": sum(stub.rpc_calls.values()),
+                    "packages_read": len(packages),
+                }
+            yield result
+
+
+@contextmanager
+def isolated_manifest_cache():
+    # Keep synthetic manifests, previews and fragments out of the real caches and
+    # search index.
+    with tempfile.TemporaryDirectory() as cache_dir:
+        original_state = vars(manifest_cache).copy()
+        original_index = search.search_index
+        manifest_cache.__init__(cache_dir, manifest_cache.max_bytes)
+        search.search_index = search.SearchIndex(Path(cache_dir) / "search.sqlite3")
+        try:
+            fragment_cache = {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": cache_dir,
+            }
+            with override_settings(
+                MANIFEST_CACHE_DIR=cache_dir, CACHES={"default": fragment_cache}
+            ):
+                yield
+        finally:
+            vars(manifest_cache).update(original_state)
+            search.search_index = original_index
+
+
+def measure_peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def legacy_inline_tables(manifest):
+    # Approximates the fully inlined source and contract type tables Manifest built
+    # eagerly before previews were streamed with lazily loaded fragments.
+    sources = [escape(source) for source in manifest.data["sources"].values()]
+    contract_types = [
+        escape(json.dumps(contract_type))
+        for contract_type in manifest.data["contract_types"].values()
+    ]
+    return "".join(sources) + "".join(contract_types)
+
+
+def bench_manifest_memory(options):
+    with isolated_manifest_cache():
+        for size in options["manifest_bytes"]:
+            raw = synthetic_manifest(size)
+            ipfs_hash = f"QmSynthetic{size}"
+            manifest_cache.put(ipfs_hash, raw)
+            manifest = Manifest(ipfs_hash)
+            # warm up template loading so it isn't attributed to either strategy
+            deque(iter_manifest_preview(manifest), maxlen=0)
+            inline = measure_peak_memory(lambda: legacy_inline_tables(manifest))
+            buffered = measure_peak_memory(
+                lambda: "".join(iter_manifest_preview(manifest)).encode("utf-8")
+            )
+            streamed = measure_peak_memory(
+                lambda: deque(
+                    (chunk.encode("utf-8") for chunk in iter_manifest_preview(manifest)),
+                    maxlen=0,
+                )
+            )
+            yield {
+                "scenario": "manifest_memory",
+                "manifest_bytes": len(raw),
+                "inline_peak_bytes": inline,
+                "buffered_peak_bytes": buffered,
+                "streamed_peak_bytes": streamed,
+            }
+
+
+def package_releases(count, packages=20):
+    # ``count`` releases of ``packages`` packages, the releases of a package sharing
+    # their contract types and sources, and every package sharing a token contract
+    # type, as releases of ERC20 packages do.
+    base = json.loads(synthetic_manifest(100_000))
+    token = base["contract_types"].pop("Contract0")
+    for index in range(count):
+        package = index % packages
+        manifest = dict(base, package_name=f"package-{package}", version=f"1.0.{index}")
+        manifest["sources"] = {
+            path: f"{source} {package}" for path, source in base["sources"].items()
+        }
+        manifest["contract_types"] = {
+            "Token": token,
+            **{
+                f"{name}{package}": {
+                    "abi": [],
+                    "deployment_bytecode": {"bytecode": f"{bytecode['bytecode']}{package:02x}"},
+                }
+                for name, bytecode in (
+                    (name, contract_type["deployment_bytecode"])
+                    for name, contract_type in base["contract_types"].items()
+                )
+            },
+        }
+        yield f"QmRelease{index}", json.dumps(
+            manifest, sort_keys=True, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def directory_size(path):
+    return sum(child.stat().st_size for child in Path(path).rglob("*") if child.is_file())
+
+
+def bench_manifest_store(options):
+    for count in options["stored_manifests"]:
+        with isolated_manifest_cache():
+            manifest_cache.max_bytes = 2 ** 40
+            raw_bytes = 0
+            for ipfs_hash, raw in package_releases(count):
+                manifest_cache.put(ipfs_hash, raw, index=False)
+                raw_bytes += len(raw)
+            memory_bytes = manifest_cache.size
+            stored_bytes = directory_size(manifest_cache.cache_dir) - directory_size(
+                manifest_cache.cache_dir / "search.sqlite3"
+            )
+            # read every manifest back from disk, sharing the blobs already read
+            manifest_cache.__init__(manifest_cache.cache_dir, 2 ** 40)
+            start = time.perf_counter()
+            for ipfs_hash, _ in package_releases(count):
+                manifest_cache.get(ipfs_hash)
+            read_seconds = time.perf_counter() - start
+            yield {
+                "scenario": "manifest_store",
+                "manifests": count,
+                "raw_bytes": raw_bytes,
+                "stored_bytes": stored_bytes,
+                "memory_bytes": memory_bytes,
+                "disk_read_mean_ms": round(read_seconds * 1000 / count, 3),
+            }
+
+
+def registry_page_reads(w3, address):
+    # The chain reads behind a browse page: the connection check and the registry
+    # snapshot, run concurrently as generate_context_for_post does.
+    connected = submit(w3.isConnected)
+    snapshot = load_registry_snapshot(w3, address)
+    return connected.result(), snapshot
+
+
+def bench_throughput(options):
+    # One gunicorn worker serves ``threads`` requests at a time: 1 for the sync
+    # worker class, --threads for gthread.
+    for package_count in options["packages"]:
+        with StubRegistryRPC(package_count, latency=options["rpc_latency"]) as stub:
+            w3 = build_w3(stub.url, ChainMetrics())
+            result = {
+                "scenario": "throughput",
+                "packages": package_count,
+                "requests": options["requests"],
+                "rpc_latency": options["rpc_latency"],
+            }
+            for threads in options["threads"]:
+                with ThreadPoolExecutor(max_workers=threads) as worker:
+                    start = time.perf_counter()
+                    deque(
+                        worker.map(
+                            lambda _: registry_page_reads(w3, STUB_REGISTRY_ADDRESS),
+                            range(options["requests"]),
+                        ),
+                        maxlen=0,
+                    )
+                    seconds = time.perf_counter() - start
+                result[f"threads_{threads}"] = {
+                    "seconds": round(seconds, 4),
+                    "requests_per_second": round(options["requests"] / seconds, 2),
+                }
+            yield result
+
+
+SEARCH_QUERIES = (
+    ("package_name", "package-421", {}),
+    ("term", "token", {}),
+    ("prefix", "own", {}),
+    ("facet", "", {"license": "MIT"}),
+    ("term_and_facets", "math", {"keyword": "erc20", "chain": "mainnet"}),
+)
+
+
+def search_manifests(count):
+    # Small manifests with varied metadata, to spread hits over terms and facets.
+    licenses = ("MIT", "Apache-2.0", "GPL-3.0", "Unlicense")
+    keywords = ("erc20", "erc721", "token", "defi", "math", "ownership", "dao")
+    genesis = "d4e56740f876aef8c010b86a40d5f56745a118d0906a34e69aec8c0db1cb8fa3"
+    for index in range(count):
+        yield f"QmSearch{index}", {
+            "manifest_version": "2",
+            "package_name": f"package-{index}",
+            "version": f"1.0.{index % 7}",
+            "meta": {
+                "authors": [f"author-{index % 50}"],
+                "license": licenses[index % len(licenses)],
+                "description": f"Package {index} built around {keywords[index % 5]} contracts.",
+                "keywords": [keywords[index % 7], keywords[(index // 7) % 7]],
+            },
+            "contract_types": {f"Ownable{index % 13}": {}, f"SafeMath{index % 3}": {}},
+            "deployments": (
+                {f"blockchain://{genesis}/block/{'ab' * 32}": {}} if index % 2 else {}
+            ),
+        }
+
+
+def bench_search(options):
+    with tempfile.TemporaryDirectory() as index_dir:
+        for count in options["manifests"]:
+            index = search.SearchIndex(Path(index_dir) / f"search-{count}.sqlite3")
+            start = time.perf_counter()
+            index.add_many(search_manifests(count))
+            result = {
+                "scenario": "search",
+                "manifests": count,
+                "index_seconds": round(time.perf_counter() - start, 4),
+            }
+            for name, query, filters in SEARCH_QUERIES:
+                index.search(query, filters)
+                start = time.perf_counter()
+                for _ in range(10):
+                    found = index.search(query, filters)
+                result[name] = {
+                    "mean_ms": round((time.perf_counter() - start) * 100, 3),
+                    "total": found["total"],
+                }
+            yield result
+
+
+@contextmanager
+def chain_client(chain_id, w3):
+    # Serve requests for ``chain_id`` from ``w3``.
+    original = clients._clients.get(chain_id)
+    clients._clients[chain_id] = w3
+    try:
+        yield
+    finally:
+        if original is None:
+            del clients._clients[chain_id]
+        else:
+            clients._clients[chain_id] = original
+
+
+@contextmanager
+def ipfs_gateways(*urls):
+    original = ipfs_fetcher.gateways
+    ipfs_fetcher.gateways = [Gateway(url, settings.IPFS_GATEWAY_CONCURRENCY) for url in urls]
+    try:
+        yield
+    finally:
+        ipfs_fetcher.gateways = original
+
+
+@contextmanager
+def rolled_back():
+    # Whatever the benchmarked views index is never committed.
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def deploy_tester_registry(package_count, releases, manifest_uris):
+    w3 = Web3(EthereumTesterProvider())
+    w3.enable_unstable_package_management_api()
+    w3.eth.defaultAccount = w3.eth.accounts[0]
+    address = w3.pm.deploy_and_set_registry()
+    uris = itertools.cycle(manifest_uris)
+    for index in range(package_count):
+        for version in range(releases):
+            w3.pm.registry._release(f"package-{index}", f"1.0.{version}", next(uris))
+    w3.middleware_onion.add(rpc_metrics_middleware, "metrics")
+    return w3, address
+
+
+def rpc_calls(request_metrics):
+    single = sum(
+        calls
+        for (kind, name), (calls, _) in request_metrics.timings.items()
+        if kind == "rpc" and name != "batch"
+    )
+    batched = sum(
+        amount for (kind, _), amount in request_metrics.counts.items() if kind == "rpc_batched"
+    )
+    return single + batched
+
+
+def ipfs_fetches(request_metrics):
+    return sum(
+        calls for (kind, _), (calls, _) in request_metrics.timings.items() if kind == "ipfs"
+    )
+
+
+def call_view(view, *args):
+    response = view(*args)
+    if response.status_code != 200:
+        raise CommandError(f"{view.__name__} answered {response.status_code}")
+    # streamed bodies are only produced while they are consumed
+    if response.streaming:
+        deque(response.streaming_content, maxlen=0)
+    return response
+
+
+def measure_view(iterations, view, *args):
+    """
+    Call ``view`` ``iterations`` times. The first call runs against cold caches and
+    an empty index, the following ones show the steady state.
+    """
+    runs = []
+    for _ in range(iterations):
+        with collect() as request_metrics:
+            start = time.perf_counter()
+            call_view(view, *args)
+            runs.append((time.perf_counter() - start, request_metrics))
+    cold_seconds, cold_metrics = runs[0]
+    warm_seconds = [seconds for seconds, _ in runs[1:]]
+    return {
+        "cold_ms": round(cold_seconds * 1000, 2),
+        "cold_rpc_calls": rpc_calls(cold_metrics),
+        "cold_ipfs_fetches": ipfs_fetches(cold_metrics),
+        "warm_ms": round(statistics.median(warm_seconds) * 1000, 2),
+        "warm_rpc_calls": rpc_calls(runs[-1][1]),
+        "warm_peak_bytes": measure_peak_memory(lambda: call_view(view, *args)),
+    }
+
+
+def bench_views(options):
+    if options["iterations"] < 2:
+        raise CommandError("--iterations must be at least 2")
+    manifests = {}
+    for size in options["manifest_bytes"]:
+        raw = synthetic_manifest(size)
+        manifests[compute_cid(raw)] = raw
+    chain_name = CHAIN_DATA[VIEWS_CHAIN_ID][0]
+    factory = RequestFactory()
+
+    for package_count in options["view_packages"]:
+        start = time.perf_counter()
+        w3, address = deploy_tester_registry(
+            package_count, options["releases"], [f"ipfs://{cid}" for cid in manifests]
+        )
+        result = {
+            "scenario": "views",
+            "packages": package_count,
+            "releases": options["releases"],
+            "setup_seconds": round(time.perf_counter() - start, 4),
+        }
+        package_data_request = factory.post("/", {
+            "chain_id": VIEWS_CHAIN_ID,
+            "registry_address": address,
+            "package_name": f"package-{package_count // 2}",
+        })
+        package_data_request._dont_enforce_csrf_checks = True
+
+        with StubIPFSGateway(manifests, latency=options["ipfs_latency"]) as gateway, \
+                ipfs_gateways(gateway.gateway_url), chain_client(VIEWS_CHAIN_ID, w3), \
+                rolled_back(), isolated_manifest_cache():
+            result["index"] = measure_view(options["iterations"], views.index, factory.get("/"))
+            result["browse"] = measure_view(
+                options["iterations"], views.browse, factory.get("/"), chain_name, address
+            )
+            result["get_package_data"] = measure_view(
+                options["iterations"], views.get_package_data, package_data_request
+            )
+            # don't let prefetched manifests turn the cold manifest runs into cache hits
+            manifest_prefetcher.join()
+            for cid, raw in manifests.items():
+                with isolated_manifest_cache():
+                    result[f"manifest_{len(raw)}"] = measure_view(
+                        options["iterations"], views.manifest, factory.get("/"), cid
+                    )
+        yield result
+
+
+def boot_worker(preload, cache_path):
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE="ethpm_explorer.settings",
+        PRELOAD="1" if preload else "",
+        SHARED_CACHE_PATH=cache_path,
+        # clients are built without connecting, any project id will do
+        WEB3_INFURA_PROJECT_ID=settings.WEB3_INFURA_PROJECT_ID or "benchmark",
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", BOOT_SCRIPT],
+        cwd=settings.BASE_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False,
+    )
+    if process.returncode:
+        raise CommandError(f"Worker failed to boot: {process.stderr.decode()[-2000:]}")
+    return json.loads(process.stdout.decode().splitlines()[-1])
+
+
+def bench_boot(options):
+    # Every run boots a new interpreter, so imports are as cold as in a new worker.
+    for preload in (False, True):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            runs = [
+                boot_worker(preload, f"{cache_dir}/shared.sqlite3")
+                for _ in range(options["boots"])
+            ]
+        yield {
+            "scenario": "boot",
+            "preload": preload,
+            "boots": options["boots"],
+            "heavy_modules": runs[-1]["heavy_modules"],
+            **{
+                key.replace("_seconds", "_ms"): round(
+                    statistics.median(run[key] for run in runs) * 1000, 2
+                )
+                for key in ("boot_seconds", "first_byte_seconds", "warm_first_byte_seconds")
+            },
+        }
+
+
+def bench_shared_cache(options):
+    # Every SharedCache stands in for a worker process, with its own in-process
+    # coalescing, all of them serving requests of the same cold key at once.
+    requests = options["concurrent_requests"]
+    with tempfile.TemporaryDirectory() as cache_dir, StubRedisServer() as redis:
+        backends = (
+            ("sqlite", "registry.cache_backends.SQLiteCache", f"{cache_dir}/shared.sqlite3"),
+            ("redis", "registry.cache_backends.RedisCache", redis.url),
+        )
+        for name, backend, location in backends:
+            caches = {"default": {"BACKEND": backend, "LOCATION": location, "TIMEOUT": None}}
+            with override_settings(CACHES=caches):
+                workers = [
+                    SharedCache(settings.SHARED_CACHE_LOCK_TIMEOUT)
+                    for _ in range(options["workers"])
+                ]
+                fetches = []
+
+                def fetch():
+                    fetches.append(None)
+                    time.sleep(options["ipfs_latency"])
+                    return synthetic_manifest(10_000)
+
+                def request(index):
+                    return workers[index % len(workers)].get_or_set("benchmark", name, fetch)
+
+                with ThreadPoolExecutor(max_workers=requests) as pool:
+                    start = time.perf_counter()
+                    deque(pool.map(request, range(requests)), maxlen=0)
+                    cold_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                for index in range(100):
+                    request(index)
+                warm_seconds = time.perf_counter() - start
+            yield {
+                "scenario": "shared_cache",
+                "backend": name,
+                "workers": options["workers"],
+                "concurrent_requests": requests,
+                "upstream_fetches": len(fetches),
+                "cold_ms": round(cold_seconds * 1000, 2),
+                "warm_mean_ms": round(warm_seconds * 10, 3),
+            }
+
+
+SCENARIOS = {
+    "boot": bench_boot,
+    "manifest_memory": bench_manifest_memory,
+    "manifest_store": bench_manifest_store,
+    "registry_snapshot": bench_registry_snapshot,
+    "search": bench_search,
+    "shared_cache": bench_shared_cache,
+    "throughput": bench_throughput,
+    "views": bench_views,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run performance benchmarks against local stub services and print one JSON "
+        "result per line."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            help=f"Benchmarks to run, any of {', '.join(sorted(SCENARIOS))}. Defaults to all.",
+        )
+        parser.add_argument(
+            "--packages",
+            type=int,
+            nargs="+",
+            default=[10, 100, 500],
+            help="Registry sizes (number of packages) to benchmark.",
+        )
+        parser.add_argument(
+            "--view-packages",
+            type=int,
+            nargs="+",
+            default=[10, 60],
+            help=(
+                "Registry sizes deployed to eth-tester for the views benchmark. Every "
+                "release is a transaction, so keep these small."
+            ),
+        )
+        parser.add_argument(
+            "--releases",
+            type=int,
+            default=2,
+            help="Releases per package of the registries deployed to eth-tester.",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=5,
+            help="Calls per view in the views benchmark, the first one against cold caches.",
+        )
+        parser.add_argument(
+            "--boots",
+            type=int,
+            default=5,
+            help="Workers booted with and without PRELOAD in the boot benchmark.",
+        )
+        parser.add_argument(
+            "--manifest-bytes",
+            type=int,
+            nargs="+",
+            default=[100_000, 1_000_000, 10_000_000],
+            help="Sizes of the synthetic manifests to benchmark.",
+        )
+        parser.add_argument(
+            "--stored-manifests",
+            type=int,
+            nargs="+",
+            default=[100, 1_000],
+            help="Numbers of package releases to store in the manifest store benchmark.",
+        )
+        parser.add_argument(
+            "--manifests",
+            type=int,
+            nargs="+",
+            default=[1_000, 10_000, 50_000],
+            help="Numbers of manifests to index in the search benchmark.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Number of requests served per run of the throughput benchmark.",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            nargs="+",
+            default=[1, 8],
+            help="Threads per worker to compare in the throughput benchmark.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Worker processes simulated by the shared cache benchmark.",
+        )
+        parser.add_argument(
+            "--concurrent-requests",
+            type=int,
+            default=50,
+            help="Concurrent requests of one cold key in the shared cache benchmark.",
+        )
+        parser.add_argument(
+            "--rpc-latency",
+            type=float,
+            default=0.02,
+            help="Seconds the stub node waits before answering each request.",
+        )
+        parser.add_argument(
+            "--ipfs-latency",
+            type=float,
+            default=0.05,
+            help="Seconds the stub IPFS gateway waits before answering each request.",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = options["scenarios"] or sorted(SCENARIOS)
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+        for scenario in scenarios:
+            for result in SCENARIOS[scenario](options):
+                self.stdout.write(json.dumps(result, sort_keys=True))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from registry.archive import export_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the indexed registries, packages, releases and cached manifests to "
+        "an archive directory that import_index can load into another instance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Directory to write the archive to.")
+        parser.add_argument(
+            "--chain-id",
+            action="append",
+            dest="chain_ids",
+            help="Only export registries of this chain. Can be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        counts = export_index(options["directory"], options["chain_ids"])
+        self.stdout.write(
+            f"Exported {counts['registry']} registries, {counts['package']} packages, "
+            f"{counts['release']} releases and {counts['manifest']} manifests "
+            f"to {options['directory']}"
+        )
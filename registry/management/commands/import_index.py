@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from registry.archive import import_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Load an archive written by export_index. Registries, packages and releases "
+        "already in the index are kept as they are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Directory holding the archive.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows inserted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        counts = import_index(options["directory"], options["batch_size"])
+        self.stdout.write(
+            f"Imported {counts['registry']} registries, {counts['package']} packages, "
+            f"{counts['release']} releases and {counts['manifest']} manifests "
+            f"from {options['directory']}, rejected {counts['rejected']} manifests "
+            "not matching their CID or failing validation"
+        )
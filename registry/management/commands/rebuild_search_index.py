@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from registry.manifest_cache import manifest_cache
+from registry.search import search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the manifest search index from every manifest stored in the "
+        "manifest cache directory."
+    )
+
+    def handle(self, *args, **options):
+        search_index.clear()
+        count = search_index.add_many(manifest_cache.iter_stored())
+        self.stdout.write(f"Indexed {count} manifest(s) in {search_index.path}")
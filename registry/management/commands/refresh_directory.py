@@ -0,0 +1,43 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from registry.clients import get_w3
+from registry.directory import DIRECTORY_CHAIN_ID, refresh_directory
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-read the package counts and package names of the directory registries "
+        "and replace the directory snapshot served by the index and directory pages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running, refreshing every INTERVAL seconds. Runs once if 0.",
+        )
+
+    def handle(self, *args, **options):
+        w3 = get_w3(DIRECTORY_CHAIN_ID)
+        while True:
+            try:
+                registries = refresh_directory(w3)
+            except Exception:
+                if not options["interval"]:
+                    raise
+                # the previous snapshot is served until the next run succeeds
+                logger.exception("Could not refresh the registry directory")
+            else:
+                self.stdout.write(
+                    f"Refreshed {len(registries)} directory registries, "
+                    f"{sum(data['package_count'] for data in registries.values())} packages"
+                )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
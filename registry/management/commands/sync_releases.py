@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+
+from registry.clients import get_w3
+from registry.constants import CHAIN_DATA
+from registry.indexer import DEFAULT_WINDOW, sync_registry_releases
+from registry.models import Registry, Release
+from registry.prefetch import manifest_prefetcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Index new releases of every known registry from its VersionRelease event "
+        "logs, starting at each registry's last synced block."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chain-id",
+            dest="chain_ids",
+            action="append",
+            choices=sorted(CHAIN_DATA),
+            help="Only sync registries on this chain, can be repeated.",
+        )
+        parser.add_argument(
+            "--window",
+            type=int,
+            default=DEFAULT_WINDOW,
+            help="Maximum number of blocks requested per eth_getLogs call.",
+        )
+        parser.add_argument(
+            "--from-block",
+            type=int,
+            default=0,
+            help="Block to start from for registries that were never synced.",
+        )
+        parser.add_argument(
+            "--prefetch-manifests",
+            action="store_true",
+            help="Fetch and cache every manifest of the synced registries not cached yet.",
+        )
+
+    def handle(self, *args, **options):
+        registries = Registry.objects.filter(is_valid=True).order_by("chain_id")
+        if options["chain_ids"]:
+            registries = registries.filter(chain_id__in=options["chain_ids"])
+
+        for registry in registries:
+            new_releases = sync_registry_releases(
+                get_w3(registry.chain_id),
+                registry,
+                window=options["window"],
+                from_block=options["from_block"],
+            )
+            self.stdout.write(
+                f"{CHAIN_DATA[registry.chain_id][0]} {registry.address}: "
+                f"{new_releases} new release(s) up to block {registry.last_synced_block}"
+            )
+
+        if options["prefetch_manifests"]:
+            manifest_prefetcher.prefetch(
+                Release.objects.filter(package__registry__in=registries)
+                .values_list("manifest_uri", flat=True)
+                .iterator(),
+                block=True,
+            )
+            manifest_prefetcher.join()
+            stats = manifest_prefetcher.get_stats()
+            self.stdout.write(
+                f"Prefetched {stats['fetched']} manifest(s), {stats['invalid']} invalid, "
+                f"{stats['failed']} failed"
+            )
@@ -0,0 +1,287 @@
+from collections import Counter, OrderedDict
+from functools import partial
+import json
+from pathlib import Path
+import re
+import threading
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from ethpm.validation.manifest import validate_manifest_against_schema
+
+from .blob_store import (
+    BlobStore,
+    assemble_manifest,
+    find_json_format,
+    get_value,
+    serialize,
+    split_manifest,
+)
+from .ipfs import ipfs_fetcher
+from .metrics import count
+from .search import index_manifest
+from .shared_cache import shared_cache
+from .utils import read_file, write_file_atomically
+
+CID_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+
+class CachedManifest(NamedTuple):
+    # parsed manifest, already validated against the ethPM schema
+    manifest: Dict[str, Any]
+    # length of the raw manifest
+    size: int
+    # (path, digest, size) of the manifest values stored as blobs
+    blobs: Tuple[Tuple[Tuple[str, ...], str, int], ...] = ()
+    # index of the JSON_FORMATS entry reproducing the raw manifest, None if none does
+    json_format: Optional[int] = 0
+    # the raw manifest, kept only if no JSON_FORMATS entry reproduces it
+    stored_raw: Optional[bytes] = None
+
+    @property
+    def raw(self):
+        if self.stored_raw is not None:
+            return self.stored_raw
+        return serialize(self.manifest, self.json_format)
+
+
+class ManifestCache:
+    """
+    Two-tier cache of validated manifests keyed by IPFS hash: an in-process LRU
+    bounded by the total size of the manifests it holds, backed by a directory of
+    manifest skeletons and a ``BlobStore`` of the ABIs, bytecode and sources they
+    share. Blobs held in memory are shared by every manifest containing them and
+    only counted once. IPFS content is immutable, so entries never expire, and
+    only manifests that passed schema validation are stored, so neither tier needs
+    to validate again. Misses are fetched through the shared cache.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.blob_store = BlobStore(self.cache_dir / "blobs")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.stats = Counter()
+        self._entries = OrderedDict()
+        # digest -> value of the blobs of the manifests in memory, and the number
+        # of manifest values referring to each
+        self._blobs = {}
+        self._blob_refs = Counter()
+        self._lock = threading.Lock()
+
+    def get(self, ipfs_hash) -> CachedManifest:
+        validate_cid(ipfs_hash)
+        with self._lock:
+            if ipfs_hash in self._entries:
+                self._entries.move_to_end(ipfs_hash)
+                self.stats["memory_hits"] += 1
+                count("manifest_cache", "memory_hits")
+                return self._entries[ipfs_hash]
+
+        entry = self._read_from_disk(ipfs_hash)
+        if entry is not None:
+            self._count("disk_hits")
+            self._remember(ipfs_hash, entry)
+            return entry
+
+        self._count("misses")
+        return self.put(ipfs_hash, fetch_manifest(ipfs_hash))
+
+    def contains(self, ipfs_hash):
+        with self._lock:
+            if ipfs_hash in self._entries:
+                return True
+        return (
+            self._record_path(ipfs_hash).is_file() or (self.cache_dir / ipfs_hash).is_file()
+        )
+
+    def put(self, ipfs_hash, raw, index=True) -> CachedManifest:
+        """
+        Validate and cache the manifest ``raw`` fetched from ``ipfs_hash``. Bulk
+        loaders pass ``index=False`` and add the manifests to the search index in
+        batches themselves.
+        """
+        validate_cid(ipfs_hash)
+        manifest = json.loads(raw)
+        validate_manifest_against_schema(manifest)
+        entry = self._write_to_disk(ipfs_hash, raw, manifest)
+        self._remember(ipfs_hash, entry)
+        if index:
+            index_manifest(ipfs_hash, manifest)
+        return entry
+
+    def iter_stored(self):
+        """
+        Yield ``(ipfs_hash, manifest)`` for every manifest stored on disk.
+        """
+        for ipfs_hash, entry in self._iter_stored_entries():
+            yield ipfs_hash, entry.manifest
+
+    def iter_stored_raw(self, ipfs_hashes=None):
+        """
+        Yield ``(ipfs_hash, raw)`` for every manifest stored on disk, or only for
+        those of ``ipfs_hashes``.
+        """
+        for ipfs_hash, entry in self._iter_stored_entries(ipfs_hashes):
+            yield ipfs_hash, entry.raw
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "memory_hits": self.stats["memory_hits"],
+                "disk_hits": self.stats["disk_hits"],
+                "misses": self.stats["misses"],
+                "evictions": self.stats["evictions"],
+                "entries": len(self._entries),
+                "shared_blobs": len(self._blobs),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _count(self, stat):
+        count("manifest_cache", stat)
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _iter_stored_entries(self, ipfs_hashes=None):
+        stored = [
+            path.stem
+            for path in iter_files(self.cache_dir / "manifests")
+            if path.suffix == ".json"
+        ]
+        # manifests cached as raw files, see _migrate
+        stored += [path.name for path in iter_files(self.cache_dir)]
+        stored = set(filter(CID_PATTERN.fullmatch, stored))
+        if ipfs_hashes is not None:
+            stored &= set(ipfs_hashes)
+        for ipfs_hash in sorted(stored):
+            entry = self._read_from_disk(ipfs_hash)
+            if entry is not None:
+                yield ipfs_hash, entry
+
+    def _remember(self, ipfs_hash, entry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if ipfs_hash in self._entries:
+                return
+            self._entries[ipfs_hash] = entry
+            self.size += entry.size - sum(size for _, _, size in entry.blobs)
+            for path, digest, size in entry.blobs:
+                if not self._blob_refs[digest]:
+                    self._blobs[digest] = get_value(entry.manifest, path)
+                    self.size += size
+                self._blob_refs[digest] += 1
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._forget(evicted)
+                self.stats["evictions"] += 1
+
+    def _forget(self, entry):
+        self.size -= entry.size - sum(size for _, _, size in entry.blobs)
+        for _, digest, size in entry.blobs:
+            self._blob_refs[digest] -= 1
+            if not self._blob_refs[digest]:
+                del self._blob_refs[digest], self._blobs[digest]
+                self.size -= size
+
+    def _record_path(self, ipfs_hash):
+        return self.cache_dir / "manifests" / f"{ipfs_hash}.json"
+
+    def _read_from_disk(self, ipfs_hash):
+        record = read_file(self._record_path(ipfs_hash))
+        if record is None:
+            return self._migrate(ipfs_hash)
+        record = json.loads(record)
+        if "raw" in record:
+            raw = self.blob_store.get(record["raw"])
+            return CachedManifest(json.loads(raw), len(raw), json_format=None, stored_raw=raw)
+        blobs = tuple((tuple(path), digest, size) for path, digest, size in record["blobs"])
+        values = {}
+        for _, digest, _ in blobs:
+            if digest not in values:
+                values[digest] = self._load_blob(digest)
+        return CachedManifest(
+            assemble_manifest(
+                record["skeleton"], [(path, values[digest]) for path, digest, _ in blobs]
+            ),
+            record["size"],
+            blobs,
+            record["format"],
+        )
+
+    def _migrate(self, ipfs_hash):
+        # manifests cached as raw files, before they were split into blobs
+        legacy_path = self.cache_dir / ipfs_hash
+        raw = read_file(legacy_path)
+        if raw is None:
+            return None
+        entry = self._write_to_disk(ipfs_hash, raw, json.loads(raw))
+        try:
+            legacy_path.unlink()
+        except FileNotFoundError:
+            pass
+        return entry
+
+    def _load_blob(self, digest):
+        with self._lock:
+            if digest in self._blobs:
+                return self._blobs[digest]
+        return json.loads(self.blob_store.get(digest))
+
+    def _write_to_disk(self, ipfs_hash, raw, manifest):
+        json_format = find_json_format(manifest, raw)
+        if json_format is None:
+            write_file_atomically(
+                self._record_path(ipfs_hash),
+                json.dumps({"size": len(raw), "raw": self.blob_store.put(raw)}).encode("utf-8"),
+            )
+            return CachedManifest(manifest, len(raw), json_format=None, stored_raw=raw)
+
+        skeleton, parts = split_manifest(manifest)
+        blobs = []
+        for path, value in parts:
+            data = serialize(value)
+            blobs.append((path, self.blob_store.put(data), len(data)))
+        # blobs are written first, so readers never find a record missing its blobs
+        record = {"size": len(raw), "format": json_format, "skeleton": skeleton, "blobs": blobs}
+        write_file_atomically(self._record_path(ipfs_hash), json.dumps(record).encode("utf-8"))
+        # share the values of blobs other manifests in memory hold already, and those
+        # repeated within the manifest
+        values = {}
+        with self._lock:
+            for (path, value), (_, digest, _) in zip(parts, blobs):
+                values.setdefault(digest, self._blobs.get(digest, value))
+        return CachedManifest(
+            assemble_manifest(manifest, [(path, values[digest]) for path, digest, _ in blobs]),
+            len(raw),
+            tuple(blobs),
+            json_format,
+        )
+
+
+def validate_cid(ipfs_hash):
+    if not CID_PATTERN.fullmatch(ipfs_hash):
+        raise ValueError(f"Invalid IPFS hash: {ipfs_hash!r}")
+
+
+def iter_files(directory):
+    if not directory.is_dir():
+        return []
+    return [path for path in directory.iterdir() if path.is_file()]
+
+
+def fetch_manifest(ipfs_hash):
+    """
+    Return the raw content of ``ipfs_hash``, from the shared cache if another worker
+    fetched it already.
+    """
+    return shared_cache.get_or_set(
+        "manifest", ipfs_hash, partial(ipfs_fetcher.fetch, ipfs_hash)
+    )
+
+
+
+manifest_cache = ManifestCache(
+    settings.MANIFEST_CACHE_DIR, settings.MANIFEST_CACHE_MAX_BYTES
+)
@@ -0,0 +1,231 @@
+"""
+Request level performance accounting. ``MetricsMiddleware`` starts a
+``RequestMetrics`` for every request, and JSON-RPC calls, IPFS fetches, cache lookups
+and template rendering report into it through ``record`` and ``count``, including
+from work the request runs on the shared thread pool. A request's metrics are sent
+in its ``Server-Timing`` header, and the totals of the worker process are served in
+the Prometheus text format by the metrics view.
+"""
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import re
+import threading
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+# Upper bounds of the request duration histogram buckets, in seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+NON_TOKEN_PATTERN = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (kind, name) -> [calls, seconds]
+        self.timings = defaultdict(lambda: [0, 0.0])
+        # (kind, name) -> count
+        self.counts = Counter()
+
+    def record(self, kind, name, seconds):
+        with self._lock:
+            timing = self.timings[(kind, name)]
+            timing[0] += 1
+            timing[1] += seconds
+
+    def count(self, kind, name, amount):
+        with self._lock:
+            self.counts[(kind, name)] += amount
+
+    def server_timing(self, total_seconds):
+        with self._lock:
+            metrics = [
+                f'{timing_name(kind, name)};dur={seconds * 1000:.1f};desc="{calls}"'
+                for (kind, name), (calls, seconds) in sorted(self.timings.items())
+            ]
+            metrics += [
+                f'{timing_name(kind, name)};desc="{amount}"'
+                for (kind, name), amount in sorted(self.counts.items())
+            ]
+        return ", ".join([*metrics, f"total;dur={total_seconds * 1000:.1f}"])
+
+
+class ProcessMetrics(RequestMetrics):
+    """
+    Totals of every request served by this worker process, and of background work.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.requests = Counter()
+        # view -> [count per bucket..., count above the last bucket, sum of durations]
+        self.durations = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1) + [0.0])
+
+    def record_request(self, view, method, status, seconds):
+        with self._lock:
+            self.requests[(view, method, str(status))] += 1
+            durations = self.durations[view]
+            durations[bisect_left(DURATION_BUCKETS, seconds)] += 1
+            durations[-1] += seconds
+
+    def render(self):
+        """
+        Return the metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            lines = ["# TYPE explorer_requests_total counter"]
+            lines += (
+                f"explorer_requests_total{labels(view=view, method=method, status=status)} "
+                f"{requests}"
+                for (view, method, status), requests in sorted(self.requests.items())
+            )
+            lines.append("# TYPE explorer_request_duration_seconds histogram")
+            for view, durations in sorted(self.durations.items()):
+                cumulative = 0
+                for bound, requests in zip((*DURATION_BUCKETS, "+Inf"), durations):
+                    cumulative += requests
+                    lines.append(
+                        f"explorer_request_duration_seconds_bucket{labels(view=view, le=bound)} "
+                        f"{cumulative}"
+                    )
+                lines += (
+                    f"explorer_request_duration_seconds_sum{labels(view=view)} {durations[-1]}",
+                    f"explorer_request_duration_seconds_count{labels(view=view)} {cumulative}",
+                )
+            lines.append("# TYPE explorer_operations_total counter")
+            lines += (
+                f"explorer_operations_total{labels(kind=kind, name=name)} {calls}"
+                for (kind, name), (calls, _) in sorted(self.timings.items())
+            )
+            lines.append("# TYPE explorer_operation_seconds_total counter")
+            lines += (
+                f"explorer_operation_seconds_total{labels(kind=kind, name=name)} {seconds}"
+                for (kind, name), (_, seconds) in sorted(self.timings.items())
+            )
+            lines.append("# TYPE explorer_events_total counter")
+            lines += (
+                f"explorer_events_total{labels(kind=kind, name=name)} {amount}"
+                for (kind, name), amount in sorted(self.counts.items())
+            )
+        return "\n".join(lines) + "\n"
+
+
+def timing_name(kind, name):
+    # Server-Timing metric names are HTTP tokens
+    return NON_TOKEN_PATTERN.sub("_", f"{kind}.{name}")
+
+
+def labels(**values):
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in values.items()
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+process_metrics = ProcessMetrics()
+
+
+def record(kind, name, seconds):
+    """
+    Record an operation of ``kind`` (rpc, ipfs, render...) that took ``seconds``.
+    """
+    process_metrics.record(kind, name, seconds)
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        request_metrics.record(kind, name, seconds)
+
+
+def count(kind, name, amount=1):
+    """
+    Count an event of ``kind``, like a cache hit, that isn't worth timing.
+    """
+    process_metrics.count(kind, name, amount)
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        request_metrics.count(kind, name, amount)
+
+
+@contextmanager
+def collect():
+    """
+    Collect the metrics recorded in this context into a new ``RequestMetrics``.
+    """
+    request_metrics = RequestMetrics()
+    token = _current.set(request_metrics)
+    try:
+        yield request_metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timed(kind, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """
+    Measure every request and send its metrics in a ``Server-Timing`` header. The
+    body of a streaming response is produced after the header is sent, so only the
+    time until the response started is measured for those.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with collect() as request_metrics:
+            response = self.get_response(request)
+        seconds = time.perf_counter() - start
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else "unresolved"
+        process_metrics.record_request(view, request.method, response.status_code, seconds)
+        response["Server-Timing"] = request_metrics.server_timing(seconds)
+        return response
+
+
+def rpc_metrics_middleware(make_request, w3):
+    """
+    Web3 middleware timing every JSON-RPC request by method.
+    """
+    def middleware(method, params):
+        with timed("rpc", method):
+            return make_request(method, params)
+    return middleware
+
+
+class TimedTemplate:
+    def __init__(self, template, name):
+        self.template = template
+        self.name = name
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        with timed("render", self.name):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing how long each template takes to render.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code), "<string>")
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name), template_name)
@@ -0,0 +1,76 @@
+# Generated by Django 2.2.4 on 2026-10-18 11:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Package',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('release_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Registry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chain_id', models.CharField(max_length=3)),
+                ('address', models.CharField(max_length=42)),
+                ('ens_domain', models.CharField(max_length=200, null=True)),
+                ('owner_address', models.CharField(max_length=42, null=True)),
+                ('is_valid', models.BooleanField(default=True)),
+                ('package_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Release',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=255)),
+                ('manifest_uri', models.CharField(max_length=1000)),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='releases', to='registry.Package')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='registry',
+            index=models.Index(fields=['chain_id', 'ens_domain'], name='registry_re_chain_i_62fd88_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='registry',
+            constraint=models.UniqueConstraint(fields=('chain_id', 'address'), name='unique_registry_per_chain'),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='registry',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='packages', to='registry.Registry'),
+        ),
+        migrations.AddIndex(
+            model_name='release',
+            index=models.Index(fields=['manifest_uri'], name='registry_re_manifes_664baa_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='release',
+            constraint=models.UniqueConstraint(fields=('package', 'version'), name='unique_release_per_package'),
+        ),
+        migrations.AddConstraint(
+            model_name='package',
+            constraint=models.UniqueConstraint(fields=('registry', 'name'), name='unique_package_per_registry'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.4 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registry', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registry',
+            name='last_synced_block',
+            field=models.PositiveIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.4 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registry', '0002_registry_last_synced_block'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='position',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=models.Index(fields=['registry', 'position'], name='registry_pa_registr_5b9416_idx'),
+        ),
+    ]
@@ -1,29 +1,97 @@
-from django.db import models
-from django.forms import ModelForm
-from typing import Any, Dict
+from datetime import timedelta
+from functools import partial
 import json
-
-from eth_utils import to_tuple, to_dict
-from eth_utils import to_canonical_address, to_text
-from ens import ENS
-from ethpm._utils.chains import parse_BIP122_uri
-from ethpm._utils.ipfs import is_ipfs_uri, extract_ipfs_path_from_uri, create_ipfs_uri
-from ethpm.constants import IPFS_GATEWAY_PREFIX
-from ethpm.uri import resolve_uri_contents
-from ethpm.validation.manifest import (
-    validate_raw_manifest_format,
-    validate_manifest_against_schema,
+from typing import NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import models, transaction
+from django.urls import reverse
+from django.utils import timezone
+from eth_utils import to_tuple
+from eth_utils import (
+    humanize_ipfs_uri,
+    is_address,
+    to_canonical_address,
+    to_checksum_address,
 )
-from web3._utils.validation import validate_address
-from web3.exceptions import BadFunctionCallOutput
 
 from .constants import CHAIN_DATA
-from .utils import humanize_address
-
-
-def get_package_versions(registry_address, w3, package_name):
-    registry = Registry(registry_address, w3)
-    return registry.get_package_versions(package_name)
+from .shared_cache import shared_cache
+from .utils import humanize_address, identify_blockchain_uri, lazy_import
+
+# Models are imported when Django sets up, web3, ens and ethpm are only imported
+# once a request needs them.
+ens_cache = lazy_import("registry.ens_cache", "ens_cache")
+ethpm_constants = lazy_import("ethpm.constants")
+ethpm_ipfs = lazy_import("ethpm._utils.ipfs")
+manifest_cache = lazy_import("registry.manifest_cache", "manifest_cache")
+manifest_prefetcher = lazy_import("registry.prefetch", "manifest_prefetcher")
+snapshots = lazy_import("registry.snapshot")
+web3_exceptions = lazy_import("web3.exceptions")
+web3_validation = lazy_import("web3._utils.validation")
+
+
+def get_package_versions(registry_address, w3, chain_id, package_name):
+    registry = get_registry(registry_address, w3, chain_id)
+    package = get_package(registry, w3, package_name)
+    if package.is_stale():
+        refresh_releases(package, w3)
+    return package.releases.select_related("package__registry")
+
+
+def get_package(registry, w3, package_name):
+    """
+    Return the indexed package ``package_name``, reading it from the chain if it's on
+    a page of the registry that hasn't been indexed yet. Raises ``Package.DoesNotExist``
+    if the registry holds no such package.
+    """
+    try:
+        return registry.packages.get(name=package_name)
+    except Package.DoesNotExist:
+        if not registry.is_valid:
+            raise
+    try:
+        releases = read_package_releases(
+            w3, registry.chain_id, registry.address, package_name
+        )
+    except web3_exceptions.BadFunctionCallOutput:
+        raise Package.DoesNotExist(
+            f"No package named {package_name} in registry {registry.address}"
+        )
+    with transaction.atomic():
+        package, _ = Package.objects.get_or_create(
+            registry=registry,
+            name=package_name,
+            defaults={"release_count": len(releases)},
+        )
+        index_releases(package, releases)
+    return package
+
+
+def read_registry_snapshot(w3, chain_id, address, offset=0, limit=None):
+    """
+    ``load_registry_snapshot``, shared with the other workers reading the same
+    registry at about the same time.
+    """
+    return shared_cache.get_or_set(
+        "registry_snapshot",
+        f"{chain_id}:{address}:{offset}:{limit}",
+        partial(snapshots.load_registry_snapshot, w3, address, offset, limit),
+        settings.SHARED_CACHE_CHAIN_TTL,
+    )
+
+
+def read_package_releases(w3, chain_id, address, package_name):
+    """
+    ``load_package_releases``, shared with the other workers reading the same
+    package at about the same time.
+    """
+    return shared_cache.get_or_set(
+        "package_releases",
+        f"{chain_id}:{address}:{package_name}",
+        partial(snapshots.load_package_releases, w3, address, package_name),
+        settings.SHARED_CACHE_CHAIN_TTL,
+    )
 
 
 def get_etherscan_link(chain_id, address):
@@ -34,67 +102,182 @@ def get_etherscan_link(chain_id, address):
 
 
 class Registry(models.Model):
-    package_count = models.IntegerField()
-    chain_id = models.CharField(max_length=3, null=True)
-    owner = models.CharField(max_length=200, null=True)
-    address = models.CharField(max_length=200, null=True)
-    humanized_addr = models.CharField(max_length=200, null=True)
+    chain_id = models.CharField(max_length=3)
+    address = models.CharField(max_length=42)
     ens_domain = models.CharField(max_length=200, null=True)
-    owner_link = models.CharField(max_length=200, null=True)
-    registry_link = models.CharField(max_length=200, null=True)
-
-    def __init__(self, address, w3):
-        super().__init__()
-        self.w3 = w3
-        self.chain_id = self.w3.net.version
-        ens = ENS(self.w3.provider)
-        if self.chain_id == "1" and ens.address(address):
-            self.address = ens.address(address)
-            self.humanized_addr = humanize_address(self.address)
-            self.ens_domain = address
-        else:
-            validate_address(to_canonical_address(address))
-            self.address = address
-            self.humanized_addr = humanize_address(self.address)
-            self.ens_domain = None
-
-        w3.pm.set_registry(self.address)
-        try:
-            # no owner is required for a valid ERC1319 registry
-            try:
-                owner_addr = w3.pm.registry.registry.functions.owner().call()
-                self.owner = humanize_address(owner_addr)
-                self.owner_link = get_etherscan_link(self.chain_id, owner_addr)
-            except BadFunctionCallOutput:
-                self.owner = "0x"
-            self.package_count = w3.pm.get_package_count()
-            self.registry_link = get_etherscan_link(self.chain_id, self.address)
-        except BadFunctionCallOutput:
-            self.owner = gen_invalid_registry_address(address, self.chain_id)
-            self.owner_link = None
-            self.registry_link = get_etherscan_link(self.chain_id, self.address)
-            self.package_count = 0
-        else:
-            try:
-                package_names = w3.pm.get_all_package_names()
-                self.packages = [
-                    Package(name, w3.pm.get_release_count(name))
-                    for name in package_names
-                ]
-            except BadFunctionCallOutput:	
-                self.owner = gen_invalid_registry_address(address, self.chain_id)	
-                self.owner_link = None	
-                self.registry_link = None	
-                self.package_count = 0
-
-    def get_package_versions(self, package_name):
-        versions_data = self.w3.pm.get_all_package_releases(package_name)
+    owner_address = models.CharField(max_length=42, null=True)
+    # False if the contract @ address doesn't look like it conforms to ERC1319
+    is_valid = models.BooleanField(default=True)
+    package_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Last block whose VersionRelease logs have been indexed by sync_releases
+    last_synced_block = models.PositiveIntegerField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["chain_id", "address"], name="unique_registry_per_chain"
+            )
+        ]
+        indexes = [models.Index(fields=["chain_id", "ens_domain"])]
+
+    def is_stale(self):
+        ttl = timedelta(seconds=settings.REGISTRY_INDEX_TTL)
+        return timezone.now() - self.updated_at > ttl
+
+    @property
+    def humanized_addr(self):
+        return humanize_address(self.address)
+
+    @property
+    def registry_link(self):
+        return get_etherscan_link(self.chain_id, self.address)
+
+    @property
+    def owner(self):
+        if not self.is_valid:
+            return gen_invalid_registry_address(
+                self.ens_domain or self.address, self.chain_id
+            )
+        # no owner is required for a valid ERC1319 registry
+        if self.owner_address is None:
+            return "0x"
+        return humanize_address(self.owner_address)
+
+    @property
+    def owner_link(self):
+        if self.is_valid and self.owner_address:
+            return get_etherscan_link(self.chain_id, self.owner_address)
+        return None
+
+    @property
+    def ethpm_uri_prefix(self):
         if self.chain_id == "1":
-            ethpm_uri_prefix = f"ethpm://{self.address}/"
-        else:
-            ethpm_uri_prefix = f"ethpm://{self.address}:{self.chain_id}/"
-        releases = [Release(package_name, data[0], data[1], ethpm_uri_prefix) for data in versions_data]
-        return releases
+            return f"ethpm://{self.address}/"
+        return f"ethpm://{self.address}:{self.chain_id}/"
+
+
+def get_registry(address, w3, chain_id):
+    """
+    Return the indexed ``Registry`` for an address or (mainnet) ENS name, only
+    reading from the chain if the registry is missing from the index or stale.
+    """
+    if chain_id == "1" and not is_address(address):
+        registry = Registry.objects.filter(chain_id=chain_id, ens_domain=address).first()
+        if registry and not registry.is_stale():
+            return registry
+        ens_domain, address = address, ens_cache.address(w3, chain_id, address)
+        if not address:
+            raise web3_exceptions.NameNotFound(
+                f"No address found after ENS lookup for name: {ens_domain}."
+            )
+    else:
+        web3_validation.validate_address(to_canonical_address(address))
+        ens_domain = None
+    address = to_checksum_address(address)
+
+    registry = Registry.objects.filter(chain_id=chain_id, address=address).first()
+    if registry is None or registry.is_stale():
+        # only the first page of packages is needed to render the registry
+        return refresh_registry(
+            w3, chain_id, address, ens_domain, limit=settings.PACKAGE_PAGE_SIZE
+        )
+    if ens_domain and registry.ens_domain != ens_domain:
+        registry.ens_domain = ens_domain
+        registry.save(update_fields=["ens_domain"])
+    return registry
+
+
+@transaction.atomic
+def refresh_registry(w3, chain_id, address, ens_domain=None, limit=None):
+    """
+    Re-read a registry from the chain, along with its first ``limit`` packages (all
+    packages by default). Errors of the node are raised and nothing is saved.
+    """
+    registry, _ = Registry.objects.get_or_create(chain_id=chain_id, address=address)
+    if ens_domain:
+        registry.ens_domain = ens_domain
+    try:
+        snapshot = read_registry_snapshot(w3, chain_id, address, limit=limit)
+    except web3_exceptions.BadFunctionCallOutput:
+        # Indexed packages and releases are kept, along with the release logs
+        # checkpoint they were synced up to. They're listed again once the
+        # registry reads like a registry.
+        registry.is_valid = False
+        registry.owner_address = None
+        registry.package_count = 0
+        registry.save()
+        return registry
+
+    registry.is_valid = True
+    registry.owner_address = snapshot.owner
+    registry.package_count = snapshot.package_count
+    registry.save()
+    index_packages(registry, snapshot)
+    return registry
+
+
+def index_packages(registry, snapshot):
+    names = [name for name, _ in snapshot.packages]
+    indexed = {
+        package.name: package for package in registry.packages.filter(name__in=names)
+    }
+    new_packages = []
+    updated_packages = []
+    for position, (name, release_count) in enumerate(snapshot.packages, snapshot.offset):
+        package = indexed.get(name)
+        if package is None:
+            new_packages.append(
+                Package(
+                    registry=registry,
+                    name=name,
+                    release_count=release_count,
+                    position=position,
+                )
+            )
+        elif (package.release_count, package.position) != (release_count, position):
+            package.release_count = release_count
+            package.position = position
+            updated_packages.append(package)
+    Package.objects.bulk_create(new_packages)
+    Package.objects.bulk_update(updated_packages, ["release_count", "position"])
+
+
+class PackagePage(NamedTuple):
+    packages: Tuple["Package", ...]
+    # position of the first package of the next page, None on the last page
+    next_cursor: Optional[int]
+
+
+def get_package_page(registry, w3, cursor, limit):
+    """
+    Return the packages at positions [cursor, cursor + limit) of ``registry``,
+    reading them from the chain unless the whole page is indexed already.
+    """
+    packages = get_indexed_package_page(registry, cursor, limit)
+    end = min(cursor + limit, registry.package_count)
+    if registry.is_valid and len(packages) < end - cursor:
+        with transaction.atomic():
+            snapshot = read_registry_snapshot(
+                w3, registry.chain_id, registry.address, cursor, limit
+            )
+            index_packages(registry, snapshot)
+            if snapshot.package_count != registry.package_count:
+                registry.package_count = snapshot.package_count
+                registry.save(update_fields=["package_count"])
+        packages = get_indexed_package_page(registry, cursor, limit)
+        end = min(cursor + limit, registry.package_count)
+    return PackagePage(packages, end if end < registry.package_count else None)
+
+
+def get_indexed_package_page(registry, cursor, limit):
+    # packages indexed from release logs have no position until a page is read
+    page = registry.packages.filter(
+        position__isnull=False,
+        position__gte=cursor,
+        position__lt=min(cursor + limit, registry.package_count),
+    )
+    return tuple(page.order_by("position"))
 
 
 def gen_invalid_registry_address(address, chain_id):
@@ -102,218 +285,232 @@ def gen_invalid_registry_address(address, chain_id):
 
 
 class Package(models.Model):
-    name = models.CharField(max_length=200, null=True)
+    registry = models.ForeignKey(
+        Registry, on_delete=models.CASCADE, related_name="packages"
+    )
+    name = models.CharField(max_length=255)
     release_count = models.IntegerField(default=0)
-
-    def __init__(self, name, release_count):
-        self.name = name
-        self.release_count = release_count
+    # Index of the package in getAllPackageIds, None until a page holding it is read
+    position = models.PositiveIntegerField(null=True)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["registry", "name"], name="unique_package_per_registry"
+            )
+        ]
+        indexes = [models.Index(fields=["registry", "position"])]
+
+    def is_stale(self):
+        # release_count is kept current by refresh_registry, so the indexed
+        # releases are stale whenever their number doesn't match it
+        return self.releases.count() != self.release_count
+
+
+@transaction.atomic
+def refresh_releases(package, w3):
+    registry = package.registry
+    releases = read_package_releases(
+        w3, registry.chain_id, registry.address, package.name
+    )
+    index_releases(package, releases)
+    # the chain may have gained releases since release_count was read, count what
+    # is indexed now, which is what release lists keyed on it show
+    release_count = package.releases.count()
+    if release_count != package.release_count:
+        package.release_count = release_count
+        package.save(update_fields=["release_count"])
+
+
+def index_releases(package, releases):
+    indexed_versions = set(package.releases.values_list("version", flat=True))
+    new_releases = Release.objects.bulk_create(
+        Release(package=package, version=version, manifest_uri=manifest_uri)
+        for version, manifest_uri in releases
+        if version not in indexed_versions
+    )
+    manifest_prefetcher.prefetch(release.manifest_uri for release in new_releases)
 
 
 class Release(models.Model):
-    package_name = models.CharField(max_length=200, null=True)
-    version = models.CharField(max_length=200, null=True)
-    manifest_uri = models.CharField(max_length=1000, null=True)
-    hyperlink = models.CharField(max_length=500, null=True)
-    ethpm_uri_prefix = models.CharField(max_length=500, null=True)
-
-    def __init__(self, package_name, version, manifest_uri, ethpm_uri_prefix):
-        self.package_name = package_name
-        self.version = version
-        self.manifest_uri = manifest_uri
-        self.hyperlink = generate_hyperlink(manifest_uri)
-        self.ethpm_uri_prefix = ethpm_uri_prefix
+    package = models.ForeignKey(
+        Package, on_delete=models.CASCADE, related_name="releases"
+    )
+    version = models.CharField(max_length=255)
+    manifest_uri = models.CharField(max_length=1000)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["package", "version"], name="unique_release_per_package"
+            )
+        ]
+        indexes = [models.Index(fields=["manifest_uri"])]
+
+    @property
+    def package_name(self):
+        return self.package.name
+
+    @property
+    def hyperlink(self):
+        return generate_hyperlink(self.manifest_uri)
 
     @property
     def ethpm_uri(self):
-        return f"{self.ethpm_uri_prefix}{self.package_name}@{self.version}"
+        return f"{self.package.registry.ethpm_uri_prefix}{self.package.name}@{self.version}"
+
+    @property
+    def ipfs_hash(self):
+        if ethpm_ipfs.is_ipfs_uri(self.manifest_uri):
+            return ethpm_ipfs.extract_ipfs_path_from_uri(self.manifest_uri)
+        return None
+
+    @property
+    def humanized_manifest_uri(self):
+        return humanize_ipfs_uri(self.manifest_uri)
 
 
 def generate_hyperlink(manifest_uri):
-    if is_ipfs_uri(manifest_uri):
-        ipfs_hash = extract_ipfs_path_from_uri(manifest_uri)
-        return f"{IPFS_GATEWAY_PREFIX}{ipfs_hash}"
+    if ethpm_ipfs.is_ipfs_uri(manifest_uri):
+        ipfs_hash = ethpm_ipfs.extract_ipfs_path_from_uri(manifest_uri)
+        return f"{ethpm_constants.IPFS_GATEWAY_PREFIX}{ipfs_hash}"
     return None
 
 
-class Manifest(models.Model):
-    package_name = models.CharField(max_length=200, null=True)
-    version = models.CharField(max_length=200, null=True)
-    manifest_version = models.CharField(max_length=200, null=True)
-    authors = models.CharField(max_length=1000, null=True)
-    description = models.CharField(max_length=10000, null=True)
-    license = models.CharField(max_length=200, null=True)
-    keywords = models.CharField(max_length=1000, null=True)
-    links = models.CharField(max_length=1000, null=True)
-    sources = models.CharField(max_length=1000, null=True)
-    contract_types = models.CharField(max_length=1000, null=True)
-    deployments = models.CharField(max_length=1000, null=True)
-    build_dependencies = models.CharField(max_length=1000, null=True)
 
+
+# Fields of a deployment shown for contracts on a known chain, and the block explorer
+# paths of those linking to it.
+DEPLOYMENT_FIELDS = ("address", "block", "contract_type", "runtime_bytecode", "transaction")
+EXPLORER_PATHS = {"address": "address", "block": "block", "transaction": "tx"}
+
+# Characters dropped from names to use them as html ids.
+SAFE_ID_TABLE = {ord(c): None for c in "./-"}
+
+
+class Manifest:
     def __init__(self, ipfs_hash):
-        manifest_uri = create_ipfs_uri(ipfs_hash)
-        contents = to_text(resolve_uri_contents(manifest_uri))
-        # validate_raw_manifest_format(contents)
-        validate_manifest_against_schema(json.loads(contents))
-        # validate_manifest_deployments(contents)
-        manifest = json.loads(contents)
-        self.package_name = manifest["package_name"]
-        self.version = manifest["version"]
-        self.manifest_version = manifest["manifest_version"]
+        cached = manifest_cache.get(ipfs_hash)
+        self.ipfs_hash = ipfs_hash
+        self.size = cached.size
+        self.data = cached.manifest
+        self.package_name = self.data["package_name"]
+        self.version = self.data["version"]
+        self.manifest_version = self.data["manifest_version"]
         self.authors = None
         self.description = None
         self.license = None
         self.keywords = None
-        self.links = None
-        self.sources = None
-        self.contract_types = None
-        self.deployments = None
-        self.build_dependencies = None
-        if "meta" in manifest:
-            meta = manifest["meta"]
+        if "meta" in self.data:
+            meta = self.data["meta"]
             if "authors" in meta:
                 self.authors = ", ".join(meta["authors"])
             if "description" in meta:
-                self.description = f"<span>{meta['description']}</span>"
+                self.description = meta["description"]
             if "license" in meta:
-                self.license = f"<span>{meta['license']}</span>"
+                self.license = meta["license"]
             if "keywords" in meta:
                 self.keywords = ", ".join(meta["keywords"])
-            if "links" in meta:
-                self.links = links_to_table(meta["links"])
-        if "sources" in manifest:
-            self.sources = simple_dict_to_table(manifest["sources"])
-        if "contract_types" in manifest:
-            self.contract_types = contract_types_to_table(manifest["contract_types"])
-        if "deployments" in manifest:
-            self.deployments = deployments_to_table(manifest["deployments"])
-        if "build_dependencies" in manifest:
-            self.build_dependencies = simple_dict_to_table(
-                manifest["build_dependencies"]
-            )
-
-
-def deployments_to_table(deps):
-    chain_data = [process_chain(dep) for dep in deps.items()]
-    dep_html = [f"<dl class='row'>{html[0]}{html[1]}</dl>" for html in chain_data]
-    return "".join(dep_html)
 
-
-def escape_angles(string):
-    return string.replace(">", "&gt;").replace("<", "&lt;")
+    def fragment_url(self, section, name):
+        return reverse("manifest_fragment", args=[self.ipfs_hash, section, name])
+
+    def section(self, key):
+        """
+        Return the template context of a manifest section, or None if the manifest
+        doesn't have the section. Source blobs and contract types are left out, the
+        preview loads them from ``fragment_url`` on demand.
+        """
+        meta = self.data.get("meta", {})
+        if key in ("authors", "description", "license", "keywords"):
+            value = getattr(self, key)
+            return {"value": value} if value else None
+        if key == "links" and "links" in meta:
+            return {"links": gen_links(meta["links"])}
+        if key == "sources" and "sources" in self.data:
+            return {
+                "entries": gen_entries(
+                    self.data["sources"], partial(self.fragment_url, "sources")
+                )
+            }
+        if key == "contract_types" and "contract_types" in self.data:
+            return {
+                "contract_types": gen_entries(
+                    self.data["contract_types"], partial(self.fragment_url, "contract_types")
+                )
+            }
+        if key == "deployments" and "deployments" in self.data:
+            return {
+                "chains": gen_chains(self.data["deployments"]),
+                "verification_url": reverse("deployment_verification", args=[self.ipfs_hash]),
+            }
+        if key == "build_dependencies" and "build_dependencies" in self.data:
+            return {
+                "entries": gen_entries(
+                    self.data["build_dependencies"],
+                    partial(self.fragment_url, "build_dependencies"),
+                ),
+                "dependency_tree_url": reverse("dependency_tree", args=[self.ipfs_hash]),
+            }
+        return None
 
 
 @to_tuple
-def process_chain(chain):
-    chain_uri, deployments = chain
-    chain_type = identify_blockchain_uri(chain_uri)
-    if chain_type:
-        yield f"<dd class='col-sm-12 text' style='font-size:1.5em;text-decoration:underline;'><span style='border-bottom:1px solid grey;'>{chain_type}<br><span style='font-size:0.4em;'>{chain_uri}</span></span></dd>"
-    else:
-        yield f"<dd class='col-sm-12'>{chain_uri}</dd>"
-    deps = [process_deployment(dep, chain_type) for dep in deployments.items()]
-
-    deps_html_list = [
-        f"<dd class='col-sm-12'>{dep[0]}</dd><dd class='col-sm-12'><pre>{dep[1]}</pre></dd>"
-        for dep in deps
-    ]
-    deps_html_insert = "".join(deps_html_list)
-
-    yield f"{deps_html_insert}"
-
-
-def identify_blockchain_uri(uri):
-    genesis, _, _ = parse_BIP122_uri(uri)
-    for chain in CHAIN_DATA.values():
-        if chain[3] == genesis:
-            return chain[0]
-    return None
-
-
-@to_dict
-def process_deployment_data(data, chain_type):
-    chain_id = [
-        info for info in CHAIN_DATA.keys() if CHAIN_DATA[info][0] == chain_type
-    ][0]
-    if "address" in data:
-        yield "address", f"<a href='https://{CHAIN_DATA[chain_id][2]}/address/{data['address']}' target='_blank'>{data['address']}</a>"
-    if "block" in data:
-        yield "block", f"<a href='https://{CHAIN_DATA[chain_id][2]}/block/{data['block']}' target='_blank'>{data['block']}</a>"
-    if "transaction" in data:
-        yield "transaction", f"<a href='https://{CHAIN_DATA[chain_id][2]}/tx/{data['transaction']}' target='_blank'>{data['transaction']}</a>"
-    if "contract_type" in data:
-        yield "contract_type", data["contract_type"]
-    if "runtime_bytecode" in data:
-        yield "runtime_bytecode", data["runtime_bytecode"]
-
-
-@to_tuple
-def process_deployment(dep, chain_type=None):
-    name, data = dep
-    yield name
-    if chain_type:
-        yield json.dumps(
-            process_deployment_data(data, chain_type), indent=4, sort_keys=True
-        )
-    else:
-        yield json.dumps(data, indent=4, sort_keys=True)
-
-
-def contract_types_to_table(types):
-    type_data = [process_type(ct) for ct in types.items()]
-    type_html = [
-        f"<dl class='row' style='font-size:0.9em'>{html[0]}{html[1]}</dl>"
-        for html in type_data
-    ]
-    return "".join(type_html)
+def gen_links(links):
+    for name, uri in links.items():
+        yield name, generate_hyperlink(uri) or uri, uri
 
 
 @to_tuple
-def process_type(ct):
-    name, data = ct
-    safe_id = name.translate({ord(c): None for c in "./-"})
-    yield f"<dt class='col-sm-6 text'><span>{name}</span></dt><dd class='col-sm-6'><i class='info far fa-eye' id='{safe_id}' style='cursor:pointer;color:black;'></i></dd>"
-    json_data = json.dumps(data)
-    yield f"<dd class='col-sm-12'><pre class='source_contract contract_type' id='{safe_id}'>{escape_angles(json_data)}</pre></dd>"
-
-
-def links_to_table(links):
-    data_html = [gen_link_html(link) for link in links.items()]
-    html_list = [
-        f"<dl class='row' style='font-size:0.9em'>{html[0]}{html[1]}</dl>"
-        for html in data_html
-    ]
-    return "".join(html_list)
+def gen_entries(entries, fragment_url):
+    for name, value in entries.items():
+        uri = value if isinstance(value, str) and ethpm_ipfs.is_ipfs_uri(value) else None
+        yield {
+            "name": name,
+            "safe_id": name.translate(SAFE_ID_TABLE),
+            "uri": uri,
+            "hyperlink": uri and generate_hyperlink(uri),
+            "fragment_url": fragment_url(name),
+        }
 
 
 @to_tuple
-def gen_link_html(data):
-    name, uri = data
-    yield f"<dt class='col-sm-3'>{name}</dt>"
-    if is_ipfs_uri(uri):
-        link = generate_hyperlink(uri)
-        yield f"<dd class='col-sm-9'><span><a href='{link}' target='_blank'>{uri}</a></span></dd>"
-    else:
-        yield f"<dd class='col-sm-9'><span><a href='{uri}' target='_blank'>{uri}</a></span></dd>"
+def gen_chains(deployments):
+    for chain_uri, chain_deployments in deployments.items():
+        chain_type = identify_blockchain_uri(chain_uri)
+        yield {
+            "uri": chain_uri,
+            "chain_type": chain_type,
+            "deployments": tuple(
+                process_deployment(name, data, chain_type)
+                for name, data in chain_deployments.items()
+            ),
+        }
 
 
-def simple_dict_to_table(data):
-    data_html = [gen_data_html(item) for item in data.items()]
-    html_list = [
-        f"<dl class='row' style='font-size:0.9em'>{html[0]}{html[1]}</dl>"
-        for html in data_html
-    ]
-    return "".join(html_list)
+def process_deployment(name, data, chain_type):
+    if not chain_type:
+        return {"name": name, "json": json.dumps(data, indent=4, sort_keys=True)}
+    return {"name": name, "fields": gen_deployment_fields(data, chain_type)}
 
 
 @to_tuple
-def gen_data_html(data):
-    name, uri = data
-    if is_ipfs_uri(uri):
-        yield f"<dd class='col-sm-3 text'><span>{name}</span></dt>"
-        link = generate_hyperlink(uri)
-        yield f"<dd class='col-sm-9 text'><span><a href='{link}' target='_blank'>{uri}</a></span></dd>"
-    else:
-        safe_id = name.translate({ord(c): None for c in "./-"})
-        yield f"<dt class='col-sm-6'>{name}</dt><dd class='col-sm-6'><i class='info far fa-eye' id='{safe_id}' style='cursor:pointer;color:black;'></i></dd>"
-        yield f"<dd class='col-sm-12'><pre class='source_contract' id='{safe_id}'><code>{escape_angles(uri)}</code></pre></dd>"
+def gen_deployment_fields(data, chain_type):
+    """
+    Yield the key, json encoded value and block explorer link of the fields of a
+    deployment on ``chain_type``, to be laid out like ``json.dumps(indent=4)`` would.
+    """
+    chain_id = [
+        info for info in CHAIN_DATA.keys() if CHAIN_DATA[info][0] == chain_type
+    ][0]
+    for key in DEPLOYMENT_FIELDS:
+        if key not in data:
+            continue
+        if key in EXPLORER_PATHS:
+            link = f"https://{CHAIN_DATA[chain_id][2]}/{EXPLORER_PATHS[key]}/{data[key]}"
+            yield key, data[key], link
+        else:
+            value = json.dumps(data[key], indent=4, sort_keys=True)
+            yield key, value.replace("\n", "\n    "), None
@@ -0,0 +1,136 @@
+"""
+Background prefetching of the manifests of newly indexed releases, so that release
+details are served from the manifest cache instead of waiting on an IPFS gateway.
+
+Prefetching never slows down the request that discovered the releases: manifests
+are queued without blocking, and once ``MANIFEST_PREFETCH_QUEUE_SIZE`` are waiting,
+further ones are dropped and fetched on demand instead. A pool of
+``MANIFEST_PREFETCH_WORKERS`` threads drains the queue, sharing the per-gateway
+limit of ``IPFS_GATEWAY_CONCURRENCY`` fetches in flight with page requests.
+"""
+from collections import Counter
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from ethpm._utils.ipfs import extract_ipfs_path_from_uri, is_ipfs_uri
+from ethpm.exceptions import EthPMValidationError
+
+from .manifest_cache import fetch_manifest, manifest_cache
+
+logger = logging.getLogger(__name__)
+
+
+class ManifestPrefetcher:
+    def __init__(self, workers, queue_size, retries, retry_backoff):
+        self.workers = workers
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.stats = Counter()
+        self._queue = queue.Queue(maxsize=queue_size)
+        # hashes queued or being fetched, so each is only fetched once
+        self._pending = set()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def prefetch(self, manifest_uris, block=False):
+        """
+        Queue the IPFS manifests of ``manifest_uris`` that aren't cached yet. Manifests
+        that don't fit in the queue are dropped, unless ``block`` is set, which waits
+        for room instead.
+        """
+        for manifest_uri in manifest_uris:
+            if not is_ipfs_uri(manifest_uri):
+                continue
+            ipfs_hash = extract_ipfs_path_from_uri(manifest_uri)
+            with self._lock:
+                if ipfs_hash in self._pending or manifest_cache.contains(ipfs_hash):
+                    continue
+                self._pending.add(ipfs_hash)
+                self._start_workers()
+            try:
+                self._queue.put(ipfs_hash, block=block)
+            except queue.Full:
+                with self._lock:
+                    self._pending.discard(ipfs_hash)
+                self._count("dropped")
+            else:
+                self._count("queued")
+
+    def join(self):
+        """
+        Block until every queued manifest was fetched or given up on.
+        """
+        self._queue.join()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "queued": self.stats["queued"],
+                "fetched": self.stats["fetched"],
+                "retries": self.stats["retries"],
+                "failed": self.stats["failed"],
+                "invalid": self.stats["invalid"],
+                "dropped": self.stats["dropped"],
+                "pending": len(self._pending),
+            }
+
+    def _start_workers(self):
+        # called with the lock held, starts the pool on first use
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._work,
+                name=f"manifest-prefetch-{len(self._threads)}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            ipfs_hash = self._queue.get()
+            try:
+                result = self._prefetch(ipfs_hash)
+            except Exception:
+                logger.exception("Prefetching manifest %s failed", ipfs_hash)
+                result = "failed"
+            finally:
+                with self._lock:
+                    self._pending.discard(ipfs_hash)
+                self._queue.task_done()
+            self._count(result)
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _prefetch(self, ipfs_hash):
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count("retries")
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            try:
+                raw = fetch_manifest(ipfs_hash)
+            except Exception:
+                logger.debug("Fetching manifest %s failed", ipfs_hash, exc_info=True)
+                continue
+            try:
+                manifest_cache.put(ipfs_hash, raw)
+            except (EthPMValidationError, json.JSONDecodeError, ValueError) as exc:
+                # invalid content stays invalid, there's no point in retrying
+                logger.warning("Prefetched manifest %s is invalid: %s", ipfs_hash, exc)
+                return "invalid"
+            return "fetched"
+        logger.warning("Could not prefetch manifest %s", ipfs_hash)
+        return "failed"
+
+
+manifest_prefetcher = ManifestPrefetcher(
+    workers=settings.MANIFEST_PREFETCH_WORKERS,
+    queue_size=settings.MANIFEST_PREFETCH_QUEUE_SIZE,
+    retries=settings.MANIFEST_PREFETCH_RETRIES,
+    retry_backoff=settings.MANIFEST_PREFETCH_RETRY_BACKOFF,
+)
@@ -0,0 +1,44 @@
+"""
+Warming a worker before it serves requests, see the PRELOAD setting. Everything
+loaded here is otherwise loaded by the first request needing it: the URLconf, the
+modules the views import lazily with web3 and ethpm, the clients of every chain,
+the main templates and the directory snapshot. Nothing is read from the network,
+and no thread is started, so workers can be forked afterwards.
+"""
+from importlib import import_module
+
+from django.template import loader
+from django.urls import get_resolver
+
+from .clients import get_w3
+from .constants import CHAIN_DATA
+from .directory import load_directory
+from .metrics import timed
+
+PRELOADED_MODULES = (
+    "registry.dependencies",
+    "registry.manifest_cache",
+    "registry.prefetch",
+    "registry.previews",
+    "registry.probe",
+    "registry.verification",
+)
+PRELOADED_TEMPLATES = (
+    "registry/landing.html",
+    "registry/index.html",
+    "registry/directory.html",
+    "registry/manifest_preview.html",
+    "registry/release_list.html",
+)
+
+
+def preload():
+    with timed("boot", "preload"):
+        get_resolver().url_patterns
+        for module_name in PRELOADED_MODULES:
+            import_module(module_name)
+        for chain_id in CHAIN_DATA:
+            get_w3(chain_id)
+        for template_name in PRELOADED_TEMPLATES:
+            loader.get_template(template_name)
+        load_directory()
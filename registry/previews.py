@@ -0,0 +1,118 @@
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.template import loader
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from ethpm._utils.ipfs import create_ipfs_uri
+from ethpm.constants import IPFS_GATEWAY_PREFIX
+
+from .fragments import get_fragment
+from .manifest_cache import validate_cid
+from .models import Manifest
+from .utils import read_file, write_file_atomically
+
+# Bump whenever manifest_preview.html or the manifest section templates change, so
+# previously rendered previews (and browser copies of them) are not reused.
+PREVIEW_VERSION = "5"
+
+# A year, the longest max-age most caches honour.
+PREVIEW_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def preview_etag(ipfs_hash):
+    return f'"{ipfs_hash}-{PREVIEW_VERSION}"'
+
+
+def etag_matches(request, etag):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return "*" in etags or etag in etags
+
+
+# key, title, help text, spec anchor, content tag
+MANIFEST_SECTIONS = (
+    ("authors", "Authors", "A list of human readable names for the authors of this package.<br>", "authors-authors", "h4"),
+    ("description", "Description", "Any additional detail that may be relevant for the package.", "description-description", "h4"),
+    ("license", "License", "The license under which this package is released.", "license-license", "h4"),
+    ("keywords", "Keywords", "Any relevant keywords related to this package.", "keywords-keywords", "h4"),
+    ("links", "Links", "URIs to relevant resources associated with this package.", "links-links", "h4"),
+    ("sources", "Sources", "Defines the full source tree necessary to recompile the contracts in this release.", "sources-sources", "h4"),
+    ("contract_types", "Contract Types", "The contract types and respective assets which have been included in this release.", "contract-types-contract-types", "h4"),
+    ("deployments", "Deployments", "The chain information and deployment details for the deployed contract instances contained in this package.", "deployments-deployments", "h4"),
+    ("build_dependencies", "Build Dependencies", "A key/value mapping of Ethereum Packages that this package depends on.", "build-dependencies-build-dependencies", "h2"),
+)
+
+SECTIONS_MARKER = "<!-- manifest sections -->"
+
+
+def preview_path(ipfs_hash):
+    validate_cid(ipfs_hash)
+    return Path(settings.MANIFEST_CACHE_DIR) / "previews" / f"{ipfs_hash}-{PREVIEW_VERSION}.html"
+
+
+def get_stored_preview(ipfs_hash):
+    """
+    Return the previously rendered preview page for ``ipfs_hash``, or None. The page
+    is a pure function of the (immutable) manifest, so it never needs invalidating.
+    """
+    return read_file(preview_path(ipfs_hash))
+
+
+def store_preview(manifest):
+    html = "".join(iter_manifest_preview(manifest)).encode("utf-8")
+    write_file_atomically(preview_path(manifest.ipfs_hash), html)
+    return html
+
+
+def iter_manifest_preview(manifest):
+    """
+    Yield the preview page of ``manifest`` in chunks of at most one manifest section,
+    so it can be sent with a ``StreamingHttpResponse`` without ever holding the whole
+    page in memory. Rendered sections are cached by CID.
+    """
+    template = loader.get_template("registry/manifest_preview.html")
+    context = {
+        "manifest_uri": create_ipfs_uri(manifest.ipfs_hash),
+        "manifest_data": manifest,
+        "hyperlink": f"{IPFS_GATEWAY_PREFIX}{manifest.ipfs_hash}",
+        "sections": SECTIONS_MARKER,
+    }
+    head, tail = template.render(context).split(SECTIONS_MARKER)
+    yield head
+    for section in MANIFEST_SECTIONS:
+        yield get_fragment(
+            "manifest_section",
+            [manifest.ipfs_hash, section[0], PREVIEW_VERSION],
+            partial(render_section, manifest, *section),
+        )
+    yield tail
+
+
+def render_section(manifest, key, title, help_text, spec_anchor, content_tag):
+    section = manifest.section(key)
+    if section is None:
+        return ""
+    if key in ("authors", "description", "license", "keywords"):
+        body_template = "registry/manifest_sections/text.html"
+    elif key == "sources":
+        body_template = "registry/manifest_sections/entries.html"
+    else:
+        body_template = f"registry/manifest_sections/{key}.html"
+    return loader.render_to_string("registry/manifest_section.html", {
+        **section,
+        "title": title,
+        "help_text": help_text,
+        "spec_anchor": spec_anchor,
+        "content_tag": content_tag,
+        "hideable": key == "links",
+        "body_template": body_template,
+    })
+
+
+def patch_immutable_response(response, etag):
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=PREVIEW_MAX_AGE, immutable=True)
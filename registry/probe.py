@@ -0,0 +1,106 @@
+"""
+Looking for a registry on every chain of ``CHAIN_DATA`` at once. Each chain is
+probed with a registry snapshot limited to the owner and package count, a single
+round trip, and results are yielded as they arrive, so a slow chain only holds up
+its own result, for at most REGISTRY_PROBE_TIMEOUT seconds.
+"""
+from concurrent.futures import as_completed, ThreadPoolExecutor, TimeoutError
+import contextvars
+import logging
+import threading
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from eth_utils import is_address, to_checksum_address
+import requests
+from web3.exceptions import BadFunctionCallOutput
+
+from .clients import get_w3
+from .constants import CHAIN_DATA
+from .ens_cache import ens_cache
+from .models import read_registry_snapshot
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ProbeResult(NamedTuple):
+    chain_id: str
+    # "registry", "not_registry", "unresolved" (ENS name without an address),
+    # "unsupported" (ENS names are only resolved on mainnet), "error" or "timeout"
+    status: str
+    address: Optional[str] = None
+    owner: Optional[str] = None
+    package_count: Optional[int] = None
+    error: Optional[str] = None
+
+
+def get_executor():
+    # Probes wait on batches running on the shared pool of registry.concurrency, so
+    # they need a pool of their own.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.REGISTRY_PROBE_WORKERS,
+                thread_name_prefix="explorer-probe",
+            )
+        return _executor
+
+
+def iter_registry_probes(registry_address, timeout=None):
+    """
+    Yield a ``ProbeResult`` for every chain, in the order they complete. Chains
+    that don't answer within ``timeout`` seconds (REGISTRY_PROBE_TIMEOUT by default)
+    are reported as timed out.
+    """
+    if timeout is None:
+        timeout = settings.REGISTRY_PROBE_TIMEOUT
+    executor = get_executor()
+    futures = {
+        executor.submit(
+            contextvars.copy_context().run, probe_chain, chain_id, registry_address
+        ): chain_id
+        for chain_id in CHAIN_DATA
+    }
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            pending.discard(future)
+            yield future.result()
+    except TimeoutError:
+        pass
+    # a probe that timed out keeps running, its result warms the shared cache
+    for future in sorted(pending, key=futures.get):
+        yield ProbeResult(
+            futures[future],
+            "timeout",
+            error=f"No answer within {timeout} seconds",
+        )
+
+
+def probe_chain(chain_id, registry_address):
+    address = None
+    try:
+        w3 = get_w3(chain_id)
+        if is_address(registry_address):
+            address = to_checksum_address(registry_address)
+        elif chain_id != "1":
+            return ProbeResult(chain_id, "unsupported")
+        else:
+            address = ens_cache.address(w3, chain_id, registry_address)
+            if not address:
+                return ProbeResult(chain_id, "unresolved")
+        snapshot = read_registry_snapshot(w3, chain_id, address, limit=0)
+    except BadFunctionCallOutput:
+        return ProbeResult(chain_id, "not_registry", address)
+    except (ImproperlyConfigured, requests.RequestException, ValueError) as exc:
+        return ProbeResult(chain_id, "error", address, error=str(exc))
+    except Exception as exc:
+        # results are streamed, an error escaping here would cut the response short
+        logger.exception("Could not probe chain %s for %s", chain_id, registry_address)
+        return ProbeResult(chain_id, "error", address, error=f"{type(exc).__name__}: {exc}")
+    return ProbeResult(chain_id, "registry", address, snapshot.owner, snapshot.package_count)
@@ -0,0 +1,288 @@
+"""
+Full-text and faceted search over manifest metadata, kept in an SQLite FTS5 index
+next to the database. Manifests are indexed as they enter the manifest cache, so
+searching never touches IPFS or the chain.
+"""
+from collections import defaultdict
+import logging
+from pathlib import Path
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Tuple
+
+from django.conf import settings
+
+from .utils import identify_blockchain_uri
+
+logger = logging.getLogger(__name__)
+
+# Relative bm25 weights of the indexed text columns, in column order.
+COLUMN_WEIGHTS = {
+    "package_name": 10.0,
+    "keywords": 5.0,
+    "contract_types": 3.0,
+    "description": 2.0,
+    "authors": 1.0,
+    "license": 1.0,
+}
+
+FACETS = ("license", "keyword", "author", "chain")
+
+# Number of values returned per facet.
+FACET_LIMIT = 10
+# Facets of queries with more matches are counted over the best ranked ones only.
+FACET_SAMPLE_SIZE = 5000
+
+TERM_PATTERN = re.compile(r"\w+")
+
+SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS manifests USING fts5(
+    ipfs_hash UNINDEXED,
+    version UNINDEXED,
+    {", ".join(COLUMN_WEIGHTS)},
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    ipfs_hash TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS facets (
+    document_id INTEGER NOT NULL,
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (document_id, facet, value)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS facets_by_value ON facets (facet, value, document_id);
+-- bumped on every write, so facet counts over the whole index can be cached
+CREATE TABLE IF NOT EXISTS generation (value INTEGER NOT NULL);
+INSERT INTO generation SELECT 0 WHERE NOT EXISTS (SELECT * FROM generation);
+"""
+
+
+def extract_document(manifest) -> Tuple[Dict[str, Any], Tuple[Tuple[str, str], ...]]:
+    """
+    Return the indexed text columns and the ``(facet, value)`` pairs of ``manifest``.
+    """
+    meta = manifest.get("meta", {})
+    keywords = meta.get("keywords", [])
+    authors = meta.get("authors", [])
+    license = meta.get("license")
+    chains = {
+        identify_blockchain_uri(chain_uri) or chain_uri
+        for chain_uri in manifest.get("deployments", {})
+    }
+    document = {
+        "version": manifest.get("version"),
+        "package_name": manifest.get("package_name"),
+        "keywords": " ".join(keywords),
+        "contract_types": " ".join(manifest.get("contract_types", {})),
+        "description": meta.get("description", ""),
+        "authors": " ".join(authors),
+        "license": license or "",
+    }
+    facets = (
+        *(("keyword", keyword.lower()) for keyword in keywords),
+        *(("author", author) for author in authors),
+        *(("chain", chain) for chain in sorted(chains)),
+    )
+    if license:
+        facets += (("license", license),)
+    return document, facets
+
+
+def to_match_expression(query):
+    # Search user input as prefixed terms rather than FTS5 syntax, so stray quotes
+    # or operators can't make the query invalid.
+    return " ".join(f'"{term}"*' for term in TERM_PATTERN.findall(query))
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # (generation, facet rows) of the whole index
+        self._all_facets = (None, ())
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=10)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def add(self, ipfs_hash, manifest):
+        self.add_many(((ipfs_hash, manifest),))
+
+    def add_many(self, manifests: Iterable[Tuple[str, Dict[str, Any]]]):
+        """
+        Index (or re-index) ``(ipfs_hash, manifest)`` pairs in one transaction.
+        """
+        count = 0
+        with self._write_lock, self.connection as connection:
+            for ipfs_hash, manifest in manifests:
+                document, facets = extract_document(manifest)
+                # documents maps hashes to the rowids of the full-text table, which
+                # can only be looked up efficiently by rowid
+                connection.execute(
+                    "INSERT OR IGNORE INTO documents (ipfs_hash) VALUES (?)", (ipfs_hash,)
+                )
+                (document_id,) = connection.execute(
+                    "SELECT id FROM documents WHERE ipfs_hash = ?", (ipfs_hash,)
+                ).fetchone()
+                connection.execute("DELETE FROM manifests WHERE rowid = ?", (document_id,))
+                connection.execute("DELETE FROM facets WHERE document_id = ?", (document_id,))
+                connection.execute(
+                    f"INSERT INTO manifests (rowid, ipfs_hash, {', '.join(document)}) "
+                    f"VALUES (?, ?{', ?' * len(document)})",
+                    (document_id, ipfs_hash, *document.values()),
+                )
+                connection.executemany(
+                    "INSERT OR IGNORE INTO facets (document_id, facet, value) VALUES (?, ?, ?)",
+                    ((document_id, facet, value) for facet, value in facets),
+                )
+                count += 1
+            connection.execute("UPDATE generation SET value = value + 1")
+        return count
+
+    def clear(self):
+        with self._write_lock, self.connection as connection:
+            connection.execute("DELETE FROM manifests")
+            connection.execute("DELETE FROM facets")
+            connection.execute("DELETE FROM documents")
+            connection.execute("UPDATE generation SET value = value + 1")
+
+    def search(self, query="", filters=None, limit=20, offset=0):
+        """
+        Return manifests matching ``query`` and every ``{facet: value}`` filter, best
+        match first (most recently indexed first without a query), along with the
+        total number of matches and the facet values counted over all matches.
+        """
+        connection = self.connection
+        # Resolve the matching document ids once, then rank, page and count facets
+        # from them.
+        filter_queries, params = [], []
+        for facet, value in (filters or {}).items():
+            if facet not in FACETS:
+                raise ValueError(f"Unknown facet: {facet}")
+            filter_queries.append("SELECT document_id FROM facets WHERE facet = ? AND value = ?")
+            params += [facet, value.lower() if facet == "keyword" else value]
+        matches = None
+        if filter_queries:
+            matches = {
+                document_id for (document_id,) in connection.execute(
+                    " INTERSECT ".join(filter_queries), params
+                )
+            }
+
+        scores = {}
+        match = to_match_expression(query)
+        if match:
+            # Rank every full-text match and filter in Python: FTS5 runs the whole
+            # query again for each rowid of a `rowid IN (...)` constraint.
+            weights = ", ".join(["0", "0", *map(str, COLUMN_WEIGHTS.values())])
+            scores = dict(connection.execute(
+                f"SELECT rowid, bm25(manifests, {weights}) FROM manifests "
+                f"WHERE manifests MATCH ?",
+                (match,),
+            ))
+            matches = scores.keys() if matches is None else matches & scores.keys()
+
+        if matches is None:
+            (total,) = connection.execute("SELECT count(*) FROM documents").fetchone()
+            page_ids = [
+                document_id for (document_id,) in connection.execute(
+                    "SELECT id FROM documents ORDER BY id DESC LIMIT ? OFFSET ?",
+                    (limit, offset),
+                )
+            ]
+            facet_rows = self._count_all_facets(connection)
+            sampled = False
+        else:
+            total = len(matches)
+            ranked = sorted(
+                matches, key=lambda document_id: (scores.get(document_id, 0), -document_id)
+            )
+            page_ids = ranked[offset:offset + limit]
+            sampled = total > FACET_SAMPLE_SIZE
+            connection.execute("CREATE TEMP TABLE IF NOT EXISTS hits (id INTEGER PRIMARY KEY)")
+            connection.execute("DELETE FROM hits")
+            connection.executemany(
+                "INSERT INTO hits (id) VALUES (?)",
+                ((document_id,) for document_id in ranked[:FACET_SAMPLE_SIZE]),
+            )
+            facet_rows = connection.execute(
+                "SELECT facet, value, count(*) AS hits FROM facets "
+                "JOIN hits ON hits.id = facets.document_id "
+                "GROUP BY facet, value ORDER BY facet, hits DESC, value"
+            )
+
+        facets = defaultdict(list)
+        for facet, value, hits in facet_rows:
+            if len(facets[facet]) < FACET_LIMIT:
+                facets[facet].append({"value": value, "count": hits})
+        rows = {
+            row[0]: row[1:] for row in connection.execute(
+                f"SELECT rowid, ipfs_hash, package_name, version, description FROM manifests "
+                f"WHERE rowid IN ({', '.join('?' * len(page_ids))})",
+                page_ids,
+            )
+        }
+        connection.rollback()
+        return {
+            "total": total,
+            "results": [
+                {
+                    "ipfs_hash": ipfs_hash,
+                    "package_name": package_name,
+                    "version": version,
+                    "description": description,
+                }
+                for ipfs_hash, package_name, version, description in map(rows.get, page_ids)
+            ],
+            "facets": {facet: facets.get(facet, []) for facet in FACETS},
+            # True if facets were counted over the best FACET_SAMPLE_SIZE matches only
+            "facets_sampled": sampled,
+        }
+
+    def _count_all_facets(self, connection):
+        (generation,) = connection.execute("SELECT value FROM generation").fetchone()
+        cached_generation, facet_rows = self._all_facets
+        if cached_generation != generation:
+            facet_rows = tuple(connection.execute(
+                "SELECT facet, value, count(*) AS hits FROM facets "
+                "GROUP BY facet, value ORDER BY facet, hits DESC, value"
+            ))
+            self._all_facets = (generation, facet_rows)
+        return facet_rows
+
+
+search_index = SearchIndex(settings.SEARCH_INDEX_PATH)
+
+
+def index_manifest(ipfs_hash, manifest):
+    # The search index is derived data, a failure to update it, be it the database
+    # or a valid manifest the extraction doesn't expect, mustn't fail the request
+    # that fetched the manifest.
+    try:
+        search_index.add(ipfs_hash, manifest)
+    except Exception:
+        logger.exception("Could not index manifest %s for search", ipfs_hash)
+
+
+def index_manifests(manifests):
+    """
+    ``index_manifest`` for a batch of ``(ipfs_hash, manifest)`` pairs, indexed in one
+    transaction, or one at a time if any of them can't be indexed.
+    """
+    manifests = list(manifests)
+    try:
+        search_index.add_many(manifests)
+    except Exception:
+        for ipfs_hash, manifest in manifests:
+            index_manifest(ipfs_hash, manifest)
@@ -0,0 +1,95 @@
+"""
+Values shared by every worker process through Django's default cache, which
+settings point at a ``registry.cache_backends`` backend. Concurrent misses of a key
+are coalesced into a single computation ("single-flight"): threads of a process
+wait for the first of them, and processes wait for the one holding the key's lock
+in the shared cache, so a cold key wanted by many requests at once is only fetched
+from the chain or IPFS once.
+"""
+from concurrent.futures import Future
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import count
+
+# Seconds between two checks for a value computed by another process.
+POLL_INTERVAL = 0.05
+
+MISSING = object()
+
+
+class SharedCache:
+    def __init__(self, lock_timeout):
+        # Seconds a process may hold the lock of a key before others stop waiting
+        # and compute the value themselves.
+        self.lock_timeout = lock_timeout
+        # cache key -> Future of the computation in progress in this process
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get_or_set(self, namespace, key, compute, timeout=None):
+        """
+        Return the cached value of ``key``, calling ``compute`` to compute and cache
+        it for ``timeout`` seconds (forever by default) on a miss. ``timeout`` can
+        also be a function of the computed value.
+        """
+        cache_key = f"{namespace}:{key}"
+        value = cache.get(cache_key, MISSING)
+        if value is not MISSING:
+            count("shared_cache", f"{namespace}.hits")
+            return value
+
+        with self._lock:
+            flight = self._flights.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[cache_key] = Future()
+        if not leader:
+            count("shared_cache", f"{namespace}.coalesced")
+            return flight.result()
+
+        try:
+            value = self._fetch(namespace, cache_key, compute, timeout)
+        except BaseException as exc:
+            flight.set_exception(exc)
+            raise
+        else:
+            flight.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._flights[cache_key]
+
+    def _fetch(self, namespace, cache_key, compute, timeout):
+        lock_key = f"{cache_key}:lock"
+        locked = cache.add(lock_key, True, self.lock_timeout)
+        if not locked:
+            value = self._wait(cache_key, lock_key)
+            if value is not MISSING:
+                count("shared_cache", f"{namespace}.waited")
+                return value
+        count("shared_cache", f"{namespace}.misses")
+        try:
+            value = compute()
+            cache.set(cache_key, value, timeout(value) if callable(timeout) else timeout)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        return value
+
+    def _wait(self, cache_key, lock_key):
+        # Wait for the process holding the lock to cache the value, give up if it
+        # released the lock without doing so (its computation failed) or is too slow.
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            value = cache.get(cache_key, MISSING)
+            if value is not MISSING or not cache.has_key(lock_key):
+                return cache.get(cache_key, MISSING) if value is MISSING else value
+        return MISSING
+
+
+shared_cache = SharedCache(settings.SHARED_CACHE_LOCK_TIMEOUT)
@@ -0,0 +1,297 @@
+from collections import Counter
+import itertools
+import json
+from typing import Any, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+from eth_abi.exceptions import DecodingError
+from eth_utils import (
+    encode_hex,
+    function_abi_to_4byte_selector,
+    to_bytes,
+    to_tuple,
+)
+from web3._utils.abi import get_abi_input_types, get_abi_output_types, map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+from web3._utils.request import make_post_request
+from web3.exceptions import BadFunctionCallOutput
+from web3.pm import get_simple_registry_manifest
+
+from .concurrency import map_concurrently
+from .metrics import count, timed
+
+# Number of package ids requested per getAllPackageIds(offset, limit) call.
+PAGE_SIZE = 100
+
+
+class RegistrySnapshot(NamedTuple):
+    owner: Optional[str]
+    package_count: int
+    # (package_name, release_count) pairs in registry order, starting at ``offset``
+    packages: Tuple[Tuple[str, int], ...]
+    offset: int = 0
+
+
+class ContractCall(NamedTuple):
+    fn_name: str
+    args: Tuple[Any, ...] = ()
+
+
+def get_registry_contract(w3, address):
+    abi = get_simple_registry_manifest()["contract_types"]["PackageRegistry"]["abi"]
+    return w3.eth.contract(address=address, abi=abi)
+
+
+def load_registry_snapshot(w3, address, offset=0, limit=None) -> RegistrySnapshot:
+    """
+    Read the owner, package names and release counts of an ERC1319 registry using a
+    constant number of JSON-RPC round trips (4), independent of the package count.
+    Only the packages at positions [offset, offset + limit) are read if a ``limit``
+    is given. Raises ``BadFunctionCallOutput`` if the contract doesn't look like a
+    registry, and ``ValueError`` if the node fails a request.
+    """
+    contract = get_registry_contract(w3, address)
+    block_number, (owner, package_count) = batch_call(
+        w3,
+        contract,
+        (ContractCall("owner"), ContractCall("numPackageIds")),
+        allow_failure=(True, False),
+        with_block_number=True,
+    )
+    # Pin every following round to the same block so the snapshot is consistent.
+    block_id = hex(block_number)
+    offset = min(offset, package_count)
+    if limit is None or offset + limit > package_count:
+        limit = package_count - offset
+    package_ids = get_package_ids(w3, contract, offset, limit, block_id)
+    package_names = batch_call(
+        w3,
+        contract,
+        [ContractCall("getPackageName", (package_id,)) for package_id in package_ids],
+        block_id=block_id,
+    )
+    release_counts = batch_call(
+        w3,
+        contract,
+        [ContractCall("numReleaseIds", (name,)) for name in package_names],
+        block_id=block_id,
+    )
+    return RegistrySnapshot(
+        owner=owner,
+        package_count=package_count,
+        packages=tuple(zip(package_names, release_counts)),
+        offset=offset,
+    )
+
+
+def load_package_releases(w3, address, package_name):
+    """
+    Return ``(version, manifest_uri)`` pairs for every release of ``package_name``
+    using three JSON-RPC round trips, independent of the release count.
+    """
+    contract = get_registry_contract(w3, address)
+    block_number, (release_count,) = batch_call(
+        w3,
+        contract,
+        (ContractCall("numReleaseIds", (package_name,)),),
+        with_block_number=True,
+    )
+    block_id = hex(block_number)
+    page_calls = [
+        ContractCall("getAllReleaseIds", (package_name, pointer, PAGE_SIZE))
+        for pointer in range(0, release_count, PAGE_SIZE)
+    ]
+    pages = batch_call(w3, contract, page_calls, block_id=block_id)
+    release_ids = dict.fromkeys(
+        itertools.chain.from_iterable(reversed(ids) for ids, _ in pages)
+    )
+    release_data = batch_call(
+        w3,
+        contract,
+        [ContractCall("getReleaseData", (release_id,)) for release_id in release_ids],
+        block_id=block_id,
+    )
+    return tuple((version, manifest_uri) for _, version, manifest_uri in release_data)
+
+
+def get_package_ids(w3, contract, offset, limit, block_id="latest"):
+    """
+    Return the package ids at positions [offset, offset + limit), fetching every
+    page of ``getAllPackageIds`` in a single batch.
+    """
+    page_calls = [
+        ContractCall("getAllPackageIds", (pointer, min(PAGE_SIZE, offset + limit - pointer)))
+        for pointer in range(offset, offset + limit, PAGE_SIZE)
+    ]
+    pages = batch_call(w3, contract, page_calls, block_id=block_id)
+    # The reference registry returns each page in reverse order.
+    ordered_ids = itertools.chain.from_iterable(reversed(ids) for ids, _ in pages)
+    return tuple(dict.fromkeys(ordered_ids))
+
+
+def batch_call(
+    w3,
+    contract,
+    calls: Sequence[ContractCall],
+    block_id="latest",
+    allow_failure: Iterable[bool] = None,
+    with_block_number=False,
+):
+    """
+    Execute ``calls`` against ``contract`` as a JSON-RPC batch (see ``batch_request``)
+    and return the decoded outputs in order. Calls flagged in ``allow_failure`` return ``None``
+    instead of raising ``BadFunctionCallOutput``, requests failed by the node raise
+    ``ValueError`` either way. With ``with_block_number`` an ``eth_blockNumber``
+    request rides along and ``(block_number, outputs)`` is returned.
+    """
+    if allow_failure is None:
+        allow_failure = itertools.repeat(False)
+    # Encode and decode with the codec directly: building a ContractFunction per
+    # call costs more CPU than the round trip saved by batching.
+    signatures = {
+        fn_name: FunctionSignature.from_abi(contract.get_function_by_name(fn_name).abi)
+        for fn_name in set(call.fn_name for call in calls)
+    }
+    requests = [
+        (
+            "eth_call",
+            [
+                {"to": contract.address, "data": signatures[call.fn_name].encode(w3, call.args)},
+                block_id,
+            ],
+        )
+        for call in calls
+    ]
+    if with_block_number:
+        requests.append(("eth_blockNumber", []))
+    responses = batch_request(w3, requests)
+
+    outputs = tuple(
+        decode_call_output(w3, signatures[call.fn_name], response, can_fail)
+        for call, response, can_fail in zip(calls, responses, allow_failure)
+    )
+    if with_block_number:
+        return to_int(get_result(responses[-1])), outputs
+    return outputs
+
+
+class FunctionSignature(NamedTuple):
+    fn_name: str
+    selector: bytes
+    input_types: Tuple[str, ...]
+    output_types: Tuple[str, ...]
+
+    @classmethod
+    def from_abi(cls, fn_abi):
+        return cls(
+            fn_abi["name"],
+            function_abi_to_4byte_selector(fn_abi),
+            tuple(get_abi_input_types(fn_abi)),
+            tuple(get_abi_output_types(fn_abi)),
+        )
+
+    def encode(self, w3, args):
+        return encode_hex(self.selector + w3.codec.encode_abi(self.input_types, args))
+
+
+def decode_call_output(w3, signature, response, can_fail=False):
+    output_types = signature.output_types
+    try:
+        if is_revert(response):
+            raise BadFunctionCallOutput(f"{signature.fn_name} call reverted: {response['error']}")
+        output_data = w3.codec.decode_abi(output_types, to_result_bytes(get_result(response)))
+    except (DecodingError, BadFunctionCallOutput) as exc:
+        if can_fail:
+            return None
+        raise BadFunctionCallOutput(
+            f"Could not decode {signature.fn_name} return data for output types {output_types}"
+        ) from exc
+    if any(output_type.startswith("address") for output_type in output_types):
+        # the return normalizers only checksum addresses, skip them otherwise
+        normalized = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, output_data)
+    else:
+        normalized = output_data
+    if len(normalized) == 1:
+        return normalized[0]
+    return normalized
+
+
+def is_revert(response):
+    # Nodes answer a reverted eth_call with an error, but the call failed on the
+    # contract's side, like a call returning no data.
+    return "error" in response and "revert" in str(response["error"]).lower()
+
+
+def get_result(response):
+    # Other errors say nothing about the contract called, they're raised like web3's
+    # request manager raises them, not as a failed call.
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response["result"]
+
+
+def to_result_bytes(result):
+    if isinstance(result, (bytes, bytearray)):
+        return bytes(result)
+    return to_bytes(hexstr=result)
+
+
+def to_int(result):
+    if isinstance(result, int):
+        return result
+    return int(result, 16)
+
+
+@to_tuple
+def batch_request(w3, requests):
+    """
+    Send ``(method, params)`` pairs as JSON-RPC batches when the provider is HTTP
+    based. Other providers (eg. eth-tester) don't accept batches, so each request
+    is made in turn. Responses are returned in request order.
+    """
+    if not requests:
+        return
+    endpoint_uri = getattr(w3.provider, "endpoint_uri", None)
+    if endpoint_uri is None:
+        for method, params in requests:
+            try:
+                yield {"result": w3.manager.request_blocking(method, params)}
+            except ValueError as exc:
+                yield {"error": {"message": str(exc)}}
+            except Exception as exc:
+                # eth-tester raises its own TransactionFailed for reverted calls
+                if type(exc).__name__ != "TransactionFailed":
+                    raise
+                yield {"error": {"message": f"execution reverted: {exc}"}}
+        return
+
+    payload = [
+        {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        for request_id, (method, params) in enumerate(requests)
+    ]
+    # Nodes cap the size of a batch, so large batches are split into chunks that
+    # are sent concurrently.
+    batch_size = settings.WEB3_BATCH_SIZE
+    chunks = [payload[start:start + batch_size] for start in range(0, len(payload), batch_size)]
+    for responses in map_concurrently(lambda chunk: post_batch(w3, chunk), chunks):
+        yield from responses
+
+
+def post_batch(w3, payload):
+    data = json.dumps(payload).encode("utf-8")
+    # batches bypass the web3 middlewares, so account for them here
+    for method, calls in Counter(request["method"] for request in payload).items():
+        count("rpc_batched", method, calls)
+    with timed("rpc", "batch"):
+        if hasattr(w3.provider, "post"):
+            # pooled providers, see registry.clients
+            raw_response = w3.provider.post(data)
+        else:
+            raw_response = make_post_request(
+                w3.provider.endpoint_uri, data, **w3.provider.get_request_kwargs()
+            )
+    responses = json.loads(raw_response)
+    if not isinstance(responses, list):
+        # Some nodes answer a rejected batch with a single error object.
+        raise ValueError(f"Batch request rejected: {responses}")
+    return sorted(responses, key=lambda response: response["id"])
@@ -0,0 +1,404 @@
+"""
+Local stand-ins for the remote services the explorer talks to, used by the
+``benchmark`` management command.
+"""
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import socket
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from eth_abi import decode_abi, encode_abi
+from eth_utils import function_abi_to_4byte_selector, keccak, to_bytes, to_hex
+from web3.pm import get_simple_registry_manifest
+
+STUB_OWNER = "0x" + "ab" * 20
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    # the default backlog of 5 stalls connections under concurrent benchmarks
+    request_queue_size = 128
+
+
+class StubTCPServer(ThreadingTCPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class StubServer:
+    """
+    Serve ``handler_class`` on an ephemeral localhost port from a daemon thread.
+    """
+    server_class = StubHTTPServer
+    handler_class = None
+
+    def __init__(self):
+        self.httpd = self.server_class(("127.0.0.1", 0), self.handler_class)
+        self.httpd.stub = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class StubRPCHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        response = self.server.stub.handle_payload(json.loads(body))
+        content = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubRegistryRPC(StubServer):
+    """
+    A JSON-RPC endpoint that answers ``eth_call`` as if an ERC1319 reference registry
+    holding ``package_count`` packages with ``releases_per_package`` releases each
+    was deployed at every address. Counts HTTP round trips and individual RPC calls,
+    and delays every round trip by ``latency`` seconds to mimic a remote node.
+    """
+    handler_class = StubRPCHandler
+
+    def __init__(self, package_count, releases_per_package=1, chain_id="3", latency=0):
+        super().__init__()
+        self.chain_id = chain_id
+        self.latency = latency
+        self.package_names = [f"package-{index}" for index in range(package_count)]
+        self.package_ids = [keccak(text=name) for name in self.package_names]
+        self.releases_per_package = releases_per_package
+        # (package name, version) -> manifest uri, for releases that shouldn't
+        # point at the default manifest
+        self.manifest_uris = {}
+        self.round_trips = 0
+        self.rpc_calls = Counter()
+        self.lock = threading.Lock()
+        abi = get_simple_registry_manifest()["contract_types"]["PackageRegistry"]["abi"]
+        self.functions = {
+            function_abi_to_4byte_selector(fn_abi): fn_abi
+            for fn_abi in abi
+            if fn_abi["type"] == "function"
+        }
+
+    def reset(self):
+        with self.lock:
+            self.round_trips = 0
+            self.rpc_calls.clear()
+
+    def handle_payload(self, payload):
+        with self.lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(payload, list):
+            return [self.handle_request(request) for request in payload]
+        return self.handle_request(payload)
+
+    def handle_request(self, request):
+        method, params = request["method"], request.get("params", [])
+        with self.lock:
+            self.rpc_calls[method] += 1
+        if method == "web3_clientVersion":
+            result = "StubRegistryRPC"
+        elif method == "net_version":
+            result = self.chain_id
+        elif method == "eth_chainId":
+            result = hex(int(self.chain_id))
+        elif method == "eth_blockNumber":
+            result = "0x1"
+        elif method == "eth_call":
+            result = self.call(to_bytes(hexstr=params[0]["data"]))
+        else:
+            return {
+                "jsonrpc": "2.0",
+                "id": request["id"],
+                "error": {"code": -32601, "message": f"{method} not supported by stub"},
+            }
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    def call(self, data):
+        fn_abi = self.functions.get(data[:4])
+        if fn_abi is None:
+            return "0x"
+        input_types = [arg["type"] for arg in fn_abi["inputs"]]
+        output_types = [arg["type"] for arg in fn_abi["outputs"]]
+        args = decode_abi(input_types, data[4:])
+        output = self.call_function(fn_abi["name"], *args)
+        if output is None:
+            return "0x"
+        return to_hex(encode_abi(output_types, output))
+
+    def call_function(self, fn_name, *args):
+        if fn_name == "owner":
+            return (STUB_OWNER,)
+        elif fn_name == "numPackageIds":
+            return (len(self.package_ids),)
+        elif fn_name == "getAllPackageIds":
+            offset, limit = args
+            page = self.package_ids[offset:offset + limit]
+            return (list(reversed(page)), offset + len(page))
+        elif fn_name == "getPackageName":
+            return (self.package_names[self.package_ids.index(args[0])],)
+        elif fn_name == "numReleaseIds":
+            return (self.releases_per_package,)
+        elif fn_name == "getAllReleaseIds":
+            package_name, offset, limit = args
+            versions = range(offset, min(offset + limit, self.releases_per_package))
+            release_ids = [keccak(text=f"{package_name}@1.0.{version}") for version in versions]
+            return (list(reversed(release_ids)), offset + len(release_ids))
+        elif fn_name == "getReleaseData":
+            package_name, version = self.releases[args[0]]
+            return (package_name, version, self.manifest_uri(package_name, version))
+        return None
+
+    @property
+    def releases(self):
+        # release id -> (package name, version), built on first use
+        if not hasattr(self, "_releases"):
+            self._releases = {
+                keccak(text=f"{name}@1.0.{version}"): (name, f"1.0.{version}")
+                for name in self.package_names
+                for version in range(self.releases_per_package)
+            }
+        return self._releases
+
+    def manifest_uri(self, package_name, version):
+        return self.manifest_uris.get(
+            (package_name, version), "ipfs://QmTKB75Y73zhNbD3Y73xeXGjYrZHmaXXNxoZqGCagu7r8u"
+        )
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # gateway: GET /ipfs/<cid>
+        self.respond(self.path.rsplit("/", 1)[-1])
+
+    def do_POST(self):
+        # node API: POST /api/v0/cat?arg=<cid>
+        self.respond(parse_qs(urlparse(self.path).query).get("arg", [""])[0])
+
+    def respond(self, cid):
+        status, content = self.server.stub.handle_request(cid)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubIPFSGateway(StubServer):
+    """
+    An IPFS gateway serving ``contents``, a ``{cid: bytes}`` dict, after ``latency``
+    seconds. A ``tampered`` gateway serves altered content, a ``failing`` one
+    answers every request with a 502.
+    """
+    handler_class = StubGatewayHandler
+
+    def __init__(self, contents, latency=0, tampered=False, failing=False):
+        super().__init__()
+        self.contents = contents
+        self.latency = latency
+        self.tampered = tampered
+        self.failing = failing
+        self.requests = Counter()
+
+    @property
+    def gateway_url(self):
+        return f"{self.url}/ipfs"
+
+    def handle_request(self, cid):
+        self.requests[cid] += 1
+        time.sleep(self.latency)
+        if self.failing:
+            return 502, b"Bad Gateway"
+        if cid not in self.contents:
+            return 404, b"Not Found"
+        content = self.contents[cid]
+        return 200, content + b" " if self.tampered else content
+
+
+class StubRedisHandler(StreamRequestHandler):
+    def handle(self):
+        self.server.stub.connections.add(self.connection)
+        while True:
+            command = read_resp_command(self.rfile)
+            if command is None:
+                return
+            self.wfile.write(encode_resp_reply(self.server.stub.handle_command(command)))
+
+
+def read_resp_command(rfile):
+    header = rfile.readline()
+    if not header.startswith(b"*"):
+        return None
+    command = []
+    for _ in range(int(header[1:])):
+        length = int(rfile.readline()[1:])
+        command.append(rfile.read(length + 2)[:-2])
+    return command
+
+
+def encode_resp_reply(reply):
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return f"-ERR {reply}\r\n".encode("utf-8")
+    if isinstance(reply, str):
+        return f"+{reply}\r\n".encode("utf-8")
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode("ascii")
+    if isinstance(reply, list):
+        return b"".join([f"*{len(reply)}\r\n".encode("ascii"), *map(encode_resp_reply, reply)])
+    return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+
+class StubRedisServer(StubServer):
+    """
+    An in-memory server speaking enough of the Redis protocol for
+    ``registry.cache_backends.RedisCache``, answering after ``latency`` seconds.
+    """
+    server_class = StubTCPServer
+    handler_class = StubRedisHandler
+
+    def __init__(self, latency=0):
+        super().__init__()
+        self.latency = latency
+        self.commands = Counter()
+        # key -> (value, expires_at or None)
+        self.data = {}
+        self.connections = set()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"redis://{host}:{port}/0"
+
+    def close_connections(self):
+        """
+        Close every client connection, like Redis does with connections idle for
+        longer than its ``timeout``.
+        """
+        for connection in list(self.connections):
+            connection.shutdown(socket.SHUT_RDWR)
+        self.connections.clear()
+
+    def handle_command(self, command):
+        name, *args = command
+        name = name.decode("ascii").lower()
+        self.commands[name] += 1
+        time.sleep(self.latency)
+        handler = getattr(self, f"command_{name}", None)
+        if handler is None:
+            return ValueError(f"unknown command '{name}'")
+        with self._lock:
+            return handler(*args)
+
+    def command_ping(self):
+        return "PONG"
+
+    def command_auth(self, *args):
+        return "OK"
+
+    def command_select(self, db):
+        return "OK"
+
+    def command_flushdb(self):
+        self.data.clear()
+        return "OK"
+
+    def command_get(self, key):
+        entry = self._entry(key)
+        return entry and entry[0]
+
+    def command_mget(self, *keys):
+        return [self.command_get(key) for key in keys]
+
+    def command_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b"NX" in options and self._entry(key):
+            return None
+        expires_at = None
+        if b"PX" in options:
+            expires_at = time.monotonic() + int(options[options.index(b"PX") + 1]) / 1000
+        self.data[key] = (value, expires_at)
+        return "OK"
+
+    def command_del(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def command_exists(self, *keys):
+        return sum(self._entry(key) is not None for key in keys)
+
+    def command_pexpire(self, key, milliseconds):
+        entry = self._entry(key)
+        if entry is None:
+            return 0
+        self.data[key] = (entry[0], time.monotonic() + int(milliseconds) / 1000)
+        return 1
+
+    def command_persist(self, key):
+        entry = self._entry(key)
+        if entry is None or entry[1] is None:
+            return 0
+        self.data[key] = (entry[0], None)
+        return 1
+
+    def _entry(self, key):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+
+def synthetic_manifest(size, sources=10, contract_types=10):
+    """
+    Return the raw bytes of a schema-valid manifest of roughly ``size`` bytes, split
+    evenly between inlined sources and contract type bytecode.
+    """
+    source_size = max(size // (2 * sources), 1)
+    bytecode_size = max(size // (4 * contract_types), 1)
+    manifest = {
+        "manifest_version": "2",
+        "package_name": "synthetic",
+        "version": "1.0.0",
+        "meta": {
+            "authors": ["snakecharmers"],
+            "description": "A synthetic manifest for benchmarks.",
+            "license": "MIT",
+            "keywords": ["benchmark"],
+        },
+        "sources": {
+            f"./contracts/Contract{index}.sol": "// " + "x" * source_size
+            for index in range(sources)
+        },
+        "contract_types": {
+            f"Contract{index}": {
+                "abi": [],
+                "deployment_bytecode": {"bytecode": "0x" + "60" * bytecode_size},
+            }
+            for index in range(contract_types)
+        },
+    }
+    return json.dumps(manifest, sort_keys=True).encode("utf-8")
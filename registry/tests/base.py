@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings, TestCase
+from web3 import EthereumTesterProvider, Web3
+
+from registry import clients
+from registry.ipfs import compute_cid
+from registry.manifest_cache import manifest_cache
+from registry.prefetch import manifest_prefetcher
+from registry.search import search_index
+
+# Tests don't share their cache with the workers of this machine.
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+MANIFEST_URI = "ipfs://QmTKB75Y73zhNbD3Y73xeXGjYrZHmaXXNxoZqGCagu7r8u"
+TESTER_CHAIN_ID = "3"
+
+
+def deploy_tester_registry(releases):
+    """
+    Deploy a registry to a new eth-tester chain and release ``(package_name,
+    version)`` of ``releases``, one block each. Returns the Web3 client, the
+    registry address and the block of the deployment.
+    """
+    w3 = Web3(EthereumTesterProvider())
+    w3.enable_unstable_package_management_api()
+    w3.eth.defaultAccount = w3.eth.accounts[0]
+    address = w3.pm.deploy_and_set_registry()
+    deployment_block = w3.eth.blockNumber
+    for package_name, version in releases:
+        w3.pm.registry._release(package_name, version, MANIFEST_URI)
+    return w3, address, deployment_block
+
+
+def serialize_manifest(manifest):
+    return json.dumps(manifest, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def make_manifest(package_name, version="1.0.0", **fields):
+    return {"manifest_version": "2", "package_name": package_name, "version": version, **fields}
+
+
+def isolate(singleton, *args):
+    # Re-initialize a module singleton with ``args``, returning a function restoring it.
+    state = vars(singleton).copy()
+    singleton.__init__(*args)
+
+    def restore():
+        vars(singleton).clear()
+        vars(singleton).update(state)
+    return restore
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RegistryTestCase(TestCase):
+    """
+    Every test starts with an empty shared cache, and a manifest cache, preview
+    directory and search index of its own. Nothing is prefetched from IPFS.
+    """
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        cache_dir = override_settings(MANIFEST_CACHE_DIR=str(self.directory / "manifests"))
+        cache_dir.enable()
+        self.addCleanup(cache_dir.disable)
+        self.addCleanup(isolate(manifest_cache, self.directory / "manifests", 10 ** 7))
+        self.addCleanup(isolate(search_index, self.directory / "search.sqlite3"))
+        prefetch = mock.patch.object(manifest_prefetcher, "prefetch")
+        prefetch.start()
+        self.addCleanup(prefetch.stop)
+
+    def put_manifest(self, manifest, ipfs_hash=None):
+        raw = serialize_manifest(manifest)
+        ipfs_hash = ipfs_hash or compute_cid(raw)
+        manifest_cache.put(ipfs_hash, raw)
+        return ipfs_hash, raw
+
+    def use_chain(self, w3, chain_id=TESTER_CHAIN_ID):
+        patcher = mock.patch.dict(clients._clients, {chain_id: w3})
+        patcher.start()
+        self.addCleanup(patcher.stop)
@@ -0,0 +1,80 @@
+from django.test import Client
+
+from registry.tests.base import (
+    deploy_tester_registry,
+    make_manifest,
+    MANIFEST_URI,
+    RegistryTestCase,
+    TESTER_CHAIN_ID,
+)
+
+
+class RegistryAPITests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.w3, self.address, _ = deploy_tester_registry(
+            [("owned", "1.0.0"), ("owned", "1.0.1"), ("wallet", "1.0.0")]
+        )
+        self.use_chain(self.w3)
+        self.client = Client(HTTP_HOST="localhost")
+        self.url = f"/api/v1/{TESTER_CHAIN_ID}/registries/{self.address}/"
+
+    def test_registry(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data["address"], self.address)
+        self.assertEqual(data["owner"], self.w3.eth.accounts[0])
+        self.assertEqual((data["is_valid"], data["package_count"]), (True, 2))
+        self.assertEqual(self.client.get("/api/v1/9000/registries/0x0/").status_code, 404)
+
+    def test_packages(self):
+        data = self.client.get(self.url + "packages/", {"limit": 1}).json()
+        self.assertEqual(data["packages"], [{"name": "owned", "release_count": 2}])
+        self.assertEqual(data["next_cursor"], 1)
+        self.assertEqual(self.client.get(self.url + "packages/", {"limit": 0}).status_code, 400)
+
+    def test_releases(self):
+        data = self.client.get(self.url + "packages/owned/releases/").json()
+        self.assertEqual(
+            [(release["version"], release["manifest_uri"]) for release in data["releases"]],
+            [("1.0.0", MANIFEST_URI), ("1.0.1", MANIFEST_URI)],
+        )
+        self.assertEqual(
+            data["releases"][0]["ethpm_uri"],
+            f"ethpm://{self.address}:{TESTER_CHAIN_ID}/owned@1.0.0",
+        )
+        response = self.client.get(self.url + "packages/missing/releases/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_etag_revalidation(self):
+        response = self.client.get(self.url + "packages/")
+        self.assertIn("no-cache", response["Cache-Control"])
+        response = self.client.get(self.url + "packages/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+
+class ManifestAPITests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = Client(HTTP_HOST="localhost")
+        self.ipfs_hash, self.raw = self.put_manifest(make_manifest("owned"))
+
+    def test_search_etag_revalidation(self):
+        response = self.client.get("/api/v1/search/", {"q": "owned"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+        response = self.client.get("/api/v1/search/", {"q": "owned"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get("/api/v1/search/", {"q": "other"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_manifest_is_served_immutable(self):
+        url = f"/api/v1/manifests/{self.ipfs_hash}/"
+        response = self.client.get(url)
+        self.assertEqual(response.content, self.raw)
+        self.assertEqual(response["ETag"], f'"{self.ipfs_hash}"')
+        self.assertIn("immutable", response["Cache-Control"])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{self.ipfs_hash}"')
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("immutable", response["Cache-Control"])
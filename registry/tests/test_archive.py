@@ -0,0 +1,105 @@
+import gzip
+from unittest import mock
+
+from registry import archive
+from registry.manifest_cache import manifest_cache
+from registry.models import Package, Registry, Release
+from registry.search import extract_document, search_index
+from registry.tests.base import isolate, make_manifest, RegistryTestCase, serialize_manifest
+
+
+
+
+class ArchiveTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.manifests = {}
+        for chain_id, package_name in (("1", "owned"), ("3", "wallet")):
+            ipfs_hash, raw = self.put_manifest(make_manifest(package_name))
+            self.manifests[ipfs_hash] = raw
+            registry = Registry.objects.create(
+                chain_id=chain_id, address="0x" + chain_id * 40, package_count=1
+            )
+            package = Package.objects.create(
+                registry=registry, name=package_name, release_count=1, position=0
+            )
+            Release.objects.create(
+                package=package, version="1.0.0", manifest_uri=f"ipfs://{ipfs_hash}"
+            )
+        self.archive_dir = self.directory / "archive"
+
+    def index_rows(self):
+        return (
+            set(Registry.objects.values_list("chain_id", "address", "package_count")),
+            set(Package.objects.values_list("registry__address", "name", "position")),
+            set(Release.objects.values_list("package__name", "version", "manifest_uri")),
+        )
+
+    def reset(self):
+        Registry.objects.all().delete()
+        isolate(manifest_cache, self.directory / "imported", 10 ** 7)
+
+    def test_round_trip(self):
+        rows = self.index_rows()
+        counts = archive.export_index(self.archive_dir)
+        self.assertEqual(
+            (counts["registry"], counts["package"], counts["release"], counts["manifest"]),
+            (2, 2, 2, 2),
+        )
+        self.reset()
+        counts = archive.import_index(self.archive_dir, batch_size=1)
+        self.assertEqual((counts["manifest"], counts["rejected"]), (2, 0))
+        self.assertEqual(self.index_rows(), rows)
+        self.assertEqual(dict(manifest_cache.iter_stored_raw()), self.manifests)
+        # importing again leaves the index as it is
+        archive.import_index(self.archive_dir)
+        self.assertEqual(self.index_rows(), rows)
+
+    def test_export_of_a_chain(self):
+        counts = archive.export_index(self.archive_dir, ["3"])
+        self.assertEqual((counts["registry"], counts["manifest"]), (1, 1))
+        with gzip.open(self.archive_dir / archive.BLOBS_FILE) as blobs_file:
+            (ipfs_hash, _), = archive.iter_blobs(blobs_file)
+        self.assertEqual(
+            f"ipfs://{ipfs_hash}",
+            Release.objects.get(package__registry__chain_id="3").manifest_uri,
+        )
+
+    def test_forged_manifests_are_rejected(self):
+        archive.export_index(self.archive_dir)
+        (honest, raw), (forged, _) = self.manifests.items()
+        with gzip.open(self.archive_dir / archive.BLOBS_FILE, "wb") as blobs_file:
+            archive.write_blob(blobs_file, honest, raw)
+
+    def test_invalid_manifests_are_rejected(self):
+        archive.export_index(self.archive_dir)
+        with gzip.open(self.archive_dir / archive.BLOBS_FILE, "wb") as blobs_file:
+            for ipfs_hash, raw in self.manifests.items():
+                archive.write_blob(blobs_file, ipfs_hash, raw)
+            archive.write_blob(blobs_file, "QmNotJSON", b"{")
+            archive.write_blob(
+                blobs_file, "QmNotManifest", serialize_manifest({"package_name": "owned"})
+            )
+            archive.write_blob(blobs_file, "../QmNotCID", b"{}")
+        self.reset()
+        with self.assertLogs("registry.archive", "WARNING"):
+            counts = archive.import_index(self.archive_dir, batch_size=2)
+        self.assertEqual((counts["manifest"], counts["rejected"]), (2, 3))
+        self.assertEqual(dict(manifest_cache.iter_stored_raw()), self.manifests)
+
+    def test_index_errors_dont_stop_the_import(self):
+        archive.export_index(self.archive_dir)
+        self.reset()
+        search_index.clear()
+
+        def extract(manifest):
+            if manifest["package_name"] == "owned":
+                raise KeyError("meta")
+            return extract_document(manifest)
+
+        with mock.patch("registry.search.extract_document", side_effect=extract):
+            with self.assertLogs("registry.search", "ERROR"):
+                counts = archive.import_index(self.archive_dir)
+        self.assertEqual((counts["manifest"], counts["rejected"]), (2, 0))
+        self.assertEqual(dict(manifest_cache.iter_stored_raw()), self.manifests)
+        self.assertEqual(search_index.search("wallet")["total"], 1)
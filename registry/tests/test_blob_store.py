@@ -0,0 +1,90 @@
+import json
+
+from registry.blob_store import (
+    assemble_manifest,
+    BlobStore,
+    find_json_format,
+    JSON_FORMATS,
+    serialize,
+    split_manifest,
+)
+from registry.manifest_cache import ManifestCache
+from registry.tests.base import make_manifest, RegistryTestCase
+
+ABI = [
+    {"type": "function", "name": f"method{index}", "inputs": [], "outputs": []}
+    for index in range(5)
+]
+SOURCE = "pragma solidity ^0.5.0;\n\ncontract Owned {\n" + "    // comment\n" * 20 + "}\n"
+
+
+def make_contract_manifest(version="1.0.0"):
+    return make_manifest(
+        "owned",
+        version,
+        meta={"description": "Öwned, a contract with an owner"},
+        sources={"./Owned.sol": SOURCE, "./Linked.sol": "ipfs://QmLinked"},
+        contract_types={
+            "Owned": {"abi": ABI, "runtime_bytecode": {"bytecode": "0x6080"}},
+            "Empty": {"abi": []},
+        },
+    )
+
+
+class BlobStoreTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.manifest = make_contract_manifest()
+
+    def test_split_and_assemble(self):
+        skeleton, parts = split_manifest(self.manifest)
+        self.assertEqual(
+            [path for path, _ in parts],
+            [("contract_types", "Owned", "abi"), ("sources", "./Owned.sol")],
+        )
+        # small values stay in the skeleton, and the manifest is left as it was
+        self.assertEqual(skeleton["sources"]["./Linked.sol"], "ipfs://QmLinked")
+        self.assertEqual(skeleton["contract_types"]["Empty"], {"abi": []})
+        self.assertIsNone(skeleton["contract_types"]["Owned"]["abi"])
+        self.assertEqual(self.manifest["contract_types"]["Owned"]["abi"], ABI)
+        self.assertEqual(assemble_manifest(skeleton, parts), self.manifest)
+
+    def test_json_formats_round_trip(self):
+        for json_format, options in enumerate(JSON_FORMATS):
+            raw = json.dumps(self.manifest, **options).encode("utf-8")
+            self.assertEqual(find_json_format(json.loads(raw), raw), json_format)
+            skeleton, parts = split_manifest(json.loads(raw))
+            # the assembled manifest keeps the order of the keys of the original
+            self.assertEqual(serialize(assemble_manifest(skeleton, parts), json_format), raw)
+        raw = json.dumps(self.manifest, indent=2).encode("utf-8")
+        self.assertIsNone(find_json_format(self.manifest, raw))
+
+    def test_cached_manifests_are_byte_exact(self):
+        raws = [
+            json.dumps(make_contract_manifest(version), **options).encode("utf-8")
+            for version, options in [
+                *((f"1.0.{index}", options) for index, options in enumerate(JSON_FORMATS)),
+                ("2.0.0", {"indent": 2}),
+            ]
+        ]
+        manifest_cache = ManifestCache(self.directory / "cache", 10 ** 6)
+        for index, raw in enumerate(raws):
+            manifest_cache.put(f"QmOwned{index}", raw)
+        # another worker reads them back from disk
+        other_cache = ManifestCache(self.directory / "cache", 10 ** 6)
+        for index, raw in enumerate(raws):
+            self.assertEqual(other_cache.get(f"QmOwned{index}").raw, raw)
+            self.assertEqual(other_cache.get(f"QmOwned{index}").manifest, json.loads(raw))
+        # the releases share their ABI and source, the last one is stored as it is
+        self.assertEqual(manifest_cache.blob_store.get_stats()["blobs"], 3)
+
+    def test_corrupted_blobs(self):
+        blob_store = BlobStore(self.directory / "blobs")
+        digest = blob_store.put(b"blob")
+        self.assertEqual(blob_store.put(b"blob"), digest)
+        self.assertEqual(blob_store.get(digest), b"blob")
+        path = blob_store._path(digest)
+        other_digest = blob_store.put(b"other")
+        path.write_bytes(blob_store._path(other_digest).read_bytes())
+        with self.assertRaises(ValueError):
+            blob_store.get(digest)
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+from registry.tests.base import RegistryTestCase
+
+# Boots a worker through the WSGI application, serves the index and prints the
+# heavy modules loaded at each step.
+BOOT_SCRIPT = """
+import json, sys
+from wsgiref.util import setup_testing_defaults
+
+def heavy_modules():
+    return sorted(name for name in ("ens", "ethpm", "web3") if name in sys.modules)
+
+from ethpm_explorer.wsgi import application
+booted = heavy_modules()
+environ = {"HTTP_HOST": "localhost"}
+setup_testing_defaults(environ)
+statuses = []
+b"".join(application(environ, lambda status, headers: statuses.append(status)))
+print(json.dumps({"booted": booted, "served": heavy_modules(), "status": statuses[0]}))
+"""
+
+
+class BootTests(RegistryTestCase):
+    def boot_worker(self, preload):
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE="ethpm_explorer.settings",
+            PRELOAD="1" if preload else "",
+            SHARED_CACHE_PATH=str(self.directory / "shared_cache.sqlite3"),
+            DIRECTORY_SNAPSHOT_PATH=str(self.directory / "directory.json"),
+            # clients are built without connecting, any project id will do
+            WEB3_INFURA_PROJECT_ID="boot",
+        )
+        process = subprocess.run(
+            [sys.executable, "-c", BOOT_SCRIPT],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=False,
+        )
+        self.assertEqual(process.returncode, 0, process.stderr.decode()[-2000:])
+        return json.loads(process.stdout.decode().splitlines()[-1])
+
+    def test_setup_doesnt_import_web3(self):
+        worker = self.boot_worker(preload=False)
+        self.assertEqual(worker["status"], "200 OK")
+        self.assertEqual((worker["booted"], worker["served"]), ([], []))
+
+    def test_preload_imports_web3(self):
+        worker = self.boot_worker(preload=True)
+        self.assertEqual(worker["status"], "200 OK")
+        self.assertEqual(worker["booted"], ["ens", "ethpm", "web3"])
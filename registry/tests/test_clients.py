@@ -0,0 +1,52 @@
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+
+from registry import clients
+from registry.snapshot import load_package_releases, load_registry_snapshot
+from registry.stubs import STUB_OWNER, StubRegistryRPC
+from registry.tests.base import RegistryTestCase, TESTER_CHAIN_ID
+
+
+class PooledClientTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.node = StubRegistryRPC(package_count=250, releases_per_package=3)
+        self.node.__enter__()
+        self.addCleanup(self.node.__exit__)
+        self.metrics = clients.ChainMetrics()
+        self.w3 = clients.build_w3(self.node.url, self.metrics)
+
+    def test_snapshot_round_trips(self):
+        snapshot = load_registry_snapshot(self.w3, "0x" + "12" * 20)
+        self.assertEqual(snapshot.owner.lower(), STUB_OWNER)
+        self.assertEqual(len(snapshot.packages), 250)
+        self.assertEqual(self.node.round_trips, 4)
+        self.assertEqual(self.node.rpc_calls["eth_call"], 2 + 3 + 250 + 250)
+        self.assertEqual(self.metrics.as_dict()["requests"], 4)
+
+        self.node.reset()
+        releases = load_package_releases(self.w3, "0x" + "12" * 20, "package-0")
+        self.assertEqual([version for version, _ in releases], ["1.0.0", "1.0.1", "1.0.2"])
+        self.assertEqual(self.node.round_trips, 3)
+
+    @override_settings(WEB3_BATCH_SIZE=100)
+    def test_large_batches_are_split(self):
+        load_registry_snapshot(self.w3, "0x" + "12" * 20)
+        # the names and the release counts are read in three chunks each
+        self.assertEqual(self.node.round_trips, 2 + 3 + 3)
+
+    def test_one_client_per_chain(self):
+        with mock.patch.dict(clients._clients, clear=True):
+            with override_settings(WEB3_PROVIDER_URIS={TESTER_CHAIN_ID: self.node.url}):
+                w3 = clients.get_w3(TESTER_CHAIN_ID)
+                self.assertIs(clients.get_w3(TESTER_CHAIN_ID), w3)
+            self.assertEqual(w3.provider.endpoint_uri, self.node.url)
+            self.assertTrue(w3.isConnected())
+
+    def test_unconfigured_chain(self):
+        with mock.patch.dict(clients._clients, clear=True):
+            with override_settings(WEB3_PROVIDER_URIS={}, WEB3_INFURA_PROJECT_ID=""):
+                with self.assertRaises(ImproperlyConfigured):
+                    clients.get_w3(TESTER_CHAIN_ID)
@@ -0,0 +1,40 @@
+import contextvars
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from registry.concurrency import map_concurrently, submit
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+class ConcurrencyTests(SimpleTestCase):
+    def test_results_keep_their_order(self):
+        def slow_square(item):
+            time.sleep(0.01 * (5 - item))
+            return item * item
+
+        self.assertEqual(map_concurrently(slow_square, range(5)), [0, 1, 4, 9, 16])
+
+    def test_calls_overlap(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def wait(item):
+            # each call waits for the others, so they only return if they run at once
+            barrier.wait()
+            return item
+
+        self.assertEqual(map_concurrently(wait, range(3)), [0, 1, 2])
+
+    def test_errors_are_raised(self):
+        def fail(item):
+            raise ValueError(item)
+
+        with self.assertRaises(ValueError):
+            map_concurrently(fail, range(3))
+
+    def test_tasks_see_the_submitting_context(self):
+        token = request_id.set("request-1")
+        self.addCleanup(request_id.reset, token)
+        self.assertEqual(submit(request_id.get).result(), "request-1")
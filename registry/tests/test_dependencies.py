@@ -0,0 +1,44 @@
+from unittest import mock
+
+from registry.dependencies import build_dependency_graph
+from registry.tests.base import make_manifest, RegistryTestCase
+
+
+class DependencyGraphTests(RegistryTestCase):
+    # Manifests stored under made up CIDs, which can't be verified, can form cycles.
+
+    def put_package(self, ipfs_hash, **dependencies):
+        self.put_manifest(
+            make_manifest(
+                ipfs_hash.lower(),
+                build_dependencies={
+                    name: f"ipfs://{cid}" for name, cid in dependencies.items()
+                },
+            ),
+            ipfs_hash,
+        )
+
+    def test_cycles(self):
+        self.put_package("QmRoot", child="QmChild")
+        self.put_package("QmChild", root="QmRoot", leaf="QmLeaf")
+        self.put_package("QmLeaf")
+        graph = build_dependency_graph("QmRoot", max_nodes=10)
+        self.assertEqual(set(graph.nodes), {"QmRoot", "QmChild", "QmLeaf"})
+        self.assertEqual(graph.cycles, (("QmChild", "root"),))
+        self.assertFalse(graph.truncated)
+        self.assertTrue(graph.complete)
+
+    def test_node_cap(self):
+        for index in range(5):
+            self.put_package(f"QmLevel{index}", next=f"QmLevel{index + 1}")
+        graph = build_dependency_graph("QmLevel0", max_nodes=3)
+        self.assertEqual(set(graph.nodes), {"QmLevel0", "QmLevel1", "QmLevel2"})
+        self.assertTrue(graph.truncated)
+        self.assertFalse(graph.complete)
+
+    def test_unreadable_dependencies(self):
+        self.put_package("QmRoot", missing="QmMissing")
+        with mock.patch("registry.manifest_cache.fetch_manifest", side_effect=ValueError("gone")):
+            graph = build_dependency_graph("QmRoot", max_nodes=10)
+        self.assertEqual(graph.nodes["QmMissing"].error, "gone")
+        self.assertFalse(graph.complete)
@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+import requests
+
+from registry.directory import default_registries, load_directory, refresh_directory
+from registry.models import refresh_registry
+from registry.tests.base import deploy_tester_registry, RegistryTestCase
+
+
+class RefreshDirectoryTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        snapshot_path = override_settings(
+            DIRECTORY_SNAPSHOT_PATH=str(self.directory / "directory.json")
+        )
+        snapshot_path.enable()
+        self.addCleanup(snapshot_path.disable)
+        self.w3, self.address, _ = deploy_tester_registry(
+            [(f"package-{index}", "1.0.0") for index in range(5)]
+        )
+
+    def resolve(self, names):
+        return mock.patch(
+            "registry.directory.ens_cache.address",
+            side_effect=lambda w3, chain_id, name: names[name],
+        )
+
+    def test_refresh(self):
+        with self.resolve(dict.fromkeys(default_registries, self.address)):
+            registries = refresh_directory(self.w3)
+        self.assertEqual(load_directory(), registries)
+        self.assertEqual(set(registries), set(default_registries))
+        for data in registries.values():
+            self.assertEqual(data["package_count"], 5)
+            self.assertEqual(data["packages"], ["package-0", "package-1", "package-2"])
+
+    def test_unreadable_registries_keep_their_entry(self):
+        unresolved, disconnected, *readable = default_registries
+        names = dict.fromkeys(readable, self.address)
+        names.update({unresolved: None, disconnected: "0x" + "12" * 20})
+
+        def refresh(w3, chain_id, address, *args, **kwargs):
+            if address == names[disconnected]:
+                raise requests.ConnectionError("connection reset")
+            return refresh_registry(w3, chain_id, address, *args, **kwargs)
+
+        with self.resolve(names), mock.patch(
+            "registry.directory.refresh_registry", side_effect=refresh
+        ), self.assertLogs("registry.directory") as logs:
+            registries = refresh_directory(self.w3)
+        self.assertEqual(len(logs.output), 2)
+        for name in (unresolved, disconnected):
+            self.assertEqual(registries[name], default_registries[name])
+        for name in readable:
+            self.assertEqual(registries[name]["package_count"], 5)
+
+    def test_worker_survives_failed_runs(self):
+        refreshed = {"owned.eth": {"address": self.address, "package_count": 1, "packages": []}}
+        refresh = mock.patch(
+            "registry.management.commands.refresh_directory.refresh_directory",
+            side_effect=[requests.Timeout("read timed out"), refreshed],
+        )
+        # the second sleep stops the worker
+        sleep = mock.patch(
+            "registry.management.commands.refresh_directory.time.sleep",
+            side_effect=[None, KeyboardInterrupt],
+        )
+        get_w3 = mock.patch("registry.management.commands.refresh_directory.get_w3")
+        with refresh as refreshes, sleep, get_w3, self.assertRaises(KeyboardInterrupt):
+            with self.assertLogs("registry.management.commands.refresh_directory", "ERROR"):
+                call_command("refresh_directory", interval=60, stdout=mock.Mock())
+        self.assertEqual(refreshes.call_count, 2)
+
+    def test_single_run_raises(self):
+        refresh = mock.patch(
+            "registry.management.commands.refresh_directory.refresh_directory",
+            side_effect=requests.Timeout("read timed out"),
+        )
+        get_w3 = mock.patch("registry.management.commands.refresh_directory.get_w3")
+        with refresh, get_w3, self.assertRaises(requests.Timeout):
+            call_command("refresh_directory")
@@ -0,0 +1,72 @@
+import time
+from unittest import mock
+
+from ens.exceptions import InvalidName
+from eth_utils import to_checksum_address
+
+from registry.ens_cache import ENSCache
+from registry.tests.base import RegistryTestCase
+
+OWNER = to_checksum_address("0x" + "ab" * 20)
+OTHER = to_checksum_address("0x" + "cd" * 20)
+
+
+class ENSCacheTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ens = mock.Mock()
+        self.ens.address.side_effect = {"owner.eth": OWNER, "other.eth": OTHER}.get
+        self.ens_cache = self.new_cache()
+
+    def new_cache(self, max_entries=10):
+        ens_cache = ENSCache(ttl=0.3, negative_ttl=0.1, max_entries=max_entries)
+        get_ens = mock.patch.object(ens_cache, "get_ens", return_value=self.ens)
+        get_ens.start()
+        self.addCleanup(get_ens.stop)
+        return ens_cache
+
+    def address(self, name, ens_cache=None):
+        return (ens_cache or self.ens_cache).address(None, "1", name)
+
+    def test_resolutions_are_cached(self):
+        self.assertEqual(self.address("owner.eth"), OWNER)
+        self.assertEqual(self.address("Owner.ETH"), OWNER)
+        self.ens.address.assert_called_once_with("owner.eth")
+        self.assertEqual(self.ens_cache.get_stats()["hits"], 1)
+        # another worker reads it from the shared cache
+        self.assertEqual(self.address("owner.eth", self.new_cache()), OWNER)
+        self.ens.address.assert_called_once()
+
+    def test_addresses_are_not_looked_up(self):
+        self.assertEqual(self.address(OWNER.lower()), OWNER)
+        self.ens.address.assert_not_called()
+
+    def test_entries_expire(self):
+        self.assertIsNone(self.address("missing.eth"))
+        self.assertEqual(self.address("owner.eth"), OWNER)
+        self.assertIsNone(self.address("missing.eth"))
+        self.assertEqual(self.ens.address.call_count, 2)
+        time.sleep(0.15)
+        # failed lookups expire first
+        self.assertIsNone(self.address("missing.eth"))
+        self.assertEqual(self.address("owner.eth"), OWNER)
+        self.assertEqual(self.ens.address.call_count, 3)
+        time.sleep(0.2)
+        self.assertEqual(self.address("owner.eth"), OWNER)
+        self.assertEqual(self.ens.address.call_count, 4)
+
+    def test_invalid_names(self):
+        self.ens.address.side_effect = InvalidName
+        self.assertIsNone(self.address("in valid.eth"))
+
+    def test_reverse_records_are_verified(self):
+        self.ens.name.side_effect = {OWNER: "owner.eth", OTHER: "owner.eth"}.get
+        self.assertEqual(self.ens_cache.name(None, "1", OWNER.lower()), "owner.eth")
+        # the name doesn't resolve back to OTHER
+        self.assertIsNone(self.ens_cache.name(None, "1", OTHER))
+
+    def test_entries_are_bounded(self):
+        ens_cache = self.new_cache(max_entries=2)
+        for name in ("owner.eth", "other.eth", "missing.eth"):
+            self.address(name, ens_cache)
+        self.assertEqual(ens_cache.get_stats()["entries"], 2)
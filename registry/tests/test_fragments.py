@@ -0,0 +1,40 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from registry.fragments import get_fragment
+from registry.models import Package, refresh_registry
+from registry.tests.base import (
+    deploy_tester_registry,
+    MANIFEST_URI,
+    RegistryTestCase,
+    TESTER_CHAIN_ID,
+)
+from registry.views import render_release_list
+
+
+# chain reads aren't shared, so every refresh sees the latest block
+@override_settings(SHARED_CACHE_CHAIN_TTL=0)
+class FragmentTests(RegistryTestCase):
+    def test_fragments_are_keyed_on_vary_on(self):
+        render = mock.Mock(side_effect=["<p>1</p>", "<p>2</p>"])
+        self.assertEqual(get_fragment("release_list", ["3", "0x12", 1], render), "<p>1</p>")
+        self.assertEqual(get_fragment("release_list", ["3", "0x12", 1], render), "<p>1</p>")
+        self.assertEqual(get_fragment("release_list", ["3", "0x12", 2], render), "<p>2</p>")
+        self.assertEqual(render.call_count, 2)
+
+    def test_release_list_follows_the_release_count(self):
+        w3, address, _ = deploy_tester_registry([("owned", "1.0.0")])
+        registry = refresh_registry(w3, TESTER_CHAIN_ID, address)
+        package = Package.objects.get(registry=registry, name="owned")
+        self.assertIn("1.0.0", render_release_list(package, w3))
+
+        with mock.patch("registry.views.loader.render_to_string") as render_to_string:
+            render_release_list(Package.objects.get(pk=package.pk), w3)
+        render_to_string.assert_not_called()
+
+        w3.pm.registry._release("owned", "1.0.1", MANIFEST_URI)
+        refresh_registry(w3, TESTER_CHAIN_ID, address)
+        package = Package.objects.get(pk=package.pk)
+        self.assertEqual(package.release_count, 2)
+        self.assertIn("1.0.1", render_release_list(package, w3))
@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.core.cache import cache
+from web3.exceptions import BadFunctionCallOutput
+
+from registry.models import (
+    get_indexed_package_page,
+    get_package_versions,
+    get_registry,
+    refresh_registry,
+    Registry,
+    Release,
+)
+from registry.tests.base import deploy_tester_registry, RegistryTestCase, TESTER_CHAIN_ID
+
+
+class RefreshRegistryTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.w3, self.address, _ = deploy_tester_registry(
+            [("owned", "1.0.0"), ("owned", "1.0.1"), ("wallet", "1.0.0")]
+        )
+        self.registry = refresh_registry(self.w3, TESTER_CHAIN_ID, self.address)
+        get_package_versions(self.address, self.w3, TESTER_CHAIN_ID, "owned")
+        self.registry.last_synced_block = self.w3.eth.blockNumber
+        self.registry.save()
+        # chain reads are shared between workers for a while, the tests re-read them
+        cache.clear()
+
+    def assert_index_kept(self):
+        self.assertEqual(
+            set(Release.objects.values_list("package__name", "version")),
+            {("owned", "1.0.0"), ("owned", "1.0.1")},
+        )
+        self.assertEqual(
+            set(self.registry.packages.values_list("name", "position")),
+            {("owned", 0), ("wallet", 1)},
+        )
+
+    def test_registry_is_indexed(self):
+        self.assertTrue(self.registry.is_valid)
+        self.assertEqual(self.registry.owner_address, self.w3.eth.accounts[0])
+        self.assertEqual(self.registry.package_count, 2)
+        self.assertEqual(
+            [package.name for package in get_indexed_package_page(self.registry, 0, 10)],
+            ["owned", "wallet"],
+        )
+        # the fresh index is read without asking the chain
+        with mock.patch("registry.snapshot.batch_request") as batch_request:
+            self.assertEqual(get_registry(self.address, self.w3, TESTER_CHAIN_ID), self.registry)
+        batch_request.assert_not_called()
+
+    def test_node_errors_change_nothing(self):
+        error = ValueError({"code": -32005, "message": "daily request count exceeded"})
+        with mock.patch("registry.snapshot.batch_request", side_effect=error):
+            with self.assertRaises(ValueError):
+                refresh_registry(self.w3, TESTER_CHAIN_ID, self.address)
+        registry = Registry.objects.get(pk=self.registry.pk)
+        self.assertTrue(registry.is_valid)
+        self.assertEqual(registry.package_count, 2)
+        self.assertEqual(registry.updated_at, self.registry.updated_at)
+        self.assert_index_kept()
+
+    def test_invalid_registry_keeps_its_index(self):
+        with mock.patch(
+            "registry.snapshot.load_registry_snapshot", side_effect=BadFunctionCallOutput
+        ):
+            registry = refresh_registry(self.w3, TESTER_CHAIN_ID, self.address)
+        self.assertFalse(registry.is_valid)
+        self.assertEqual(registry.package_count, 0)
+        self.assertEqual(get_indexed_package_page(registry, 0, 10), ())
+        self.assertEqual(registry.last_synced_block, self.w3.eth.blockNumber)
+        self.assert_index_kept()
+
+        registry = refresh_registry(self.w3, TESTER_CHAIN_ID, self.address)
+        self.assertTrue(registry.is_valid)
+        self.assertEqual(len(get_indexed_package_page(registry, 0, 10)), 2)
+        self.assert_index_kept()
+
+    def test_releases_are_refreshed_when_stale(self):
+        self.w3.pm.registry._release("owned", "1.0.2", "ipfs://QmNew")
+        cache.clear()
+        self.registry = refresh_registry(self.w3, TESTER_CHAIN_ID, self.address)
+        releases = get_package_versions(self.address, self.w3, TESTER_CHAIN_ID, "owned")
+        self.assertEqual(
+            [release.version for release in releases], ["1.0.0", "1.0.1", "1.0.2"]
+        )
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from registry.indexer import sync_registry_releases
+from registry.models import get_indexed_package_page, Registry, Release
+from registry.tests.base import deploy_tester_registry, RegistryTestCase, TESTER_CHAIN_ID
+
+
+class SyncRegistryReleasesTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.w3, address, self.deployment_block = deploy_tester_registry(
+            [("owned", "1.0.0"), ("owned", "1.0.1"), ("wallet", "1.0.0")]
+        )
+        self.registry = Registry.objects.create(chain_id=TESTER_CHAIN_ID, address=address)
+
+    def indexed_releases(self):
+        return set(
+            Release.objects.filter(package__registry=self.registry).values_list(
+                "package__name", "version"
+            )
+        )
+
+    def test_windows_cover_every_block_once(self):
+        get_logs = mock.patch.object(self.w3.eth, "getLogs", wraps=self.w3.eth.getLogs)
+        with get_logs as spy:
+            new_releases = sync_registry_releases(
+                self.w3, self.registry, window=2, from_block=self.deployment_block
+            )
+        windows = [(call[0][0]["fromBlock"], call[0][0]["toBlock"]) for call in spy.call_args_list]
+        self.assertEqual(windows[0][0], self.deployment_block)
+        self.assertEqual(windows[-1][1], self.w3.eth.blockNumber)
+        for (_, end), (start, _) in zip(windows, windows[1:]):
+            self.assertEqual(start, end + 1)
+        self.assertTrue(all(end - start < 2 for start, end in windows))
+        self.assertEqual(new_releases, 3)
+        self.assertEqual(
+            self.indexed_releases(),
+            {("owned", "1.0.0"), ("owned", "1.0.1"), ("wallet", "1.0.0")},
+        )
+
+    def test_resumes_from_checkpoint(self):
+        to_block = self.deployment_block + 2
+        self.assertEqual(sync_registry_releases(self.w3, self.registry, to_block=to_block), 2)
+        self.registry.refresh_from_db()
+        self.assertEqual(self.registry.last_synced_block, to_block)
+        self.assertEqual(self.registry.package_count, 1)
+        self.assertEqual(self.indexed_releases(), {("owned", "1.0.0"), ("owned", "1.0.1")})
+
+        self.assertEqual(sync_registry_releases(self.w3, self.registry), 1)
+        self.registry.refresh_from_db()
+        self.assertEqual(self.registry.last_synced_block, self.w3.eth.blockNumber)
+        self.assertEqual(self.registry.package_count, 2)
+        self.assertEqual(self.registry.packages.get(name="owned").release_count, 2)
+
+    def test_rerun_is_idempotent(self):
+        sync_registry_releases(self.w3, self.registry)
+        self.assertEqual(sync_registry_releases(self.w3, self.registry), 0)
+        # a sync started over from scratch doesn't index anything twice
+        self.registry.last_synced_block = None
+        self.assertEqual(sync_registry_releases(self.w3, self.registry), 0)
+        self.assertEqual(len(self.indexed_releases()), 3)
+        self.assertEqual(Release.objects.count(), 3)
+
+    def test_partial_sync_keeps_chain_state(self):
+        updated_at = self.registry.updated_at
+        sync_registry_releases(self.w3, self.registry, from_block=self.deployment_block + 3)
+        self.registry.refresh_from_db()
+        self.assertEqual(self.indexed_releases(), {("wallet", "1.0.0")})
+        # the package count comes from the chain, not from the packages indexed
+        self.assertEqual(self.registry.package_count, 2)
+        self.assertEqual(self.registry.updated_at, updated_at)
+        # positions are unknown, the packages aren't listed until a page is read
+        self.assertEqual(get_indexed_package_page(self.registry, 0, 10), ())
+
+    def test_partial_sync_keeps_release_counts(self):
+        sync_registry_releases(self.w3, self.registry, from_block=self.deployment_block + 2)
+        package = self.registry.packages.get(name="owned")
+        self.assertEqual(
+            list(package.releases.values_list("version", flat=True)), ["1.0.1"]
+        )
+        # the release missed by the sync is loaded with the package's releases
+        self.assertEqual(package.release_count, 2)
+        self.assertTrue(package.is_stale())
+        self.assertFalse(self.registry.packages.get(name="wallet").is_stale())
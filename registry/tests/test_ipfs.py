@@ -0,0 +1,40 @@
+import time
+
+from registry.ipfs import compute_cid, ContentUnavailable, Gateway, IPFSFetcher
+from registry.stubs import StubIPFSGateway
+from registry.tests.base import make_manifest, RegistryTestCase, serialize_manifest
+
+
+class HedgedFetchTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = serialize_manifest(make_manifest("owned"))
+        self.cid = compute_cid(self.content)
+
+    def fetcher(self, *gateways):
+        return IPFSFetcher(
+            [Gateway(gateway.gateway_url, 2) for gateway in gateways],
+            hedge_delay=0.05,
+            timeout=5,
+            pool_size=4,
+        )
+
+    def test_tampered_content_is_rejected(self):
+        with StubIPFSGateway({self.cid: self.content}, tampered=True) as tampered, \
+                StubIPFSGateway({self.cid: self.content}, latency=0.1) as honest:
+            fetcher = self.fetcher(tampered, honest)
+            self.assertEqual(fetcher.fetch(self.cid), self.content)
+            self.assertEqual(fetcher.get_stats()[tampered.gateway_url]["mismatches"], 1)
+            self.assertEqual(fetcher.get_stats()[honest.gateway_url]["ok"], 1)
+
+    def test_only_tampered_content_is_unavailable(self):
+        with StubIPFSGateway({self.cid: self.content}, tampered=True) as tampered:
+            with self.assertRaises(ContentUnavailable):
+                self.fetcher(tampered).fetch(self.cid)
+
+    def test_slow_gateway_is_hedged(self):
+        with StubIPFSGateway({self.cid: self.content}, latency=2) as slow, \
+                StubIPFSGateway({self.cid: self.content}) as fast:
+            start = time.perf_counter()
+            self.assertEqual(self.fetcher(slow, fast).fetch(self.cid), self.content)
+            self.assertLess(time.perf_counter() - start, 1)
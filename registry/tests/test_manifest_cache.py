@@ -0,0 +1,46 @@
+from unittest import mock
+
+from ethpm.exceptions import EthPMValidationError
+
+from registry.manifest_cache import ManifestCache
+from registry.tests.base import make_manifest, RegistryTestCase, serialize_manifest
+
+
+class ManifestCacheTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.manifest = make_manifest("owned", meta={"license": "MIT"})
+        self.raw = serialize_manifest(self.manifest)
+        self.cache_dir = self.directory / "cache"
+
+    def test_hits(self):
+        manifest_cache = ManifestCache(self.cache_dir, 10 ** 6)
+        fetch = mock.patch("registry.manifest_cache.fetch_manifest", return_value=self.raw)
+        with fetch as fetch_manifest:
+            self.assertEqual(manifest_cache.get("QmOwned").manifest, self.manifest)
+            self.assertEqual(manifest_cache.get("QmOwned").raw, self.raw)
+            # another worker finds it on disk
+            other_cache = ManifestCache(self.cache_dir, 10 ** 6)
+            self.assertEqual(other_cache.get("QmOwned").manifest, self.manifest)
+        fetch_manifest.assert_called_once_with("QmOwned")
+        stats = manifest_cache.get_stats()
+        self.assertEqual((stats["misses"], stats["memory_hits"]), (1, 1))
+        self.assertEqual(other_cache.get_stats()["disk_hits"], 1)
+
+    def test_invalid_manifests_are_not_stored(self):
+        manifest_cache = ManifestCache(self.cache_dir, 10 ** 6)
+        with self.assertRaises(EthPMValidationError):
+            manifest_cache.put("QmInvalid", serialize_manifest({"package_name": "owned"}))
+        with self.assertRaises(ValueError):
+            manifest_cache.put("../QmInvalid", self.raw)
+        self.assertFalse(manifest_cache.contains("QmInvalid"))
+
+    def test_memory_is_bounded(self):
+        manifest_cache = ManifestCache(self.cache_dir, len(self.raw) * 2)
+        for index in range(3):
+            manifest_cache.put(f"QmOwned{index}", self.raw)
+        stats = manifest_cache.get_stats()
+        self.assertEqual((stats["entries"], stats["evictions"]), (2, 1))
+        self.assertLessEqual(stats["bytes"], stats["max_bytes"])
+        # evicted manifests are still on disk
+        self.assertEqual(manifest_cache.get("QmOwned0").manifest, self.manifest)
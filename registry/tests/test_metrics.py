@@ -0,0 +1,53 @@
+from django.test import Client, override_settings
+
+from registry import concurrency, metrics
+from registry.metrics import process_metrics
+from registry.tests.base import isolate, RegistryTestCase
+
+
+class MetricsTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(isolate(process_metrics))
+        self.client = Client(HTTP_HOST="localhost")
+
+    def test_server_timing(self):
+        with override_settings(DIRECTORY_SNAPSHOT_PATH=str(self.directory / "directory.json")):
+            response = self.client.get("/directory/")
+        self.assertEqual(response.status_code, 200)
+        server_timing = response["Server-Timing"].split(", ")
+        self.assertTrue(server_timing[0].startswith("render.registry_directory.html;dur="))
+        self.assertTrue(server_timing[-1].startswith("total;dur="))
+        self.assertEqual(process_metrics.requests[("directory", "GET", "200")], 1)
+        self.assertEqual(process_metrics.timings[("render", "registry/directory.html")][0], 1)
+
+    def test_pool_work_is_collected(self):
+        with metrics.collect() as request_metrics:
+            concurrency.submit(metrics.count, "cache", "hit", 2).result()
+            metrics.count("cache", "hit")
+        self.assertEqual(request_metrics.counts[("cache", "hit")], 3)
+        self.assertEqual(process_metrics.counts[("cache", "hit")], 3)
+        # outside of a request only the process totals count
+        metrics.count("cache", "hit")
+        self.assertEqual(request_metrics.counts[("cache", "hit")], 3)
+        self.assertEqual(process_metrics.counts[("cache", "hit")], 4)
+
+    def test_prometheus_output(self):
+        process_metrics.record_request("browse", "GET", 200, 0.003)
+        process_metrics.record_request("browse", "GET", 200, 0.2)
+        process_metrics.record_request("browse", "GET", 200, 30)
+        metrics.record("rpc", "eth_call", 0.5)
+        metrics.count("cache", 'say "hi"\n')
+        response = self.client.get("/metrics")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        lines = response.content.decode().splitlines()
+        self.assertIn('explorer_requests_total{view="browse",method="GET",status="200"} 3', lines)
+        bucket = 'explorer_request_duration_seconds_bucket{view="browse",le="%s"} %d'
+        self.assertIn(bucket % ("0.005", 1), lines)
+        self.assertIn(bucket % ("0.1", 1), lines)
+        self.assertIn(bucket % ("0.25", 2), lines)
+        self.assertIn(bucket % ("+Inf", 3), lines)
+        self.assertIn('explorer_request_duration_seconds_count{view="browse"} 3', lines)
+        self.assertIn('explorer_operations_total{kind="rpc",name="eth_call"} 1', lines)
+        self.assertIn('explorer_operation_seconds_total{kind="rpc",name="eth_call"} 0.5', lines)
+        self.assertIn('explorer_events_total{kind="cache",name="say \\"hi\\"\\n"} 1', lines)
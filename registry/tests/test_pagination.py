@@ -0,0 +1,47 @@
+from django.test import Client, override_settings
+
+from registry.constants import CHAIN_DATA
+from registry.models import get_package_page, get_registry
+from registry.tests.base import deploy_tester_registry, RegistryTestCase, TESTER_CHAIN_ID
+
+
+@override_settings(PACKAGE_PAGE_SIZE=2)
+class PackagePageTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.w3, self.address, _ = deploy_tester_registry(
+            [(f"package-{index}", "1.0.0") for index in range(5)]
+        )
+        self.use_chain(self.w3)
+
+    def test_cursors_walk_every_package_once(self):
+        registry = get_registry(self.address, self.w3, TESTER_CHAIN_ID)
+        self.assertEqual(registry.package_count, 5)
+        # only the first page is read along with the registry
+        self.assertEqual(registry.packages.count(), 2)
+        names, cursors, cursor = [], [], 0
+        while cursor is not None:
+            page = get_package_page(registry, self.w3, cursor, 2)
+            names += [package.name for package in page.packages]
+            cursors.append(page.next_cursor)
+            cursor = page.next_cursor
+        self.assertEqual(names, [f"package-{index}" for index in range(5)])
+        self.assertEqual(cursors, [2, 4, None])
+
+    def test_package_page_view(self):
+        client = Client(HTTP_HOST="localhost")
+        url = f"/packages/{TESTER_CHAIN_ID}/{self.address}/"
+        response = client.get(url, {"cursor": 4, "limit": 10})
+        data = response.json()
+        self.assertEqual([package["name"] for package in data["packages"]], ["package-4"])
+        self.assertIsNone(data["next_cursor"])
+        self.assertEqual(client.get(url, {"cursor": -1}).status_code, 400)
+
+    def test_browse_renders_the_first_page(self):
+        client = Client(HTTP_HOST="localhost")
+        response = client.get(f"/browse/{CHAIN_DATA[TESTER_CHAIN_ID][0]}/{self.address}")
+        self.assertEqual(
+            [package.name for package in response.context["packages"]],
+            ["package-0", "package-1"],
+        )
+        self.assertEqual(response.context["next_cursor"], 2)
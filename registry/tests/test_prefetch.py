@@ -0,0 +1,51 @@
+from unittest import mock
+
+from registry.ipfs import compute_cid, ContentUnavailable
+from registry.manifest_cache import manifest_cache
+from registry.prefetch import ManifestPrefetcher
+from registry.tests.base import (
+    make_manifest,
+    MANIFEST_URI,
+    RegistryTestCase,
+    serialize_manifest,
+)
+
+
+class PrefetchTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.raw = serialize_manifest(make_manifest("owned"))
+        self.ipfs_hash = compute_cid(self.raw)
+
+    def test_failed_fetches_are_retried(self):
+        prefetcher = ManifestPrefetcher(workers=1, queue_size=10, retries=2, retry_backoff=0)
+        fetch = mock.patch(
+            "registry.prefetch.fetch_manifest",
+            side_effect=[ContentUnavailable("down"), ContentUnavailable("down"), self.raw],
+        )
+        with fetch:
+            prefetcher.prefetch([f"ipfs://{self.ipfs_hash}"])
+            prefetcher.join()
+        stats = prefetcher.get_stats()
+        self.assertEqual((stats["fetched"], stats["retries"], stats["failed"]), (1, 2, 0))
+        self.assertTrue(manifest_cache.contains(self.ipfs_hash))
+
+    def test_gives_up_after_retries(self):
+        prefetcher = ManifestPrefetcher(workers=1, queue_size=10, retries=1, retry_backoff=0)
+        fetch = mock.patch(
+            "registry.prefetch.fetch_manifest", side_effect=ContentUnavailable("down")
+        )
+        with fetch as fetch_manifest:
+            prefetcher.prefetch([f"ipfs://{self.ipfs_hash}"])
+            prefetcher.join()
+        self.assertEqual(fetch_manifest.call_count, 2)
+        self.assertEqual(prefetcher.get_stats()["failed"], 1)
+        self.assertEqual(prefetcher.get_stats()["pending"], 0)
+
+    def test_full_queue_drops_manifests(self):
+        # without workers nothing leaves the queue
+        prefetcher = ManifestPrefetcher(workers=0, queue_size=1, retries=0, retry_backoff=0)
+        prefetcher.prefetch([MANIFEST_URI, f"ipfs://{self.ipfs_hash}", MANIFEST_URI])
+        stats = prefetcher.get_stats()
+        # the repeated URI is already pending, it isn't queued twice
+        self.assertEqual((stats["queued"], stats["dropped"], stats["pending"]), (1, 1, 1))
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.test import Client, override_settings
+
+from registry import previews
+from registry.tests.base import make_manifest, RegistryTestCase
+
+
+class ManifestPreviewTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = Client(HTTP_HOST="localhost")
+        self.ipfs_hash, self.raw = self.put_manifest(make_manifest(
+            "owned",
+            meta={"description": "An owned contract", "license": "MIT"},
+            sources={"./Owned.sol": "contract Owned {}"},
+        ))
+        self.url = f"/manifest/{self.ipfs_hash}"
+
+    def test_preview_is_immutable(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], previews.preview_etag(self.ipfs_hash))
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn(b"An owned contract", response.content)
+        self.assertEqual(previews.get_stored_preview(self.ipfs_hash), response.content)
+
+    def test_revalidation(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("immutable", response["Cache-Control"])
+        # a preview rendered by an older PREVIEW_VERSION is rendered again
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.ipfs_hash}-0"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_stored_preview_is_served(self):
+        content = self.client.get(self.url).content
+        with mock.patch("registry.views.Manifest") as manifest:
+            response = self.client.get(self.url)
+        manifest.assert_not_called()
+        self.assertEqual(response.content, content)
+
+    def test_invalid_manifest(self):
+        with mock.patch(
+            "registry.manifest_cache.fetch_manifest", return_value=b'{"package_name": "owned"}'
+        ):
+            response = self.client.get("/manifest/QmMissing")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["manifest_data"])
+        self.assertNotIn("immutable", response.get("Cache-Control", ""))
+
+
+class StreamingPreviewTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = Client(HTTP_HOST="localhost")
+        self.contract_type = {"abi": [], "runtime_bytecode": {"bytecode": "0x6000"}}
+        self.ipfs_hash, _ = self.put_manifest(make_manifest(
+            "owned",
+            sources={"./Owned.sol": "contract Owned {}"},
+            contract_types={"Owned": self.contract_type},
+        ))
+
+    def test_large_manifests_are_streamed(self):
+        with override_settings(MANIFEST_STREAMING_THRESHOLD=0):
+            response = self.client.get(f"/manifest/{self.ipfs_hash}")
+        self.assertTrue(response.streaming)
+        self.assertIn("immutable", response["Cache-Control"])
+        content = b"".join(response.streaming_content)
+        # streamed previews aren't stored, the same page is rendered in one piece
+        self.assertIsNone(previews.get_stored_preview(self.ipfs_hash))
+        response = self.client.get(f"/manifest/{self.ipfs_hash}")
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.content, content)
+
+    def test_sections_are_loaded_on_demand(self):
+        content = self.client.get(f"/manifest/{self.ipfs_hash}").content
+        self.assertNotIn(b"contract Owned {}", content)
+        self.assertIn(b"/manifest/%s/sources/./Owned.sol" % self.ipfs_hash.encode(), content)
+
+    def test_manifest_fragment(self):
+        url = f"/manifest/{self.ipfs_hash}/contract_types/Owned"
+        response = self.client.get(url)
+        self.assertEqual(response.json(), self.contract_type)
+        self.assertIn("immutable", response["Cache-Control"])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(f"/manifest/{self.ipfs_hash}/sources/./Owned.sol")
+        self.assertEqual(response.content, b"contract Owned {}")
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+    def test_unknown_fragments(self):
+        for url in (
+            f"/manifest/{self.ipfs_hash}/contract_types/Missing",
+            f"/manifest/{self.ipfs_hash}/meta/license",
+        ):
+            self.assertEqual(self.client.get(url).status_code, 404)
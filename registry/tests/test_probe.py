@@ -0,0 +1,88 @@
+import json
+import threading
+from unittest import mock
+
+from django.test import Client
+import requests
+from web3.exceptions import BadFunctionCallOutput
+
+from registry import clients, snapshot
+from registry.probe import iter_registry_probes, ProbeResult
+from registry.tests.base import deploy_tester_registry, RegistryTestCase, TESTER_CHAIN_ID
+
+
+class RegistryProbeTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.w3, self.address, _ = deploy_tester_registry([("owned", "1.0.0")])
+        # the tester chain answers for ropsten, the other chains are stand-ins
+        chains = {"1": mock.Mock(), TESTER_CHAIN_ID: self.w3, "4": mock.Mock(), "42": mock.Mock()}
+        patcher = mock.patch.dict(clients._clients, chains)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.answers = {
+            chains["1"]: BadFunctionCallOutput("no registry"),
+            chains["4"]: requests.ConnectionError("node down"),
+            chains["42"]: threading.Event(),
+        }
+        # let the probe that never answers finish once the test is done
+        self.addCleanup(self.answers[chains["42"]].set)
+        load_registry_snapshot = snapshot.load_registry_snapshot
+
+        def load(w3, *args):
+            if w3 is self.w3:
+                return load_registry_snapshot(w3, *args)
+            answer = self.answers[w3]
+            if isinstance(answer, threading.Event):
+                answer.wait()
+                raise ValueError("too late")
+            raise answer
+
+        patcher = mock.patch("registry.snapshot.load_registry_snapshot", side_effect=load)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_probes(self):
+        results = list(iter_registry_probes(self.address, timeout=0.5))
+        self.assertEqual(
+            sorted(results),
+            [
+                ProbeResult("1", "not_registry", self.address),
+                ProbeResult(
+                    TESTER_CHAIN_ID, "registry", self.address, self.w3.eth.accounts[0], 1
+                ),
+                ProbeResult("4", "error", self.address, error="node down"),
+                ProbeResult("42", "timeout", error="No answer within 0.5 seconds"),
+            ],
+        )
+        # chains are reported in the order they answer, the timeout last
+        self.assertEqual(results[-1].chain_id, "42")
+
+    def test_ens_names_are_only_resolved_on_mainnet(self):
+        with mock.patch("registry.probe.ens_cache.address", return_value=None):
+            results = list(iter_registry_probes("registry.ethpm.eth", timeout=0.5))
+        self.assertEqual(
+            sorted((result.chain_id, result.status) for result in results),
+            [
+                ("1", "unresolved"),
+                (TESTER_CHAIN_ID, "unsupported"),
+                ("4", "unsupported"),
+                ("42", "unsupported"),
+            ],
+        )
+
+    def test_probe_api(self):
+        with self.settings(REGISTRY_PROBE_TIMEOUT=0.5):
+            response = Client().get(f"/api/v1/registries/{self.address}/chains/")
+            content = b"".join(response.streaming_content)
+        lines = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            {line["chain_name"]: (line["status"], line["error"]) for line in lines},
+            {
+                "mainnet": ("not_registry", None),
+                "ropsten": ("registry", None),
+                "rinkeby": ("error", "node down"),
+                "kovan": ("timeout", "No answer within 0.5 seconds"),
+            },
+        )
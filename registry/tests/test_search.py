@@ -0,0 +1,61 @@
+from unittest import mock
+
+from registry.manifest_cache import manifest_cache
+from registry.search import search_index
+from registry.tests.base import make_manifest, RegistryTestCase, serialize_manifest
+
+
+class SearchTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.by_name, _ = self.put_manifest(make_manifest("token"))
+        self.by_keyword, _ = self.put_manifest(make_manifest(
+            "wallet", meta={"keywords": ["Token"], "license": "MIT"}
+        ))
+        self.by_description, _ = self.put_manifest(make_manifest(
+            "exchange", meta={"description": "Swaps one token for another", "license": "MIT"}
+        ))
+        self.put_manifest(make_manifest("owned", meta={"license": "Apache-2.0"}))
+
+    def test_ranking_follows_column_weights(self):
+        found = search_index.search("token")
+        self.assertEqual(found["total"], 3)
+        self.assertEqual(
+            [result["ipfs_hash"] for result in found["results"]],
+            [self.by_name, self.by_keyword, self.by_description],
+        )
+
+    def test_prefix_terms_and_paging(self):
+        found = search_index.search("tok", limit=1, offset=1)
+        self.assertEqual(found["total"], 3)
+        self.assertEqual([result["ipfs_hash"] for result in found["results"]], [self.by_keyword])
+
+    def test_facets(self):
+        found = search_index.search()
+        self.assertEqual(found["total"], 4)
+        self.assertEqual(
+            found["facets"]["license"],
+            [{"value": "MIT", "count": 2}, {"value": "Apache-2.0", "count": 1}],
+        )
+        self.assertEqual(found["facets"]["keyword"], [{"value": "token", "count": 1}])
+
+        found = search_index.search("token", {"license": "MIT"})
+        self.assertEqual(
+            [result["ipfs_hash"] for result in found["results"]],
+            [self.by_keyword, self.by_description],
+        )
+        self.assertEqual(found["facets"]["license"], [{"value": "MIT", "count": 2}])
+
+    def test_index_errors_dont_fail_manifests(self):
+        raw = serialize_manifest(make_manifest("broken"))
+        with mock.patch("registry.search.extract_document", side_effect=KeyError("meta")):
+            with self.assertLogs("registry.search", "ERROR"):
+                manifest_cache.put("QmBroken", raw)
+        self.assertTrue(manifest_cache.contains("QmBroken"))
+        self.assertEqual(search_index.search("broken")["total"], 0)
+
+    def test_rebuild(self):
+        search_index.clear()
+        self.assertEqual(search_index.search()["total"], 0)
+        search_index.add_many(manifest_cache.iter_stored())
+        self.assertEqual(search_index.search("token")["total"], 3)
@@ -0,0 +1,158 @@
+import threading
+import time
+from unittest import mock
+
+from registry.cache_backends import CULL_CHECK_INTERVAL, RedisCache, RedisError, SQLiteCache
+from registry.shared_cache import SharedCache
+from registry.stubs import StubRedisServer
+from registry.tests.base import RegistryTestCase
+
+
+class SharedCacheTests(RegistryTestCase):
+    def test_concurrent_misses_compute_once(self):
+        shared_cache = SharedCache(lock_timeout=5)
+        computations = []
+
+        def compute():
+            computations.append(None)
+            time.sleep(0.1)
+            return "value"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(shared_cache.get_or_set("test", "key", compute))
+            )
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(computations), 1)
+        self.assertEqual(results, ["value"] * 20)
+        self.assertEqual(shared_cache.get_or_set("test", "key", compute), "value")
+        self.assertEqual(len(computations), 1)
+
+    def test_errors_are_not_cached(self):
+        shared_cache = SharedCache(lock_timeout=5)
+        with self.assertRaises(ValueError):
+            shared_cache.get_or_set("test", "key", mock.Mock(side_effect=ValueError))
+        self.assertEqual(shared_cache.get_or_set("test", "key", lambda: "value"), "value")
+
+    def test_timeout_of_the_value(self):
+        shared_cache = SharedCache(lock_timeout=5)
+        shared_cache.get_or_set("test", "key", lambda: "expired", timeout=lambda value: 0)
+        self.assertEqual(shared_cache.get_or_set("test", "key", lambda: "fresh"), "fresh")
+
+
+
+class CacheBackendTests:
+    """
+    The behaviour every shared cache backend has, for a ``self.cache`` of each.
+    """
+
+    def test_add(self):
+        self.assertTrue(self.cache.add("key", "first"))
+        self.assertFalse(self.cache.add("key", "second"))
+        self.assertEqual(self.cache.get("key"), "first")
+        # an entry added without time to live is never seen
+        self.cache.add("other", "value", timeout=0)
+        self.assertIsNone(self.cache.get("other"))
+
+    def test_expiry(self):
+        self.cache.set("expiring", "value", timeout=0.1)
+        self.cache.set("kept", "value", timeout=None)
+        self.assertEqual(self.cache.get("expiring"), "value")
+        time.sleep(0.15)
+        self.assertEqual(self.cache.get("expiring", "expired"), "expired")
+        self.assertEqual(self.cache.get("kept"), "value")
+        # an expired key can be added again
+        self.assertTrue(self.cache.add("expiring", "again", timeout=10))
+        self.assertEqual(self.cache.get("expiring"), "again")
+
+    def test_touch(self):
+        self.cache.set("key", "value", timeout=0.1)
+        self.assertTrue(self.cache.touch("key", timeout=None))
+        time.sleep(0.15)
+        self.assertEqual(self.cache.get("key"), "value")
+        self.assertTrue(self.cache.touch("key", timeout=0.1))
+        time.sleep(0.15)
+        self.assertFalse(self.cache.has_key("key"))
+        self.assertFalse(self.cache.touch("key"))
+
+    def test_get_many(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", {"nested": [2]})
+        self.assertEqual(self.cache.get_many(["a", "b", "c"]), {"a": 1, "b": {"nested": [2]}})
+        self.assertEqual(self.cache.get_many([]), {})
+
+    def test_delete_and_clear(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.assertTrue(self.cache.delete("a"))
+        self.assertFalse(self.cache.delete("a"))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("b"))
+
+
+class SQLiteCacheTests(CacheBackendTests, RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = SQLiteCache(
+            self.directory / "cache.sqlite3", {"OPTIONS": {"MAX_ENTRIES": 100}}
+        )
+
+    def count_entries(self):
+        return self.cache._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def test_workers_share_entries(self):
+        self.cache.set("key", "value")
+        other_worker = SQLiteCache(self.directory / "cache.sqlite3", {})
+        self.assertEqual(other_worker.get("key"), "value")
+
+    def test_concurrent_writes_are_culled(self):
+        def write(thread):
+            for index in range(CULL_CHECK_INTERVAL):
+                self.cache.set(f"{thread}:{index}", index)
+
+        # every thread writes on a connection of its own
+        threads = [threading.Thread(target=write, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # the last write of all triggered a check, however the threads interleaved
+        self.assertLessEqual(self.count_entries(), 100)
+
+
+class RedisCacheTests(CacheBackendTests, RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = StubRedisServer()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.cache = RedisCache(self.server.url, {})
+
+    def test_connections_are_reused(self):
+        for index in range(10):
+            self.cache.set("key", index)
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.server.commands["set"], 10)
+
+    def test_reconnects_after_the_server_closes_an_idle_connection(self):
+        self.cache.set("key", "value")
+        self.server.close_connections()
+        # the server's close reaches the client a moment later
+        time.sleep(0.05)
+        self.assertEqual(self.cache.get("key"), "value")
+        self.assertEqual(len(self.server.connections), 1)
+        # the GET was sent once, on the new connection
+        self.assertEqual(self.server.commands["get"], 1)
+
+    def test_server_errors_keep_the_connection(self):
+        with mock.patch.object(self.server, "command_get", side_effect=lambda key: ValueError()):
+            with self.assertRaises(RedisError):
+                self.cache.get("key")
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(len(self.server.connections), 1)
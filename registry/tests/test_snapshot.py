@@ -0,0 +1,76 @@
+import json
+from unittest import mock
+
+from web3.exceptions import BadFunctionCallOutput
+
+from registry.snapshot import (
+    load_package_releases,
+    load_registry_snapshot,
+    post_batch,
+)
+from registry.tests.base import deploy_tester_registry, MANIFEST_URI, RegistryTestCase
+
+
+class RegistrySnapshotTests(RegistryTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # the tests only read the registry, it's deployed once
+        cls.w3, cls.address, _ = deploy_tester_registry(
+            (f"package-{index}", f"1.0.{version}")
+            for index in range(5)
+            for version in range(index + 1)
+        )
+
+    def test_snapshot_matches_registry(self):
+        snapshot = load_registry_snapshot(self.w3, self.address)
+        self.assertEqual(snapshot.owner, self.w3.eth.accounts[0])
+        self.assertEqual(snapshot.package_count, 5)
+        self.assertEqual(
+            snapshot.packages,
+            tuple(
+                (name, self.w3.pm.get_release_count(name))
+                for name in self.w3.pm.get_all_package_names()
+            ),
+        )
+
+    def test_snapshot_window(self):
+        full = load_registry_snapshot(self.w3, self.address)
+        window = load_registry_snapshot(self.w3, self.address, offset=1, limit=3)
+        self.assertEqual(window.offset, 1)
+        self.assertEqual(window.package_count, 5)
+        self.assertEqual(window.packages, full.packages[1:4])
+        self.assertEqual(load_registry_snapshot(self.w3, self.address, limit=0).packages, ())
+
+    def test_package_releases(self):
+        releases = load_package_releases(self.w3, self.address, "package-3")
+        self.assertEqual(
+            sorted(releases),
+            [(f"1.0.{version}", MANIFEST_URI) for version in range(4)],
+        )
+
+    def test_contract_without_registry_code(self):
+        with self.assertRaises(BadFunctionCallOutput):
+            load_registry_snapshot(self.w3, self.w3.eth.accounts[1])
+
+    def test_reverted_call(self):
+        with self.assertRaises(BadFunctionCallOutput):
+            load_package_releases(self.w3, self.address, "missing")
+
+    def test_node_errors_are_not_failed_calls(self):
+        error = {"code": -32005, "message": "daily request count exceeded"}
+        responses = [{"jsonrpc": "2.0", "id": 0, "error": error}] * 3
+        with mock.patch("registry.snapshot.batch_request", return_value=responses):
+            with self.assertRaises(ValueError) as context:
+                load_registry_snapshot(self.w3, self.address)
+        self.assertNotIsInstance(context.exception, BadFunctionCallOutput)
+        self.assertEqual(context.exception.args, (error,))
+
+    def test_rejected_batch(self):
+        rejection = {"jsonrpc": "2.0", "error": {"code": -32600, "message": "batch too large"}}
+        w3 = mock.Mock()
+        w3.provider.post.return_value = json.dumps(rejection).encode("utf-8")
+        payload = [{"jsonrpc": "2.0", "id": 0, "method": "eth_blockNumber", "params": []}]
+        with self.assertRaises(ValueError) as context:
+            post_batch(w3, payload)
+        self.assertNotIsInstance(context.exception, BadFunctionCallOutput)
@@ -0,0 +1,89 @@
+from web3 import EthereumTesterProvider, Web3
+
+from registry.constants import CHAIN_DATA
+from registry.ipfs import compute_cid
+from registry.tests.base import (
+    make_manifest,
+    RegistryTestCase,
+    serialize_manifest,
+    TESTER_CHAIN_ID,
+)
+from registry.verification import verify_deployments
+
+
+class DeploymentVerificationTests(RegistryTestCase):
+    # runtime code returning 42, and init code returning it
+    RUNTIME_CODE = bytes.fromhex("602a60005260206000f3")
+    INIT_CODE = "0x69" + RUNTIME_CODE.hex() + "600052600a6016f3"
+
+    def setUp(self):
+        super().setUp()
+        self.w3 = Web3(EthereumTesterProvider())
+        self.use_chain(self.w3)
+        self.transaction = self.w3.eth.sendTransaction({
+            "from": self.w3.eth.accounts[0],
+            "data": self.INIT_CODE,
+            "gas": 100000,
+        })
+        self.receipt = self.w3.eth.getTransactionReceipt(self.transaction)
+        genesis = CHAIN_DATA[TESTER_CHAIN_ID][3][2:]
+        self.chain_uri = f"blockchain://{genesis}/block/{self.receipt.blockHash.hex()[2:]}"
+
+    def verify(self, runtime_bytecode, link_references=(), **deployment):
+        bytecode = {"bytecode": runtime_bytecode, "link_references": list(link_references)}
+        manifest = make_manifest(
+            "answer",
+            contract_types={"Answer": {"runtime_bytecode": bytecode}},
+            deployments={self.chain_uri: {"answer": {
+                "contract_type": "Answer",
+                "address": self.receipt.contractAddress,
+                "transaction": self.transaction.hex(),
+                "block": self.receipt.blockHash.hex(),
+                **deployment,
+            }}},
+        )
+        ipfs_hash = compute_cid(serialize_manifest(manifest))
+        (verification,) = verify_deployments(ipfs_hash, manifest)
+        self.assertEqual(verification.chain_id, TESTER_CHAIN_ID)
+        self.assertTrue(verification.block_found)
+        (verdict,) = verification.verdicts
+        return verdict
+
+    def test_matching_deployment(self):
+        verdict = self.verify("0x" + self.RUNTIME_CODE.hex())
+        self.assertEqual(verdict.status, "verified")
+        self.assertEqual(
+            [(check, passed) for check, passed, _ in verdict.checks],
+            [("bytecode", True), ("transaction", True), ("block", True)],
+        )
+
+    def test_other_bytecode(self):
+        verdict = self.verify("0x602b60005260206000f3")
+        self.assertEqual(verdict.status, "failed")
+        self.assertEqual(verdict.checks[0][:2], ("bytecode", False))
+
+    def test_link_references_are_masked(self):
+        manifest_bytecode = "0x6000" + self.RUNTIME_CODE.hex()[4:]
+        verdict = self.verify(manifest_bytecode)
+        self.assertEqual(verdict.status, "failed")
+        verdict = self.verify(
+            manifest_bytecode, [{"offsets": [1], "length": 1, "name": "Answer"}]
+        )
+        self.assertEqual(verdict.status, "verified")
+
+    def test_no_code_at_the_address(self):
+        verdict = self.verify(
+            "0x" + self.RUNTIME_CODE.hex(), address=self.w3.eth.accounts[1]
+        )
+        self.assertEqual(verdict.status, "failed")
+        self.assertEqual(verdict.checks[0], ("bytecode", False, "no code at the address"))
+
+    def test_unknown_chain(self):
+        manifest = make_manifest("answer", deployments={
+            f"blockchain://{'ab' * 32}/block/{'cd' * 32}": {"answer": {
+                "contract_type": "Answer", "address": self.receipt.contractAddress
+            }}
+        })
+        (verification,) = verify_deployments("QmUnknown", manifest)
+        self.assertIsNone(verification.chain_id)
+        self.assertEqual(verification.verdicts[0].status, "unchecked")
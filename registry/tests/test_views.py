@@ -0,0 +1,77 @@
+from django.test import Client, override_settings
+
+from registry.constants import CHAIN_DATA
+from registry.tests.base import deploy_tester_registry, RegistryTestCase, TESTER_CHAIN_ID
+
+TESTER_CHAIN_NAME = CHAIN_DATA[TESTER_CHAIN_ID][0]
+
+
+class RegistryPageTests(RegistryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.w3, self.address, _ = deploy_tester_registry(
+            [("owned", "1.0.0"), ("owned", "1.0.1"), ("wallet", "1.0.0")]
+        )
+        self.use_chain(self.w3)
+        self.client = Client(HTTP_HOST="localhost")
+
+    def test_browse(self):
+        response = self.client.get(f"/browse/{TESTER_CHAIN_NAME}/{self.address}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["active_registry"].address, self.address)
+        self.assertEqual(
+            [package.name for package in response.context["packages"]], ["owned", "wallet"]
+        )
+
+    def test_find_registry(self):
+        response = self.client.post(
+            f"/browse/{TESTER_CHAIN_NAME}/", {"registry_addr": self.address}
+        )
+        self.assertRedirects(
+            response,
+            f"/browse/{TESTER_CHAIN_NAME}/{self.address}",
+            fetch_redirect_response=False,
+        )
+        response = self.client.post(f"/browse/{TESTER_CHAIN_NAME}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["active_registry"])
+
+    def test_release_list(self):
+        response = self.client.post("/get_package_data/", {
+            "chain_id": TESTER_CHAIN_ID,
+            "registry_address": self.address,
+            "package_name": "owned",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [release.version for release in response.context["releases"]], ["1.0.0", "1.0.1"]
+        )
+
+    def test_directory(self):
+        with override_settings(DIRECTORY_SNAPSHOT_PATH=str(self.directory / "directory.json")):
+            response = self.client.get("/directory/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("registries", response.context)
+
+    def test_release_list_of_unknown_package(self):
+        response = self.client.post("/get_package_data/", {
+            "chain_id": TESTER_CHAIN_ID,
+            "registry_address": self.address,
+            "package_name": "missing",
+        })
+        self.assertEqual(response.status_code, 404)
+
+    def test_release_list_without_fields(self):
+        response = self.client.post("/get_package_data/", {"chain_id": TESTER_CHAIN_ID})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/get_package_data/", {
+            "chain_id": "9000",
+            "registry_address": self.address,
+            "package_name": "owned",
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get("/get_package_data/").status_code, 405)
+
+    def test_unknown_chain(self):
+        response = self.client.get(f"/browse/unknown/{self.address}")
+        self.assertEqual(response.status_code, 404)
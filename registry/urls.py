@@ -1,7 +1,66 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("directory/", views.directory, name="directory"),
+    path("browse/<str:chain_name>/", views.find_registry, name="find_registry"),
+    path("browse/<str:chain_name>/<str:registry_addr>", views.browse, name="browse"),
+    path("get_package_data/", views.get_package_data, name="get_package_data"),
+    path("stats/", views.stats, name="stats"),
+    path("metrics", views.metrics, name="metrics"),
+    path(
+        "packages/<str:chain_id>/<str:registry_address>/",
+        views.package_page,
+        name="package_page",
+    ),
+    path("manifest/<str:manifest_uri>", views.manifest, name="manifest"),
+    path(
+        "manifest/<str:manifest_uri>/dependencies",
+        views.dependency_tree,
+        name="dependency_tree",
+    ),
+    path(
+        "manifest/<str:manifest_uri>/verification",
+        views.deployment_verification,
+        name="deployment_verification",
+    ),
+    path(
+        "manifest/<str:manifest_uri>/<str:section>/<path:name>",
+        views.manifest_fragment,
+        name="manifest_fragment",
+    ),
+    path(
+        "api/v1/registries/<str:registry_address>/chains/",
+        api.registry_probe,
+        name="api_registry_probe",
+    ),
+    path(
+        "api/v1/<str:chain_id>/registries/<str:registry_address>/",
+        api.registry_detail,
+        name="api_registry",
+    ),
+    path(
+        "api/v1/<str:chain_id>/registries/<str:registry_address>/packages/",
+        api.package_list,
+        name="api_packages",
+    ),
+    path(
+        "api/v1/<str:chain_id>/registries/<str:registry_address>/packages/<str:package_name>/releases/",
+        api.release_list,
+        name="api_releases",
+    ),
+    path("api/v1/manifests/<str:ipfs_hash>/", api.manifest_detail, name="api_manifest"),
+    path(
+        "api/v1/manifests/<str:ipfs_hash>/dependencies/",
+        api.manifest_dependencies,
+        name="api_manifest_dependencies",
+    ),
+    path(
+        "api/v1/manifests/<str:ipfs_hash>/deployments/",
+        api.manifest_deployments,
+        name="api_manifest_deployments",
+    ),
+    path("api/v1/search/", api.search, name="api_search"),
 ]
@@ -1,7 +1,73 @@
-from eth_utils import humanize_hash, to_bytes, to_canonical_address
+from importlib import import_module
+import os
+import tempfile
+
+from django.utils.functional import SimpleLazyObject
+from eth_utils import humanize_hash, to_canonical_address
+
+from .constants import CHAIN_DATA
+
+
+def lazy_import(module_name, attribute=None):
+    """
+    Return a proxy of the module ``module_name``, or of its ``attribute``, importing
+    the module when the proxy is first used. Attributes of a proxied module are
+    looked up on use, so its classes can be used in ``except`` clauses.
+    """
+    def load():
+        module = import_module(module_name)
+        return module if attribute is None else getattr(module, attribute)
+    return SimpleLazyObject(load)
+
+
+ethpm_chains = lazy_import("ethpm._utils.chains")
 
 
 def humanize_address(addr: str):
     bytes_addr = to_canonical_address(addr)
     human_hash = humanize_hash(bytes_addr)
     return f"0x{human_hash}"
+
+
+def identify_blockchain_uri(uri):
+    genesis, _, _ = ethpm_chains.parse_BIP122_uri(uri)
+    for chain in CHAIN_DATA.values():
+        if chain[3] == genesis:
+            return chain[0]
+    return None
+
+
+def identify_chain_id(uri):
+    genesis, _, _ = ethpm_chains.parse_BIP122_uri(uri)
+    for chain_id, chain in CHAIN_DATA.items():
+        if chain[3] == genesis:
+            return chain_id
+    return None
+
+
+def encode_varint(value):
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def read_file(path):
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def write_file_atomically(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write to a temporary file first so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+    with os.fdopen(fd, "wb") as tmp_file:
+        tmp_file.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,247 @@
+"""
+Checking the deployments of a manifest against the chains they're on: the code at
+every deployment address is compared with the contract type's runtime bytecode, and
+the deployment's transaction and block are looked up. The requests for all
+deployments of a chain are sent as one JSON-RPC batch, and verdicts are kept in the
+shared cache by manifest CID and the block hash of the chain's BIP122 URI.
+"""
+from functools import partial
+from typing import NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from eth_utils import encode_hex, is_hex, to_bytes, to_canonical_address
+from ethpm._utils.chains import parse_BIP122_uri
+from ethpm.exceptions import EthPMValidationError
+import requests
+
+from .clients import get_w3
+from .dependencies import dependency_cid
+from .manifest_cache import manifest_cache
+from .shared_cache import shared_cache
+from .snapshot import batch_request, to_int, to_result_bytes
+from .utils import identify_chain_id
+
+
+class DeploymentVerdict(NamedTuple):
+    name: str
+    address: str
+    # "verified", "failed" or "unchecked" (no bytecode to compare, or the node
+    # couldn't answer)
+    status: str
+    # (check, passed, detail) of every check made, passed is None if the node
+    # couldn't answer
+    checks: Tuple[Tuple[str, Optional[bool], str], ...]
+
+
+class ChainVerification(NamedTuple):
+    chain_uri: str
+    # None if the chain isn't one of CHAIN_DATA
+    chain_id: Optional[str]
+    # whether the block of the chain URI is on the chain
+    block_found: Optional[bool]
+    verdicts: Tuple[DeploymentVerdict, ...]
+    # why the chain couldn't be queried, None if it could
+    error: Optional[str] = None
+
+
+def verify_deployments(ipfs_hash, manifest):
+    """
+    Return a ``ChainVerification`` of every chain ``manifest`` has deployments on.
+    """
+    verifications = []
+    for chain_uri, deployments in manifest.get("deployments", {}).items():
+        chain_id = identify_chain_id(chain_uri)
+        if chain_id is None:
+            verifications.append(ChainVerification(
+                chain_uri,
+                None,
+                None,
+                tuple(
+                    DeploymentVerdict(name, data.get("address", ""), "unchecked", ())
+                    for name, data in deployments.items()
+                ),
+            ))
+            continue
+        _, _, block_hash = parse_BIP122_uri(chain_uri)
+        try:
+            verification = shared_cache.get_or_set(
+                "deployment_verification",
+                f"{ipfs_hash}:{block_hash}",
+                partial(verify_chain, manifest, chain_uri, chain_id),
+                timeout=settings.DEPLOYMENT_VERIFICATION_TTL,
+            )
+        except (requests.RequestException, ValueError) as exc:
+            # not cached, the node may answer next time
+            verification = ChainVerification(chain_uri, chain_id, None, (), str(exc))
+        verifications.append(verification)
+    return tuple(verifications)
+
+
+def verify_chain(manifest, chain_uri, chain_id):
+    deployments = manifest["deployments"][chain_uri]
+    _, _, chain_block_hash = parse_BIP122_uri(chain_uri)
+    # Deployments often share a block or a transaction, each is only requested once.
+    requests_by_key = {
+        ("block", chain_block_hash): ("eth_getBlockByHash", [chain_block_hash, False])
+    }
+    for data in deployments.values():
+        address = data["address"]
+        requests_by_key[("code", address)] = ("eth_getCode", [address, "latest"])
+        if "transaction" in data:
+            transaction = data["transaction"]
+            requests_by_key[("receipt", transaction)] = (
+                "eth_getTransactionReceipt", [transaction]
+            )
+        if "block" in data:
+            requests_by_key[("block", data["block"])] = (
+                "eth_getBlockByHash", [data["block"], False]
+            )
+    responses = dict(zip(
+        requests_by_key, batch_request(get_w3(chain_id), list(requests_by_key.values()))
+    ))
+    chain_block = responses[("block", chain_block_hash)]
+    return ChainVerification(
+        chain_uri,
+        chain_id,
+        None if "error" in chain_block else chain_block["result"] is not None,
+        tuple(
+            verify_deployment(manifest, deployments, name, data, responses)
+            for name, data in deployments.items()
+        ),
+    )
+
+
+def verify_deployment(manifest, deployments, name, data, responses):
+    checks = [check_code(manifest, deployments, data, responses[("code", data["address"])])]
+    if "transaction" in data:
+        checks.append(check_receipt(data, responses[("receipt", data["transaction"])]))
+    if "block" in data:
+        checks.append(check_block(responses[("block", data["block"])]))
+    checks = tuple(check for check in checks if check is not None)
+    if any(passed is False for _, passed, _ in checks):
+        status = "failed"
+    elif checks and checks[0][0] == "bytecode" and all(passed for _, passed, _ in checks):
+        status = "verified"
+    else:
+        status = "unchecked"
+    return DeploymentVerdict(name, data["address"], status, checks)
+
+
+def check_code(manifest, deployments, data, response):
+    if "error" in response:
+        return "bytecode", None, response["error"].get("message", "")
+    code = to_result_bytes(response["result"])
+    if not code:
+        return "bytecode", False, "no code at the address"
+    runtime_bytecode = get_runtime_bytecode(manifest, data)
+    if runtime_bytecode is None:
+        return None
+    expected = to_bytes(hexstr=runtime_bytecode["bytecode"])
+    if len(code) != len(expected):
+        return "bytecode", False, f"{len(code)} bytes deployed, {len(expected)} expected"
+    # link references are zero filled in the manifest, the linked addresses are
+    # compared separately where the deployment declares them
+    link_references = runtime_bytecode.get("link_references", [])
+    if mask_link_references(code, link_references) != mask_link_references(
+        expected, link_references
+    ):
+        return "bytecode", False, "deployed code differs from the runtime bytecode"
+    for dependency in data.get("runtime_bytecode", {}).get("link_dependencies", []):
+        value = link_value(deployments, dependency)
+        if value is None:
+            continue
+        for offset in dependency["offsets"]:
+            if code[offset:offset + len(value)] != value:
+                return "bytecode", False, f"{dependency['value']} is not linked at {offset}"
+    return "bytecode", True, "deployed code matches the runtime bytecode"
+
+
+def get_runtime_bytecode(manifest, data):
+    """
+    Return the runtime bytecode of a deployment: its own if it has one, else that of
+    its contract type, which may come from a build dependency (``alias:ContractType``).
+    """
+    runtime_bytecode = data.get("runtime_bytecode", {})
+    if "bytecode" in runtime_bytecode:
+        return runtime_bytecode
+    alias, _, contract_type = data["contract_type"].rpartition(":")
+    if alias:
+        cid = dependency_cid(manifest.get("build_dependencies", {}).get(alias))
+        if cid is None:
+            return None
+        try:
+            manifest = manifest_cache.get(cid).manifest
+        except (EthPMValidationError, ValueError):
+            return None
+    runtime_bytecode = manifest.get("contract_types", {}).get(contract_type, {}).get(
+        "runtime_bytecode", {}
+    )
+    if "bytecode" not in runtime_bytecode:
+        return None
+    return runtime_bytecode
+
+
+def mask_link_references(bytecode, link_references):
+    masked = bytearray(bytecode)
+    for reference in link_references:
+        for offset in reference["offsets"]:
+            end = min(offset + reference["length"], len(masked))
+            masked[offset:end] = bytes(max(end - offset, 0))
+    return bytes(masked)
+
+
+def link_value(deployments, dependency):
+    # the bytes a link dependency puts in the code, None if they aren't known here
+    value = dependency["value"]
+    if dependency["type"] == "literal" and is_hex(value):
+        return to_bytes(hexstr=value)
+    if dependency["type"] == "reference" and value in deployments:
+        return to_canonical_address(deployments[value]["address"])
+    return None
+
+
+def check_receipt(data, response):
+    if "error" in response:
+        return "transaction", None, response["error"].get("message", "")
+    receipt = response["result"]
+    if receipt is None:
+        return "transaction", False, "transaction not found"
+    block_hash = to_result_bytes(receipt["blockHash"])
+    if "block" in data and block_hash != to_bytes(hexstr=data["block"]):
+        return "transaction", False, f"transaction mined in block {encode_hex(block_hash)}"
+    if receipt.get("status") is not None and to_int(receipt["status"]) == 0:
+        return "transaction", False, "transaction reverted"
+    created = receipt.get("contractAddress")
+    if created and to_canonical_address(created) != to_canonical_address(data["address"]):
+        return "transaction", False, f"transaction created {created}"
+    return "transaction", True, "transaction found"
+
+
+def check_block(response):
+    if "error" in response:
+        return "block", None, response["error"].get("message", "")
+    if response["result"] is None:
+        return "block", False, "block not on the chain"
+    return "block", True, "block found"
+
+
+def serialize_verifications(verifications):
+    return {
+        verification.chain_uri: {
+            "chain_id": verification.chain_id,
+            "block_found": verification.block_found,
+            "error": verification.error,
+            "deployments": {
+                verdict.name: {
+                    "address": verdict.address,
+                    "status": verdict.status,
+                    "checks": [
+                        {"check": check, "passed": passed, "detail": detail}
+                        for check, passed, detail in verdict.checks
+                    ],
+                }
+                for verdict in verification.verdicts
+            },
+        }
+        for verification in verifications
+    }
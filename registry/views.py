@@ -1,73 +1,103 @@
 from collections import namedtuple
-import csv
 import json
-from pathlib import Path
-from django.http import HttpResponse, HttpResponseRedirect
+from django.conf import settings
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseNotModified,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.template import loader
+from django.utils.cache import patch_cache_control
 
-from ens import ENS
-from ethpm.constants import IPFS_GATEWAY_PREFIX
-from ethpm._utils.ipfs import create_ipfs_uri
-from ethpm.exceptions import EthPMValidationError
-from eth_utils import is_address, to_checksum_address, to_dict, to_tuple, humanize_ipfs_uri
-from web3.auto.infura import w3 as mainnet_w3
-from web3.auto.infura.ropsten import w3 as ropsten_w3_auto
-from web3.pm import PM
-from web3 import Web3
-from web3.providers.auto import load_provider_from_uri
-from web3.middleware import construct_sign_and_send_raw_middleware
+from eth_utils import is_address, to_checksum_address, to_dict, to_tuple
 
 from django.views.decorators.csrf import csrf_protect
-
-from .models import Registry, get_package_versions, Manifest
+from django.views.decorators.http import require_POST
+
+from .concurrency import submit
+from .fragments import get_fragment
+from .models import (
+    get_package,
+    get_package_page,
+    get_registry,
+    refresh_releases,
+    Manifest,
+    Package,
+)
+from .ipfs import ipfs_fetcher
+from .metrics import process_metrics
 from .constants import CHAIN_DATA
-
-DIRECTORY_STORE_PATH = Path(__file__).parent / "directory_store.json"
-
+from .utils import lazy_import
+
+# The URLconf imports the views when a worker serves its first request, web3 and
+# ethpm are only imported by the first request using them, and the index doesn't.
+clients = lazy_import("registry.clients")
+dependencies = lazy_import("registry.dependencies")
+ens_cache = lazy_import("registry.ens_cache", "ens_cache")
+ethpm_exceptions = lazy_import("ethpm.exceptions")
+ethpm_ipfs = lazy_import("ethpm._utils.ipfs")
+manifest_cache = lazy_import("registry.manifest_cache", "manifest_cache")
+manifest_prefetcher = lazy_import("registry.prefetch", "manifest_prefetcher")
+previews = lazy_import("registry.previews")
+registry_directory = lazy_import("registry.directory")
+verification = lazy_import("registry.verification")
 
 # todo:
 # Manifest validation in preview
 # Async ipfs search
 # Prepare for infura webpoint deprecation
-# ENS reverse lookup on registry owner
 # Preview github c-a uri manifests
 
 
 @csrf_protect
+@require_POST
 def get_package_data(request):
-    if request.method == "POST":
-        chain_id = request.POST.get("chain_id")
-        w3 = get_w3(chain_id)
-        registry_address = to_checksum_address(request.POST.get("registry_address"))
-        package_name = request.POST.get("package_name")
-        package_data = get_package_versions(registry_address, w3, package_name)
-        html = construct_html(package_data)
-        return HttpResponse(html)
-
-
-def construct_html(releases_data):
-    html_data = [generate_release_html(rls) for rls in releases_data]
-    li_data = [f"{rls[0]}" for rls in html_data]
-    version_data = "".join(li_data)
-    return f"<dl class='row' style='font-size:.8em;'><dt class='col-sm-2' style='text-decoration:underline;'>Version</dt><dt class='col-sm-10' style='text-decoration:underline;'>Manifest URI</dt>{version_data}</dl>"
-
-
-@to_tuple
-def generate_release_html(rls):
-    if rls.hyperlink:
-        ipfs_hash = rls.hyperlink.split("/")[-1]
-        yield f"""
-            <dd class="col-sm-2">{rls.version}</dd>
-            <dd class="col-sm-4 text"><span>{humanize_ipfs_uri(rls.manifest_uri)}</span></dd>
-            <dd class="col-sm-4 text" style="padding-bottom:20px;"><span class="btn btn-light" data-clipboard-text="{rls.ethpm_uri}"> Copy ethPM URI to clipboard </span></dd>
-            <dd class="col-sm-2"><a href='/manifest/{ipfs_hash}' target='_blank' style="float:right;">Details</a></dd>
-            """
-    else:
-        yield f"<dd class='col-sm-3'>{rls.version}</dd><dd class='col-sm-9'>{rls.manifest_uri}</dd>"
+    chain_id = request.POST.get("chain_id")
+    registry_address = request.POST.get("registry_address")
+    package_name = request.POST.get("package_name")
+    if not (chain_id and registry_address and package_name):
+        return HttpResponseBadRequest("chain_id, registry_address and package_name are required")
+    if chain_id not in CHAIN_DATA or not is_address(registry_address):
+        raise Http404(f"No registry at {registry_address} on chain {chain_id}")
+    w3 = clients.get_w3(chain_id)
+    registry = get_registry(to_checksum_address(registry_address), w3, chain_id)
+    try:
+        package = get_package(registry, w3, package_name)
+    except Package.DoesNotExist as exc:
+        raise Http404(str(exc))
+    return HttpResponse(render_release_list(package, w3))
+
+
+def render_release_list(package, w3):
+    """
+    Return the release list of ``package``. Releases are never removed or changed,
+    so the rendered list is cached until the package's release count changes. The
+    releases are refreshed before the count is read, so a cached list always holds
+    as many releases as its key counts.
+    """
+    if package.is_stale():
+        refresh_releases(package, w3)
+    release_count = package.release_count
+
+    def render():
+        # releases indexed since release_count was read belong to the next count
+        releases = package.releases.select_related("package__registry")[:release_count]
+        return loader.render_to_string("registry/release_list.html", {"releases": releases})
+
+    registry = package.registry
+    return get_fragment(
+        "release_list",
+        [registry.chain_id, registry.address, package.name, release_count],
+        render,
+    )
 
 
 def directory(request):
-    registries = json.loads(DIRECTORY_STORE_PATH.read_text())
+    registries = registry_directory.load_directory()
     template = loader.get_template("registry/directory.html")
     context = {"registries": registries}
     return HttpResponse(template.render(context, request))
@@ -93,23 +123,126 @@ def browse(request, chain_name, registry_addr):
 
 
 def manifest(request, manifest_uri):
-    template = loader.get_template("registry/manifest_preview.html")
+    etag = previews.preview_etag(manifest_uri)
+    if previews.etag_matches(request, etag):
+        response = HttpResponseNotModified()
+        previews.patch_immutable_response(response, etag)
+        return response
+
     try:
-        manifest = Manifest(manifest_uri)
-    except (ValidationError, json.JSONDecodeError) as exc:
+        preview = previews.get_stored_preview(manifest_uri)
+        if preview is None:
+            manifest_data = Manifest(manifest_uri)
+            if manifest_data.size > settings.MANIFEST_STREAMING_THRESHOLD:
+                response = StreamingHttpResponse(previews.iter_manifest_preview(manifest_data))
+                previews.patch_immutable_response(response, etag)
+                return response
+            preview = previews.store_preview(manifest_data)
+    except (ethpm_exceptions.EthPMValidationError, json.JSONDecodeError, ValueError):
+        template = loader.get_template("registry/manifest_preview.html")
         context = {
-            "manifest_uri": create_ipfs_uri(manifest_uri),
+            "manifest_uri": ethpm_ipfs.create_ipfs_uri(manifest_uri),
             "manifest_data": None,
             "hyperlink": None,
         }
         return HttpResponse(template.render(context, request))
 
-    context = {
-        "manifest_uri": create_ipfs_uri(manifest_uri),
-        "manifest_data": manifest,
-        "hyperlink": f"{IPFS_GATEWAY_PREFIX}{manifest_uri}",
-    }
-    return HttpResponse(template.render(context, request))
+    response = HttpResponse(preview)
+    previews.patch_immutable_response(response, etag)
+    return response
+
+
+def manifest_fragment(request, manifest_uri, section, name):
+    if section not in ("contract_types", "sources", "build_dependencies"):
+        raise Http404(f"Manifest section {section} is not loaded lazily")
+    etag = previews.preview_etag(manifest_uri)
+    if previews.etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            content = manifest_cache.get(manifest_uri).manifest[section][name]
+        except (KeyError, ethpm_exceptions.EthPMValidationError, json.JSONDecodeError, ValueError):
+            raise Http404(f"No {section} entry named {name} in manifest {manifest_uri}")
+        if section == "contract_types":
+            response = JsonResponse(content)
+        else:
+            response = HttpResponse(content, content_type="text/plain; charset=utf-8")
+    previews.patch_immutable_response(response, etag)
+    return response
+
+
+def dependency_tree(request, manifest_uri):
+    etag = previews.preview_etag(manifest_uri)
+    if previews.etag_matches(request, etag):
+        response = HttpResponseNotModified()
+        previews.patch_immutable_response(response, etag)
+        return response
+
+    graph = dependencies.resolve_dependency_graph(manifest_uri)
+    error = graph.nodes[manifest_uri].error
+    if error:
+        raise Http404(f"Could not read manifest {manifest_uri}: {error}")
+    template = loader.get_template("registry/dependency_tree.html")
+    response = HttpResponse(template.render({"rows": dependencies.iter_tree_rows(graph)}, request))
+    # dependencies that couldn't be fetched are retried on the next request
+    if graph.complete:
+        previews.patch_immutable_response(response, etag)
+    return response
+
+
+def deployment_verification(request, manifest_uri):
+    try:
+        manifest = manifest_cache.get(manifest_uri).manifest
+    except (ethpm_exceptions.EthPMValidationError, json.JSONDecodeError, ValueError) as exc:
+        raise Http404(f"Could not read manifest {manifest_uri}: {exc}")
+    template = loader.get_template("registry/deployment_verification.html")
+    context = {"verifications": verification.verify_deployments(manifest_uri, manifest)}
+    response = HttpResponse(template.render(context, request))
+    # verdicts follow the chain, caches may only keep them as long as we do
+    patch_cache_control(response, public=True, max_age=settings.DEPLOYMENT_VERIFICATION_TTL)
+    return response
+
+
+def package_page(request, chain_id, registry_address):
+    if chain_id not in CHAIN_DATA or not is_address(registry_address):
+        raise Http404(f"No registry at {registry_address} on chain {chain_id}")
+    try:
+        cursor = int(request.GET.get("cursor", 0))
+        limit = int(request.GET.get("limit", settings.PACKAGE_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "cursor and limit must be integers"}, status=400)
+    if cursor < 0 or limit < 1:
+        return JsonResponse({"error": "cursor and limit must be positive"}, status=400)
+
+    w3 = clients.get_w3(chain_id)
+    registry = get_registry(to_checksum_address(registry_address), w3, chain_id)
+    page = get_package_page(
+        registry, w3, cursor, min(limit, settings.PACKAGE_PAGE_SIZE)
+    )
+    return JsonResponse({
+        "package_count": registry.package_count,
+        "packages": [
+            {"name": package.name, "release_count": package.release_count}
+            for package in page.packages
+        ],
+        "next_cursor": page.next_cursor,
+    })
+
+
+def stats(request):
+    return JsonResponse({
+        "chains": clients.get_chain_stats(),
+        "ens": ens_cache.get_stats(),
+        "ipfs": ipfs_fetcher.get_stats(),
+        "manifests": manifest_cache.get_stats(),
+        "prefetch": manifest_prefetcher.get_stats(),
+    })
+
+
+def metrics(request):
+    return HttpResponse(
+        process_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 @to_dict
@@ -118,89 +251,28 @@ def generate_context_for_post(chain_name, registry_addr):
     chain_lookup = [
         cid for cid in CHAIN_DATA.keys() if CHAIN_DATA[cid][0] == chain_name
     ]
-    if len(chain_lookup) is not 1:
-        raise Exception("go to 404")
+    if len(chain_lookup) != 1:
+        raise Http404(f"Unknown chain: {chain_name}")
     chain_id = chain_lookup[0]
-    w3 = get_w3(chain_id)
+    w3 = clients.get_w3(chain_id)
+    # the connection check doesn't depend on the registry reads, run it alongside
+    connection_info = submit(get_connection_info, w3)
     yield "chain_id", chain_id
-    if chain_id == "1":
-        ens = ENS(w3.provider)
     yield "chain_name", CHAIN_DATA[chain_id][0]
-    yield "connection_info", get_connection_info(w3)
     if is_address(registry_addr):
-        yield "active_registry", Registry(to_checksum_address(registry_addr), w3)
-    elif chain_id == "1" and registry_addr and ens.address(registry_addr):
-        yield "active_registry", Registry(registry_addr, w3)
+        registry = get_registry(to_checksum_address(registry_addr), w3, chain_id)
+    elif chain_id == "1" and registry_addr and ens_cache.address(w3, chain_id, registry_addr):
+        registry = get_registry(registry_addr, w3, chain_id)
     else:
-        yield "active_registry", None
-
-
-# package data hardcoded here to avoid all the w3 calls
-default_registries = {
-    "defi.snakecharmers.eth": {
-        "package_count": 3,
-        "packages": [
-            "compound",
-            "dydx",
-            "moloch-dao",
-        ]
-    },
-    "erc20.snakecharmers.eth": {
-        "package_count": 20,
-        "packages": [
-            "dai-dai",
-            "brave-bat",
-            "usdcoin-usdc-dai",
-        ]
-    },
-    "dappsys.snakecharmers.eth":{
-        "package_count": 15,
-        "packages": [
-            "ds-math",
-            "ds-token",
-            "ds-vault",
-        ]
-    },
-    "erc721.snakecharmers.eth": {
-        "package_count": 20,
-        "packages": [
-            "cryptokitties-ck",
-            "decentraland-land",
-            "godsunchained-gods",
-        ]
-    },
-    "zeppelin.snakecharmers.eth":{
-        "package_count": 15,
-        "packages": [
-            "cryptography",
-            "ownership",
-            "payment",
-        ]
-    },
-    "maker.snakecharmers.eth":{
-        "package_count": 12,
-        "packages": [
-            "flopper",
-            "maker-otc",
-            "sai",
-        ]
-    },
-    "ens.snakecharmers.eth": {
-        "package_count": 3,
-        "packages": [
-            "ens",
-            "ethregistrar",
-            "resolvers",
-        ]
-    },
-    "multisig.snakecharmers.eth": {
-        "package_count": 1,
-        "packages": [
-            "gnosis",
-        ]
-    },
-}
-
+        registry = None
+    yield "active_registry", registry
+    if registry:
+        page = get_package_page(registry, w3, 0, settings.PACKAGE_PAGE_SIZE)
+        yield "packages", page.packages
+        yield "next_cursor", page.next_cursor
+    if chain_id == "1" and registry and registry.owner_address:
+        yield "owner_name", ens_cache.name(w3, chain_id, registry.owner_address)
+    yield "connection_info", connection_info.result()
 
 
 @to_dict
@@ -208,12 +280,12 @@ def generate_context_for_index(chain_id):
     # defaults to mainnet
     if not chain_id:
         chain_id = "1"
-    w3 = get_w3(chain_id)
+    w3 = clients.get_w3(chain_id)
     yield "chain_id", chain_id
     yield "chain_name", CHAIN_DATA[chain_id][0]
     yield "connection_info", get_connection_info(w3)
     yield "active_registry", None
-    yield "registry_data", grab_default_registry_data(default_registries)
+    yield "registry_data", grab_default_registry_data(registry_directory.load_directory())
 
 DisplayRegistry = namedtuple('DisplayRegistry', ['address', 'count', 'packages'])
 
@@ -224,14 +296,5 @@ def grab_default_registry_data(registries):
         yield DisplayRegistry(registry, data['package_count'], data['packages'])
 
 
-def get_w3(chain_id: str):
-    if chain_id not in CHAIN_DATA:
-        raise Exception("invalid chain_id")
-    url = CHAIN_DATA[chain_id][1]
-    w3 = Web3(load_provider_from_uri(url))
-    w3.enable_unstable_package_management_api()
-    return w3
-
-
 def get_connection_info(w3):
     return w3.isConnected()